@@ -0,0 +1,64 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from src.agent.deep_research.finding_dedup import embed_normalized, finding_text
+from src.agent.deep_research.run_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+SKIPPED = "skipped"
+
+
+async def score_information_gain(
+        new_results: Sequence[Dict[str, Any]],
+        prior_results: Sequence[Dict[str, Any]],
+        embeddings: Optional[Embeddings] = None,
+) -> Optional[float]:
+    """
+    Scores how much a task's findings add to the earlier ones, from 0 (all already known)
+    to 1 (nothing similar found before). A finding's novelty is one minus its highest cosine
+    similarity to an earlier finding; the task scores its most novel finding.
+    Returns None when the task produced no completed findings.
+    """
+    new_texts = [text for text in map(finding_text, new_results) if text]
+    if not new_texts:
+        return None
+    prior_texts = [text for text in map(finding_text, prior_results) if text]
+    if not prior_texts:
+        return 1.0
+    vectors = await embed_normalized(new_texts + prior_texts, embeddings)
+    similarities = vectors[:len(new_texts)] @ vectors[len(new_texts):].T
+    return float(max(0.0, 1.0 - similarities.max(axis=1).min()))
+
+
+def skip_pending_tasks(plan: List[Dict[str, Any]], reason: str,
+                       cat_idx: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Marks the pending tasks of one category, or of the whole plan when `cat_idx` is None,
+    as skipped. Returns the positions of the tasks that were skipped.
+    """
+    skipped = []
+    categories = [cat_idx] if cat_idx is not None else range(len(plan))
+    for c in categories:
+        for t, task in enumerate(plan[c]["tasks"]):
+            if task["status"] == "pending":
+                task["status"] = SKIPPED
+                task["result_summary"] = f"Skipped: {reason}"
+                skipped.append((c, t))
+    return skipped
+
+
+def exhausted_budget(metrics: Optional[RunMetrics], max_browser_sessions: Optional[int],
+                     max_research_tokens: Optional[int]) -> Optional[str]:
+    """Returns why the run's browser or token budget is used up, or None while budget is left."""
+    if metrics is None:
+        return None
+    sessions = metrics.browser_sessions()
+    if max_browser_sessions is not None and sessions >= max_browser_sessions:
+        return f"browser budget of {max_browser_sessions} sessions used up ({sessions})."
+    tokens = metrics.llm_tokens()
+    if max_research_tokens is not None and tokens >= max_research_tokens:
+        return f"token budget of {max_research_tokens} tokens used up ({tokens})."
+    return None
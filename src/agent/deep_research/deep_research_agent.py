@@ -1,11 +1,16 @@
 import asyncio
+import copy
+import inspect
 import json
 import logging
+import math
 import os
 import threading
 import uuid
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, TypedDict
 
 from browser_use.browser.browser import BrowserConfig
 from langchain_community.tools.file_management import (
@@ -15,6 +20,7 @@ from langchain_community.tools.file_management import (
 )
 
 # Langchain imports
+from langchain_core.embeddings import Embeddings
 from langchain_core.messages import (
     AIMessage,
     BaseMessage,
@@ -23,50 +29,83 @@ from langchain_core.messages import (
     ToolMessage,
 )
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import StructuredTool, Tool
 
 # Langgraph imports
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph
+
+# The SQLite checkpointer is optional, runs are simply not checkpointed without it
+AsyncSqliteSaver = None
+try:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except Exception as e:
+    print(f"Warning: Could not import AsyncSqliteSaver, deep research checkpointing is disabled: {e}")
 from pydantic import BaseModel, Field
 
 from browser_use.browser.context import BrowserContextConfig
 
 from src.agent.browser_use.browser_use_agent import BrowserUseAgent
+from src.agent.deep_research.adaptive_depth import (
+    SKIPPED,
+    exhausted_budget,
+    score_information_gain,
+    skip_pending_tasks,
+)
+from src.agent.deep_research.finding_dedup import dedup_findings
+from src.agent.deep_research.message_compaction import compact_messages
+from src.agent.deep_research.plan_cache import PLAN_CACHE_FILENAME, PlanCache
+from src.agent.deep_research.research_log import (
+    PLAN_FILENAME,
+    PLAN_MARKERS,
+    RESEARCH_LOG_FILENAME,
+    SEARCH_INFO_FILENAME,
+    append_research_events,
+    compact_research_log,
+    format_plan_markdown,
+    plan_event,
+    replay_research_log,
+    result_event,
+    task_status_event,
+    write_plan_markdown,
+    write_research_snapshot,
+)
+from src.agent.deep_research.run_metrics import RunMetrics, metrics_span
+from src.agent.deep_research.search_cache import SEARCH_CACHE_FILENAME, SearchResultCache
+from src.agent.deep_research.static_fetch import StaticFetcher
+from src.agent.deep_research.synthesis import (
+    estimate_tokens,
+    format_search_results,
+    map_category_summaries,
+)
+from src.browser.browser_pool import BrowserPool
 from src.browser.custom_browser import CustomBrowser
+from src.browser.custom_context import CustomBrowserContext
 from src.controller.custom_controller import CustomController
+from src.utils.llm_governor import limit_llm_concurrency, llm_governor_metrics
 from src.utils.mcp_client import setup_mcp_client_and_tools
 
 logger = logging.getLogger(__name__)
 
 # Constants
 REPORT_FILENAME = "report.md"
-PLAN_FILENAME = "research_plan.md"
-SEARCH_INFO_FILENAME = "search_info.json"
+CHECKPOINT_FILENAME = "checkpoints.sqlite"
+# Every plan task batch is one graph step, so the default limit of 25 is too low for larger plans
+GRAPH_RECURSION_LIMIT = 1000
+# Calls of the same tool allowed at once when run() gets no limit for it
+DEFAULT_TOOL_CONCURRENCY = 4
 
 _AGENT_STOP_FLAGS = {}
 _BROWSER_AGENT_INSTANCES = {}
+# In-flight browser search tasks and browsers launched outside the browser pool per research
+# task, see DeepResearchAgent.stop()
+_BROWSER_SESSION_TASKS: Dict[str, set] = {}
+_OPEN_BROWSERS: Dict[str, set] = {}
 
 
-async def run_single_browser_task(
-        task_query: str,
-        task_id: str,
-        llm: Any,  # Pass the main LLM
-        browser_config: Dict[str, Any],
-        stop_event: threading.Event,
-        use_vision: bool = False,
-) -> Dict[str, Any]:
-    """
-    Runs a single BrowserUseAgent task.
-    Manages browser creation and closing for this specific task.
-    """
-    if not BrowserUseAgent:
-        return {
-            "query": task_query,
-            "error": "BrowserUseAgent components not available.",
-        }
-
-    # --- Browser Setup ---
-    # These should ideally come from the main agent's config
+def _create_browser(browser_config: Dict[str, Any]) -> CustomBrowser:
+    """Builds a CustomBrowser from the deep research browser config dict."""
     headless = browser_config.get("headless", False)
     window_w = browser_config.get("window_width", 1280)
     window_h = browser_config.get("window_height", 1100)
@@ -75,51 +114,70 @@ async def run_single_browser_task(
     browser_binary_path = browser_config.get("browser_binary_path", None)
     wss_url = browser_config.get("wss_url", None)
     cdp_url = browser_config.get("cdp_url", None)
-    disable_security = browser_config.get("disable_security", False)
 
-    bu_browser = None
-    bu_browser_context = None
-    try:
-        logger.info(f"Starting browser task for query: {task_query}")
-        extra_args = []
-        if use_own_browser:
-            browser_binary_path = os.getenv("BROWSER_PATH", None) or browser_binary_path
-            if browser_binary_path == "":
-                browser_binary_path = None
-            browser_user_data = browser_user_data_dir or os.getenv("BROWSER_USER_DATA", None)
-            if browser_user_data:
-                extra_args += [f"--user-data-dir={browser_user_data}"]
-        else:
+    extra_args = []
+    if use_own_browser:
+        browser_binary_path = os.getenv("BROWSER_PATH", None) or browser_binary_path
+        if browser_binary_path == "":
             browser_binary_path = None
-
-        bu_browser = CustomBrowser(
-            config=BrowserConfig(
-                headless=headless,
-                browser_binary_path=browser_binary_path,
-                extra_browser_args=extra_args,
-                wss_url=wss_url,
-                cdp_url=cdp_url,
-                new_context_config=BrowserContextConfig(
-                    window_width=window_w,
-                    window_height=window_h,
-                )
+        browser_user_data = browser_user_data_dir or os.getenv("BROWSER_USER_DATA", None)
+        if browser_user_data:
+            extra_args += [f"--user-data-dir={browser_user_data}"]
+    else:
+        browser_binary_path = None
+
+    return CustomBrowser(
+        config=BrowserConfig(
+            headless=headless,
+            browser_binary_path=browser_binary_path,
+            extra_browser_args=extra_args,
+            wss_url=wss_url,
+            cdp_url=cdp_url,
+            new_context_config=BrowserContextConfig(
+                window_width=window_w,
+                window_height=window_h,
             )
         )
+    )
 
-        context_config = BrowserContextConfig(
-            save_downloads_path="./tmp/downloads",
-            window_height=window_h,
-            window_width=window_w,
-            force_new_context=True,
-        )
-        bu_browser_context = await bu_browser.new_context(config=context_config)
 
-        # Simple controller example, replace with your actual implementation if needed
-        bu_controller = CustomController()
+def _create_context_config(browser_config: Dict[str, Any]) -> BrowserContextConfig:
+    return BrowserContextConfig(
+        save_downloads_path="./tmp/downloads",
+        window_height=browser_config.get("window_height", 1100),
+        window_width=browser_config.get("window_width", 1280),
+        force_new_context=True,
+    )
+
 
-        # Construct the task prompt for BrowserUseAgent
-        # Instruct it to find specific info and return title/URL
-        bu_task_prompt = f"""
+def create_browser_pool(browser_config: Dict[str, Any], max_size: int = 1, max_uses: int = 10,
+                        contexts_per_browser: int = 1) -> BrowserPool:
+    """Creates a browser pool whose browsers and contexts follow the deep research browser config."""
+    return BrowserPool(
+        browser_factory=partial(_create_browser, browser_config),
+        context_config=_create_context_config(browser_config),
+        max_size=max_size,
+        max_uses=max_uses,
+        contexts_per_browser=contexts_per_browser,
+    )
+
+
+async def _run_browser_agent(
+        task_query: str,
+        task_id: str,
+        llm: Any,
+        bu_browser: CustomBrowser,
+        bu_browser_context: CustomBrowserContext,
+        stop_event: threading.Event,
+        use_vision: bool = False,
+) -> Dict[str, Any]:
+    """Runs a BrowserUseAgent for one query on an already prepared browser and context."""
+    # Simple controller example, replace with your actual implementation if needed
+    bu_controller = CustomController()
+
+    # Construct the task prompt for BrowserUseAgent
+    # Instruct it to find specific info and return title/URL
+    bu_task_prompt = f"""
         Research Task: {task_query}
         Objective: Find relevant information answering the query.
         Output Requirements: For each relevant piece of information found, please provide:
@@ -130,20 +188,20 @@ async def run_single_browser_task(
         PDF cannot directly extract _content, please try to download first, then using read_file, if you can't save or read, please try other methods.
         """
 
-        bu_agent_instance = BrowserUseAgent(
-            task=bu_task_prompt,
-            llm=llm,  # Use the passed LLM
-            browser=bu_browser,
-            browser_context=bu_browser_context,
-            controller=bu_controller,
-            use_vision=use_vision,
-            source="webui",
-        )
-
-        # Store instance for potential stop() call
-        task_key = f"{task_id}_{uuid.uuid4()}"
-        _BROWSER_AGENT_INSTANCES[task_key] = bu_agent_instance
+    bu_agent_instance = BrowserUseAgent(
+        task=bu_task_prompt,
+        llm=llm,  # Use the passed LLM
+        browser=bu_browser,
+        browser_context=bu_browser_context,
+        controller=bu_controller,
+        use_vision=use_vision,
+        source="webui",
+    )
 
+    # Store instance for potential stop() call
+    task_key = f"{task_id}_{uuid.uuid4()}"
+    _BROWSER_AGENT_INSTANCES[task_key] = bu_agent_instance
+    try:
         # --- Run with Stop Check ---
         # BrowserUseAgent needs to internally check a stop signal or have a stop method.
         # We simulate checking before starting and assume `run` might be interruptible
@@ -152,9 +210,6 @@ async def run_single_browser_task(
             logger.info(f"Browser task for '{task_query}' cancelled before start.")
             return {"query": task_query, "result": None, "status": "cancelled"}
 
-        # The run needs to be awaitable and ideally accept a stop signal or have a .stop() method
-        # result = await bu_agent_instance.run(max_steps=max_steps) # Add max_steps if applicable
-        # Let's assume a simplified run for now
         logger.info(f"Running BrowserUseAgent for: {task_query}")
         result = await bu_agent_instance.run()  # Assuming run is the main method
         logger.info(f"BrowserUseAgent finished for: {task_query}")
@@ -167,6 +222,53 @@ async def run_single_browser_task(
         else:
             logger.info(f"Browser result for '{task_query}': {final_data}")
             return {"query": task_query, "result": final_data, "status": "completed"}
+    finally:
+        _BROWSER_AGENT_INSTANCES.pop(task_key, None)
+
+
+async def run_single_browser_task(
+        task_query: str,
+        task_id: str,
+        llm: Any,  # Pass the main LLM
+        browser_config: Dict[str, Any],
+        stop_event: threading.Event,
+        use_vision: bool = False,
+        browser_pool: Optional[BrowserPool] = None,
+) -> Dict[str, Any]:
+    """
+    Runs a single BrowserUseAgent task.
+    Checks a browser out of `browser_pool` when one is given, otherwise
+    manages browser creation and closing for this specific task.
+    """
+    if not BrowserUseAgent:
+        return {
+            "query": task_query,
+            "error": "BrowserUseAgent components not available.",
+        }
+
+    logger.info(f"Starting browser task for query: {task_query}")
+    if browser_pool:
+        try:
+            async with browser_pool.acquire() as (bu_browser, bu_browser_context):
+                return await _run_browser_agent(
+                    task_query, task_id, llm, bu_browser, bu_browser_context, stop_event, use_vision
+                )
+        except Exception as e:
+            logger.error(
+                f"Error during browser task for query '{task_query}': {e}", exc_info=True
+            )
+            return {"query": task_query, "error": str(e), "status": "failed"}
+
+    bu_browser = None
+    bu_browser_context = None
+    open_browsers = _OPEN_BROWSERS.setdefault(task_id, set())
+    try:
+        bu_browser = _create_browser(browser_config)
+        open_browsers.add(bu_browser)
+        bu_browser_context = await bu_browser.new_context(config=_create_context_config(browser_config))
+        return await _run_browser_agent(
+            task_query, task_id, llm, bu_browser, bu_browser_context, stop_event, use_vision
+        )
 
     except Exception as e:
         logger.error(
@@ -184,13 +286,13 @@ async def run_single_browser_task(
         if bu_browser:
             try:
                 await bu_browser.close()
-                bu_browser = None
                 logger.info("Closed browser.")
             except Exception as e:
                 logger.error(f"Error closing browser: {e}")
-
-        if task_key in _BROWSER_AGENT_INSTANCES:
-            del _BROWSER_AGENT_INSTANCES[task_key]
+            open_browsers.discard(bu_browser)
+            bu_browser = None
+        if not open_browsers:
+            _OPEN_BROWSERS.pop(task_id, None)
 
 
 class BrowserSearchInput(BaseModel):
@@ -199,29 +301,126 @@ class BrowserSearchInput(BaseModel):
     )
 
 
-async def _run_browser_search_tool(
+# Progress events of a run, see DeepResearchAgent.events()
+RUN_STARTED = "run_started"
+PLAN_CREATED = "plan_created"
+TASK_STARTED = "task_started"
+TASK_FINISHED = "task_finished"
+SEARCH_RESULT = "search_result"
+RESULTS_APPENDED = "results_appended"
+REPORT_CHUNK = "report_chunk"
+RUN_FINISHED = "run_finished"
+
+
+def _emit_event(event_type: str, **payload):
+    """Streams a progress event to graph consumers using the `custom` stream mode."""
+    try:
+        writer = get_stream_writer()
+    except Exception:  # Not running inside a graph
+        return
+    writer({"type": event_type, **payload})
+
+
+def _emit_task_finished(plan: List["ResearchCategoryItem"], positions: Sequence[Tuple[int, int]]):
+    for c, t in positions:
+        _emit_event(TASK_FINISHED, **{**task_status_event(c, t, plan[c]["tasks"][t]), "type": TASK_FINISHED})
+
+
+STATIC_ANSWER_INSUFFICIENT = "INSUFFICIENT"
+
+
+async def run_static_search_task(query: str, llm: Any, static_fetcher: StaticFetcher,
+                                 llm_semaphore: Optional[asyncio.Semaphore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fast path for a search query: answers it from statically fetched pages with a single LLM call,
+    made within the run's `llm_semaphore`. Returns None when no usable page was found or the pages
+    do not answer the query, so the query escalates to a browser agent.
+    """
+    pages = await static_fetcher.fetch(query)
+    if not pages:
+        return None
+    sources = "".join(
+        f"### Source {i + 1}: {page['title']}\nURL: {page['url']}\n{page['text']}\n\n" for i, page in enumerate(pages)
+    )
+    messages = [
+        SystemMessage(content="You are a research assistant answering a web search query from fetched pages only."),
+        HumanMessage(content=(
+            f"Search query: {query}\n\n{sources}"
+            "Summarize what these pages say about the search query, with concrete facts and the URLs of the "
+            f"sources you used. If the pages do not answer the query, reply with only {STATIC_ANSWER_INSUFFICIENT}."
+        )),
+    ]
+    response = await _ainvoke_with_budget(llm, messages, llm_semaphore)
+    answer = str(response.content).strip()
+    if not answer or answer.upper().startswith(STATIC_ANSWER_INSUFFICIENT):
+        logger.info(f"Static pages do not answer '{query}', escalating to the browser agent.")
+        return None
+    return {
+        "query": query,
+        "result": answer,
+        "status": "completed",
+        "source": "static",
+        "urls": [page["url"] for page in pages],
+    }
+
+
+def _untrack_browser_session(task_id: str, task: asyncio.Task):
+    sessions = _BROWSER_SESSION_TASKS.get(task_id)
+    if sessions is not None:
+        sessions.discard(task)
+        if not sessions:
+            del _BROWSER_SESSION_TASKS[task_id]
+
+
+async def iter_browser_search(
         queries: List[str],
-        task_id: str,  # Injected dependency
-        llm: Any,  # Injected dependency
+        task_id: str,
+        llm: Any,
         browser_config: Dict[str, Any],
         stop_event: threading.Event,
-        max_parallel_browsers: int = 1,
-) -> List[Dict[str, Any]]:
+        semaphore: asyncio.Semaphore,
+        browser_pool: Optional[BrowserPool] = None,
+        search_cache: Optional[SearchResultCache] = None,
+        metrics: Optional[RunMetrics] = None,
+        static_fetcher: Optional[StaticFetcher] = None,
+        static_semaphore: Optional[asyncio.Semaphore] = None,
+        llm_semaphore: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
     """
-    Internal function to execute parallel browser searches based on LLM-provided queries.
-    Handles concurrency and stop signals.
+    Runs every query through a bounded work queue and yields `(query_index, result)`
+    pairs as soon as each search finishes. Queries found in `search_cache` skip the browser,
+    and with a `static_fetcher` a query only takes a browser if plain HTTP fetches cannot answer it.
+    Static fetches are bounded by `static_semaphore`. Their LLM calls and those of the browser
+    agents take a slot of `llm_semaphore`.
     """
-
-    # Limit queries just in case LLM ignores the description
-    queries = queries[:max_parallel_browsers]
-    logger.info(
-        f"[Browser Tool {task_id}] Running search for {len(queries)} queries: {queries}"
-    )
-
-    results = []
-    semaphore = asyncio.Semaphore(max_parallel_browsers)
-
-    async def task_wrapper(query):
+    browser_llm = limit_llm_concurrency(llm, llm_semaphore)
+
+    async def task_wrapper(query: str) -> Dict[str, Any]:
+        if search_cache:
+            cached = search_cache.get(query)
+            if cached is not None:
+                logger.info(f"[Browser Tool {task_id}] Search cache hit for query: {query}")
+                if metrics:
+                    metrics.increment("search_cache_hits")
+                return {"query": query, "result": cached["result"], "status": "completed", "cached": True}
+        result = None
+        if static_fetcher and not stop_event.is_set():
+            async with static_semaphore if static_semaphore else nullcontext():
+                with metrics_span(metrics, "static_fetch", query) as span:
+                    try:
+                        result = await run_static_search_task(query, llm, static_fetcher, llm_semaphore)
+                    except Exception as e:
+                        logger.warning(f"[Browser Tool {task_id}] Static fetch failed for query '{query}': {e}")
+                    span["status"] = "completed" if result else "escalated"
+            if result and metrics:
+                metrics.increment("static_fetch_hits")
+        if result is None:
+            result = await browser_task(query)
+        if search_cache and result.get("status") == "completed" and result.get("result"):
+            search_cache.put(query, {"query": query, "result": result["result"]})
+        return result
+
+    async def browser_task(query: str) -> Dict[str, Any]:
         async with semaphore:
             if stop_event.is_set():
                 logger.info(
@@ -229,38 +428,91 @@ async def _run_browser_search_tool(
                 )
                 return {"query": query, "result": None, "status": "cancelled"}
             # Pass necessary injected configs and the stop event
-            return await run_single_browser_task(
-                query,
-                task_id,
-                llm,  # Pass the main LLM (or a dedicated one if needed)
-                browser_config,
-                stop_event,
-                # use_vision could be added here if needed
-            )
-
-    tasks = [task_wrapper(query) for query in queries]
-    search_results = await asyncio.gather(*tasks, return_exceptions=True)
+            with metrics_span(metrics, "browser_session", query) as span:
+                result = await run_single_browser_task(
+                    query,
+                    task_id,
+                    browser_llm,  # The main LLM, within the run's LLM call budget
+                    browser_config,
+                    stop_event,
+                    # use_vision could be added here if needed
+                    browser_pool=browser_pool,
+                )
+                span["status"] = result.get("status", "failed")
+        return result
 
-    processed_results = []
-    for i, res in enumerate(search_results):
-        query = queries[i]  # Get corresponding query
-        if isinstance(res, Exception):
+    async def indexed(index: int, query: str) -> Tuple[int, Dict[str, Any]]:
+        try:
+            res = await task_wrapper(query)
+        except Exception as e:
             logger.error(
-                f"[Browser Tool {task_id}] Gather caught exception for query '{query}': {res}",
+                f"[Browser Tool {task_id}] Caught exception for query '{query}': {e}",
                 exc_info=True,
             )
-            processed_results.append(
-                {"query": query, "error": str(res), "status": "failed"}
-            )
-        elif isinstance(res, dict):
-            processed_results.append(res)
-        else:
+            res = {"query": query, "error": str(e), "status": "failed"}
+        if not isinstance(res, dict):
             logger.error(
                 f"[Browser Tool {task_id}] Unexpected result type for query '{query}': {type(res)}"
             )
-            processed_results.append(
-                {"query": query, "error": "Unexpected result type", "status": "failed"}
-            )
+            res = {"query": query, "error": "Unexpected result type", "status": "failed"}
+        return index, res
+
+    pending = [asyncio.create_task(indexed(i, query)) for i, query in enumerate(queries)]
+    for task in pending:
+        _BROWSER_SESSION_TASKS.setdefault(task_id, set()).add(task)
+        task.add_done_callback(partial(_untrack_browser_session, task_id))
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _run_browser_search_tool(
+        queries: List[str],
+        task_id: str,  # Injected dependency
+        llm: Any,  # Injected dependency
+        browser_config: Dict[str, Any],
+        stop_event: threading.Event,
+        max_parallel_browsers: int = 1,
+        browser_pool: Optional[BrowserPool] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        search_cache: Optional[SearchResultCache] = None,
+        metrics: Optional[RunMetrics] = None,
+        static_fetcher: Optional[StaticFetcher] = None,
+        static_semaphore: Optional[asyncio.Semaphore] = None,
+        llm_semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Internal function to execute parallel browser searches based on LLM-provided queries.
+    Every query is run, at most `max_parallel_browsers` at a time (or as limited by the
+    shared `semaphore`), and so are static fetches (or as limited by `static_semaphore`). Each result is handed to `on_result` and streamed to the graph
+    as soon as it finishes; the returned list keeps the order of `queries`.
+    """
+    # Drop exact duplicates but keep every distinct query
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    logger.info(
+        f"[Browser Tool {task_id}] Running search for {len(queries)} queries: {queries}"
+    )
+
+    semaphore = semaphore or asyncio.Semaphore(max_parallel_browsers)
+    static_semaphore = static_semaphore or asyncio.Semaphore(max_parallel_browsers)
+    processed_results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    async for index, res in iter_browser_search(
+            queries, task_id, llm, browser_config, stop_event, semaphore, browser_pool, search_cache, metrics,
+            static_fetcher, static_semaphore, llm_semaphore
+    ):
+        processed_results[index] = res
+        _emit_event(SEARCH_RESULT, result=res)
+        if on_result:
+            try:
+                maybe_awaitable = on_result(res)
+                if inspect.isawaitable(maybe_awaitable):
+                    await maybe_awaitable
+            except Exception as e:
+                logger.error(f"[Browser Tool {task_id}] Error in result callback: {e}")
 
     logger.info(
         f"[Browser Tool {task_id}] Finished search. Results count: {len(processed_results)}"
@@ -274,11 +526,19 @@ def create_browser_search_tool(
         task_id: str,
         stop_event: threading.Event,
         max_parallel_browsers: int = 1,
+        browser_pool: Optional[BrowserPool] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        search_cache: Optional[SearchResultCache] = None,
+        metrics: Optional[RunMetrics] = None,
+        static_fetcher: Optional[StaticFetcher] = None,
+        llm_semaphore: Optional[asyncio.Semaphore] = None,
 ) -> StructuredTool:
-    """Factory function to create the browser search tool with necessary dependencies."""
+    """
+    Factory function to create the browser search tool with necessary dependencies.
+    All invocations of the returned tool share one concurrency budget of `max_parallel_browsers`
+    browser sessions and one of as many static fetches. Static fetch LLM calls take `llm_semaphore`.
+    """
     # Use partial to bind the dependencies that aren't part of the LLM call arguments
-    from functools import partial
-
     bound_tool_func = partial(
         _run_browser_search_tool,
         task_id=task_id,
@@ -286,14 +546,22 @@ def create_browser_search_tool(
         browser_config=browser_config,
         stop_event=stop_event,
         max_parallel_browsers=max_parallel_browsers,
+        browser_pool=browser_pool,
+        semaphore=asyncio.Semaphore(max_parallel_browsers),
+        on_result=on_result,
+        search_cache=search_cache,
+        metrics=metrics,
+        static_fetcher=static_fetcher,
+        static_semaphore=asyncio.Semaphore(max_parallel_browsers),
+        llm_semaphore=llm_semaphore,
     )
 
     return StructuredTool.from_function(
         coroutine=bound_tool_func,
         name="parallel_browser_search",
         description=f"""Use this tool to actively search the web for information related to a specific research task or question.
-It runs up to {max_parallel_browsers} searches in parallel using a browser agent for better results than simple scraping.
-Provide a list of distinct search queries(up to {max_parallel_browsers}) that are likely to yield relevant information.""",
+It runs every query using a browser agent for better results than simple scraping, {max_parallel_browsers} at a time.
+Provide a list of distinct search queries that are likely to yield relevant information.""",
         args_schema=BrowserSearchInput,
     )
 
@@ -320,8 +588,6 @@ class DeepResearchState(TypedDict):
     topic: str
     research_plan: List[ResearchCategoryItem]  # CHANGED
     search_results: List[Dict[str, Any]]
-    llm: Any
-    tools: List[Tool]
     output_dir: Path
     browser_config: Dict[str, Any]
     final_report: Optional[str]
@@ -330,12 +596,62 @@ class DeepResearchState(TypedDict):
     stop_requested: bool
     error_message: Optional[str]
     messages: List[BaseMessage]
+    max_concurrent_tasks: int
+    max_history_tokens: Optional[int]
+    synthesis_mode: str
+    synthesis_max_tokens: int
+    dedup_threshold: Optional[float]
+    min_information_gain: Optional[float]
+    max_browser_sessions: Optional[int]
+    max_research_tokens: Optional[int]
+
+
+# State keys that hold the settings of a run rather than its progress. A run resumed from a checkpoint
+# takes them from the current run() call.
+RUN_SETTING_KEYS = (
+    "topic", "output_dir", "browser_config", "max_concurrent_tasks", "max_history_tokens", "synthesis_mode",
+    "synthesis_max_tokens", "dedup_threshold", "min_information_gain", "max_browser_sessions",
+    "max_research_tokens",
+)
+
+# Runtime dependencies (llm, embeddings, tools and their semaphores) are not part of the state so that the
+# state can be checkpointed. They are passed to the nodes in config["configurable"].
 
 
 # --- Langgraph Nodes ---
 
 
+def _first_pending_position(plan: List[ResearchCategoryItem]) -> Tuple[int, int]:
+    """Returns the position of the first pending task, or one past the last category if there is none."""
+    for cat_idx, category in enumerate(plan):
+        for task_idx, task in enumerate(category["tasks"]):
+            if task["status"] == "pending":
+                return cat_idx, task_idx
+    return len(plan), 0
+
+
 def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
+    try:
+        replayed = replay_research_log(output_dir)
+    except Exception as e:
+        logger.error(f"Failed to replay research log in {output_dir}: {e}", exc_info=True)
+        replayed = None
+    if replayed:
+        next_cat_idx, next_task_idx = _first_pending_position(replayed["research_plan"])
+        logger.info(
+            f"Replayed research log in {output_dir}: {len(replayed['research_plan'])} categories, "
+            f"{len(replayed['search_results'])} results. Next task: Category {next_cat_idx}, Task {next_task_idx}."
+        )
+        return {
+            **replayed,
+            "current_category_index": next_cat_idx,
+            "current_task_index_in_category": next_task_idx,
+        }
+    return _load_previous_state_from_files(output_dir)
+
+
+def _load_previous_state_from_files(output_dir: str) -> Dict[str, Any]:
+    """Loads state written by runs that predate the research log from research_plan.md and search_info.json."""
     state_updates = {}
     plan_file = os.path.join(output_dir, PLAN_FILENAME)
     search_file = os.path.join(output_dir, SEARCH_INFO_FILENAME)
@@ -363,12 +679,14 @@ def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
                         category_name = line[line.find(" "):].strip()  # Get text after "## X. "
                         current_category = ResearchCategoryItem(category_name=category_name, tasks=[])
                     elif (line.startswith("- [ ]") or line.startswith("- [x]") or line.startswith(
-                            "- [-]")) and current_category:  # Task
+                            "- [-]") or line.startswith("- [~]")) and current_category:  # Task
                         status = "pending"
                         if line.startswith("- [x]"):
                             status = "completed"
                         elif line.startswith("- [-]"):
                             status = "failed"
+                        elif line.startswith("- [~]"):
+                            status = SKIPPED
 
                         task_desc = line[5:].strip()
                         current_category["tasks"].append(
@@ -419,32 +737,7 @@ def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
 
 
 def _save_plan_to_md(plan: List[ResearchCategoryItem], output_dir: str):
-    plan_file = os.path.join(output_dir, PLAN_FILENAME)
-    try:
-        with open(plan_file, "w", encoding="utf-8") as f:
-            f.write(f"# Research Plan\n\n")
-            for cat_idx, category in enumerate(plan):
-                f.write(f"## {cat_idx + 1}. {category['category_name']}\n\n")
-                for task_idx, task in enumerate(category['tasks']):
-                    marker = "- [x]" if task["status"] == "completed" else "- [ ]" if task[
-                                                                                          "status"] == "pending" else "- [-]"  # [-] for failed
-                    f.write(f"  {marker} {task['task_description']}\n")
-                f.write("\n")
-        logger.info(f"Hierarchical research plan saved to {plan_file}")
-    except Exception as e:
-        logger.error(f"Failed to save research plan to {plan_file}: {e}")
-
-
-def _save_search_results_to_json(results: List[Dict[str, Any]], output_dir: str):
-    """Appends or overwrites search results to a JSON file."""
-    search_file = os.path.join(output_dir, SEARCH_INFO_FILENAME)
-    try:
-        # Simple overwrite for now, could be append
-        with open(search_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        logger.info(f"Search results saved to {search_file}")
-    except Exception as e:
-        logger.error(f"Failed to save search results to {search_file}: {e}")
+    write_plan_markdown(output_dir, plan)
 
 
 def _save_report_to_md(report: str, output_dir: Path):
@@ -458,26 +751,36 @@ def _save_report_to_md(report: str, output_dir: Path):
         logger.error(f"Failed to save final report to {report_file}: {e}")
 
 
-async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
-    logger.info("--- Entering Planning Node ---")
-    if state.get("stop_requested"):
-        logger.info("Stop requested, skipping planning.")
-        return {"stop_requested": True}
+def _chunk_text(chunk: BaseMessage) -> str:
+    """Returns the text of a streamed message chunk, whose content may be a list of content blocks."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block) for block in chunk.content
+    )
 
-    llm = state["llm"]
-    topic = state["topic"]
-    existing_plan = state.get("research_plan")
-    output_dir = state["output_dir"]
 
-    if existing_plan and (
-            state.get("current_category_index", 0) > 0 or state.get("current_task_index_in_category", 0) > 0):
-        logger.info("Resuming with existing plan.")
-        _save_plan_to_md(existing_plan, output_dir)  # Ensure it's saved initially
-        # current_category_index and current_task_index_in_category should be set by _load_previous_state
-        return {"research_plan": existing_plan}
+async def _stream_report_to_md(llm: Any, messages: List[BaseMessage], output_dir: Path) -> str:
+    """
+    Streams the synthesis response, appending every chunk to report.md and emitting it as a
+    report_chunk event as it arrives. Returns the full report text.
+    """
+    report_file = os.path.join(output_dir, REPORT_FILENAME)
+    parts = []
+    with open(report_file, "w", encoding="utf-8") as f:
+        async for chunk in llm.astream(messages):
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            parts.append(text)
+            f.write(text)
+            f.flush()
+            _emit_event(REPORT_CHUNK, text=text)
+    return "".join(parts)
 
-    logger.info(f"Generating new research plan for topic: {topic}")
 
+async def _generate_plan(llm: Any, topic: str) -> List[ResearchCategoryItem]:
+    """Asks the LLM for a research plan and parses it. Raises json.JSONDecodeError on invalid JSON."""
     prompt_text = f"""You are a meticulous research assistant. Your goal is to create a hierarchical research plan to thoroughly investigate the topic: "{topic}".
 The plan should be structured into several main research categories. Each category should contain a list of specific, actionable research tasks or questions.
 Format the output as a JSON list of objects. Each object represents a research category and should have:
@@ -524,139 +827,261 @@ Ensure the output is a valid JSON array.
         HumanMessage(content=prompt_text)
     ]
 
-    try:
-        response = await llm.ainvoke(messages)
-        raw_content = response.content
-        # The LLM might wrap the JSON in backticks
-        if raw_content.strip().startswith("```json"):
-            raw_content = raw_content.strip()[7:-3].strip()
-        elif raw_content.strip().startswith("```"):
-            raw_content = raw_content.strip()[3:-3].strip()
-
-        logger.debug(f"LLM response for plan: {raw_content}")
-        parsed_plan_from_llm = json.loads(raw_content)
-
-        new_plan: List[ResearchCategoryItem] = []
-        for cat_idx, category_data in enumerate(parsed_plan_from_llm):
-            if not isinstance(category_data,
-                              dict) or "category_name" not in category_data or "tasks" not in category_data:
-                logger.warning(f"Skipping invalid category data: {category_data}")
-                continue
-
-            tasks: List[ResearchTaskItem] = []
-            for task_idx, task_desc in enumerate(category_data["tasks"]):
-                if isinstance(task_desc, str):
+    response = await llm.ainvoke(messages)
+    raw_content = response.content
+    # The LLM might wrap the JSON in backticks
+    if raw_content.strip().startswith("```json"):
+        raw_content = raw_content.strip()[7:-3].strip()
+    elif raw_content.strip().startswith("```"):
+        raw_content = raw_content.strip()[3:-3].strip()
+
+    logger.debug(f"LLM response for plan: {raw_content}")
+    parsed_plan_from_llm = json.loads(raw_content)
+
+    new_plan: List[ResearchCategoryItem] = []
+    for cat_idx, category_data in enumerate(parsed_plan_from_llm):
+        if not isinstance(category_data,
+                          dict) or "category_name" not in category_data or "tasks" not in category_data:
+            logger.warning(f"Skipping invalid category data: {category_data}")
+            continue
+
+        tasks: List[ResearchTaskItem] = []
+        for task_idx, task_desc in enumerate(category_data["tasks"]):
+            if isinstance(task_desc, str):
+                tasks.append(
+                    ResearchTaskItem(
+                        task_description=task_desc,
+                        status="pending",
+                        queries=None,
+                        result_summary=None,
+                    )
+                )
+            else:  # Sometimes LLM puts tasks as {"task": "description"}
+                if isinstance(task_desc, dict) and "task_description" in task_desc:
                     tasks.append(
                         ResearchTaskItem(
-                            task_description=task_desc,
+                            task_description=task_desc["task_description"],
                             status="pending",
                             queries=None,
                             result_summary=None,
                         )
                     )
-                else:  # Sometimes LLM puts tasks as {"task": "description"}
-                    if isinstance(task_desc, dict) and "task_description" in task_desc:
-                        tasks.append(
-                            ResearchTaskItem(
-                                task_description=task_desc["task_description"],
-                                status="pending",
-                                queries=None,
-                                result_summary=None,
-                            )
-                        )
-                    elif isinstance(task_desc, dict) and "task" in task_desc:  # common LLM mistake
-                        tasks.append(
-                            ResearchTaskItem(
-                                task_description=task_desc["task"],
-                                status="pending",
-                                queries=None,
-                                result_summary=None,
-                            )
+                elif isinstance(task_desc, dict) and "task" in task_desc:  # common LLM mistake
+                    tasks.append(
+                        ResearchTaskItem(
+                            task_description=task_desc["task"],
+                            status="pending",
+                            queries=None,
+                            result_summary=None,
                         )
-                    else:
-                        logger.warning(
-                            f"Skipping invalid task data: {task_desc} in category {category_data['category_name']}")
-
-            new_plan.append(
-                ResearchCategoryItem(
-                    category_name=category_data["category_name"],
-                    tasks=tasks,
-                )
+                    )
+                else:
+                    logger.warning(
+                        f"Skipping invalid task data: {task_desc} in category {category_data['category_name']}")
+
+        new_plan.append(
+            ResearchCategoryItem(
+                category_name=category_data["category_name"],
+                tasks=tasks,
             )
+        )
+    return new_plan
+
+
+def _start_plan(plan: List[ResearchCategoryItem], output_dir: Path) -> Dict[str, Any]:
+    """Saves a new plan and returns the state update that starts executing it."""
+    _save_plan_to_md(plan, output_dir)  # Save the hierarchical plan
+    append_research_events(str(output_dir), [plan_event(plan)])
+    _emit_event(PLAN_CREATED, plan=copy.deepcopy(plan), resumed=False)
+    return {
+        "research_plan": plan,
+        "current_category_index": 0,
+        "current_task_index_in_category": 0,
+        "search_results": [],
+    }
+
+
+async def _refresh_cached_plan(llm: Any, topic: str, plan_cache: PlanCache):
+    try:
+        plan = await _generate_plan(llm, topic)
+        if plan:
+            await plan_cache.store(topic, plan)
+            logger.info(f"Refreshed cached plan for topic: {topic}")
+    except Exception as e:
+        logger.warning(f"Failed to refresh cached plan for topic '{topic}': {e}")
+
+
+async def planning_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
+    logger.info("--- Entering Planning Node ---")
+    if state.get("stop_requested"):
+        logger.info("Stop requested, skipping planning.")
+        return {"stop_requested": True}
+
+    llm = config["configurable"]["llm"]
+    topic = state["topic"]
+    existing_plan = state.get("research_plan")
+    output_dir = state["output_dir"]
+
+    if existing_plan:
+        logger.info("Resuming with existing plan.")
+        _save_plan_to_md(existing_plan, output_dir)  # Ensure it's saved initially
+        _emit_event(PLAN_CREATED, plan=copy.deepcopy(existing_plan), resumed=True)
+        # current_category_index and current_task_index_in_category should be set by _load_previous_state
+        return {"research_plan": existing_plan}
+
+    plan_cache = config["configurable"].get("plan_cache")
+    if plan_cache:
+        try:
+            cached = await plan_cache.lookup(topic)
+        except Exception as e:
+            logger.warning(f"Plan cache lookup failed: {e}")
+            cached = None
+        if cached:
+            logger.info(
+                f"Reusing cached plan of topic '{cached['topic']}' (similarity {cached['similarity']:.2f})."
+            )
+            background_tasks = config["configurable"].get("background_tasks")
+            if background_tasks is not None:
+                # Refresh the cached plan for later runs, this run keeps the cached one
+                refresh = asyncio.create_task(_refresh_cached_plan(llm, topic, plan_cache))
+                background_tasks.add(refresh)
+                refresh.add_done_callback(background_tasks.discard)
+            return _start_plan(cached["plan"], output_dir)
+
+    logger.info(f"Generating new research plan for topic: {topic}")
+
+    try:
+        new_plan = await _generate_plan(llm, topic)
 
         if not new_plan:
             logger.error("LLM failed to generate a valid plan structure from JSON.")
             return {"error_message": "Failed to generate research plan structure."}
 
         logger.info(f"Generated research plan with {len(new_plan)} categories.")
-        _save_plan_to_md(new_plan, output_dir)  # Save the hierarchical plan
-
-        return {
-            "research_plan": new_plan,
-            "current_category_index": 0,
-            "current_task_index_in_category": 0,
-            "search_results": [],
-        }
+        if plan_cache:
+            try:
+                await plan_cache.store(topic, new_plan)
+            except Exception as e:
+                logger.warning(f"Failed to store plan in the plan cache: {e}")
+        return _start_plan(new_plan, output_dir)
 
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse JSON from LLM for plan: {e}. Response was: {raw_content}", exc_info=True)
+        logger.error(f"Failed to parse JSON from LLM for plan: {e}. Response was: {e.doc}", exc_info=True)
         return {"error_message": f"LLM generated invalid JSON for research plan: {e}"}
     except Exception as e:
         logger.error(f"Error during planning: {e}", exc_info=True)
         return {"error_message": f"LLM Error during planning: {e}"}
 
 
-async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
-    logger.info("--- Entering Research Execution Node ---")
-    if state.get("stop_requested"):
-        logger.info("Stop requested, skipping research execution.")
-        return {
-            "stop_requested": True,
-            "current_category_index": state["current_category_index"],
-            "current_task_index_in_category": state["current_task_index_in_category"],
-        }
+EXECUTION_SYSTEM_PROMPT = "You are a research assistant executing one task of a research plan. Focus on the current task only."
 
-    plan = state["research_plan"]
-    cat_idx = state["current_category_index"]
-    task_idx = state["current_task_index_in_category"]
-    llm = state["llm"]
-    tools = state["tools"]
-    output_dir = str(state["output_dir"])
-    task_id = state["task_id"]  # For _AGENT_STOP_FLAGS
 
-    # This check should ideally be handled by `should_continue`
-    if not plan or cat_idx >= len(plan):
-        logger.info("Research plan complete or categories exhausted.")
-        return {}  # should route to synthesis
+def _next_task_position(plan: List[ResearchCategoryItem], cat_idx: int, task_idx: int) -> Tuple[int, int]:
+    """Returns the (category, task) position that follows the given one in plan order."""
+    next_task_idx = task_idx + 1
+    next_cat_idx = cat_idx
+    if next_task_idx >= len(plan[cat_idx]["tasks"]):
+        next_cat_idx += 1
+        next_task_idx = 0
+    return next_cat_idx, next_task_idx
 
-    current_category = plan[cat_idx]
-    if task_idx >= len(current_category["tasks"]):
-        logger.info(f"All tasks in category '{current_category['category_name']}' completed. Moving to next category.")
-        # This logic is now effectively handled by should_continue and the index updates below
-        # The next iteration will be caught by should_continue or this node with updated indices
+
+def _select_task_batch(
+        plan: List[ResearchCategoryItem], cat_idx: int, task_idx: int, max_tasks: int
+) -> Tuple[List[Tuple[int, int]], Tuple[int, int]]:
+    """
+    Collects the positions of up to `max_tasks` unfinished tasks in plan order, starting at
+    the given position. Also returns the position to continue from after the batch.
+    """
+    batch = []
+    while cat_idx < len(plan) and len(batch) < max_tasks:
+        if task_idx >= len(plan[cat_idx]["tasks"]):
+            cat_idx, task_idx = cat_idx + 1, 0
+            continue
+        if plan[cat_idx]["tasks"][task_idx]["status"] not in ("completed", SKIPPED):
+            batch.append((cat_idx, task_idx))
+        cat_idx, task_idx = _next_task_position(plan, cat_idx, task_idx)
+    return batch, (cat_idx, task_idx)
+
+
+async def _ainvoke_with_budget(runnable: Any, messages: List[BaseMessage],
+                               semaphore: Optional[asyncio.Semaphore]) -> BaseMessage:
+    if semaphore is None:
+        return await runnable.ainvoke(messages)
+    async with semaphore:
+        return await runnable.ainvoke(messages)
+
+
+async def _run_tool_call(tool_call: Dict[str, Any], tools: Sequence[Tool], task_id: str,
+                         tool_semaphores: Dict[str, asyncio.Semaphore],
+                         metrics: Optional[RunMetrics] = None) -> Dict[str, Any]:
+    """
+    Executes one tool call of an LLM turn under the tool's concurrency limit.
+    Returns the ToolMessage and search result entries for the call, or `stopped` if a stop
+    was requested before the tool started.
+    """
+    tool_name = tool_call.get("name")
+    tool_args = tool_call.get("args", {})
+    tool_call_id = tool_call.get("id")
+
+    logger.info(f"LLM requested tool call: {tool_name} with args: {tool_args}")
+    selected_tool = next((t for t in tools if t.name == tool_name), None)
+
+    if not selected_tool:
+        logger.error(f"LLM called tool '{tool_name}' which is not available.")
         return {
-            "current_category_index": cat_idx + 1,
-            "current_task_index_in_category": 0,
-            "messages": state["messages"]  # Pass messages along
+            "message": ToolMessage(content=f"Error: Tool '{tool_name}' not found.", tool_call_id=tool_call_id),
+            "search_results": [],
         }
 
-    current_task = current_category["tasks"][task_idx]
+    semaphore = tool_semaphores.get(tool_name)
+    try:
+        async with semaphore if semaphore else nullcontext():
+            stop_event = _AGENT_STOP_FLAGS.get(task_id)
+            if stop_event and stop_event.is_set():
+                logger.info(f"Stop requested before executing tool: {tool_name}")
+                return {"stopped": True, "search_results": []}
+
+            logger.info(f"Executing tool: {tool_name}")
+            with metrics_span(metrics, "tool", tool_name) as span:
+                tool_output = await selected_tool.ainvoke(tool_args)
+                span["status"] = "completed"
+        logger.info(f"Tool '{tool_name}' executed successfully.")
+
+        if tool_name == "parallel_browser_search":
+            search_results = list(tool_output)  # tool_output is List[Dict]
+        else:  # For other tools, we might need specific handling or just log
+            logger.info(f"Result from tool '{tool_name}': {str(tool_output)[:200]}...")
+            # Storing non-browser results might need a different structure or key in search_results
+            search_results = [{"tool_name": tool_name, "args": tool_args, "output": str(tool_output),
+                               "status": "completed"}]
+        return {
+            "message": ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call_id),
+            "search_results": search_results,
+        }
 
-    if current_task["status"] == "completed":
-        logger.info(
-            f"Task '{current_task['task_description']}' in category '{current_category['category_name']}' already completed. Skipping.")
-        # Logic to find next task
-        next_task_idx = task_idx + 1
-        next_cat_idx = cat_idx
-        if next_task_idx >= len(current_category["tasks"]):
-            next_cat_idx += 1
-            next_task_idx = 0
+    except Exception as e:
+        logger.error(f"Error executing tool '{tool_name}': {e}", exc_info=True)
         return {
-            "current_category_index": next_cat_idx,
-            "current_task_index_in_category": next_task_idx,
-            "messages": state["messages"]  # Pass messages along
+            "message": ToolMessage(content=f"Error executing tool {tool_name}: {e}", tool_call_id=tool_call_id),
+            "search_results": [{"tool_name": tool_name, "args": tool_args, "status": "failed", "error": str(e)}],
         }
 
+
+async def _execute_research_task(state: DeepResearchState, runtime: Dict[str, Any],
+                                 cat_idx: int, task_idx: int) -> Dict[str, Any]:
+    """
+    Runs one plan task: asks the LLM for tool calls and executes them concurrently.
+    Updates the task's status in place and returns the messages of this round plus the
+    new search result entries, leaving merging into the graph state to the caller.
+    """
+    plan = state["research_plan"]
+    llm = runtime["llm"]
+    tools = runtime["tools"]
+    task_id = state["task_id"]  # For _AGENT_STOP_FLAGS
+    current_category = plan[cat_idx]
+    current_task = current_category["tasks"][task_idx]
+
     logger.info(
         f"Executing research task: '{current_task['task_description']}' (Category: '{current_category['category_name']}')"
     )
@@ -674,148 +1099,232 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
     current_task_message_history = [
         HumanMessage(content=task_prompt_content)
     ]
-    if not state["messages"]:  # First actual execution message
-        invocation_messages = [
-                                  SystemMessage(
-                                      content="You are a research assistant executing one task of a research plan. Focus on the current task only."),
-                              ] + current_task_message_history
-    else:
-        invocation_messages = state["messages"] + current_task_message_history
+    invocation_messages = state["messages"] + current_task_message_history
 
     try:
         logger.info(f"Invoking LLM with tools for task: {current_task['task_description']}")
-        ai_response: BaseMessage = await llm_with_tools.ainvoke(invocation_messages)
+        ai_response: BaseMessage = await _ainvoke_with_budget(
+            llm_with_tools, invocation_messages, runtime.get("llm_semaphore")
+        )
         logger.info("LLM invocation complete.")
 
         tool_results = []
-        executed_tool_names = []
-        current_search_results = state.get("search_results", [])  # Get existing search results
+        new_search_results = []
 
         if not isinstance(ai_response, AIMessage) or not ai_response.tool_calls:
             logger.warning(
                 f"LLM did not call any tool for task '{current_task['task_description']}'. Response: {ai_response.content[:100]}..."
             )
-            current_task["status"] = "pending"  # Or "completed_no_tool" if LLM explains it's done
+            # The LLM considers the task covered by earlier findings
+            current_task["status"] = "completed"
             current_task["result_summary"] = f"LLM did not use a tool. Response: {ai_response.content}"
-            current_task["current_category_index"] = cat_idx
-            current_task["current_task_index_in_category"] = task_idx
-            return current_task
-            # We still save the plan and advance.
-        else:
-            # Process tool calls
-            for tool_call in ai_response.tool_calls:
-                tool_name = tool_call.get("name")
-                tool_args = tool_call.get("args", {})
-                tool_call_id = tool_call.get("id")
-
-                logger.info(f"LLM requested tool call: {tool_name} with args: {tool_args}")
-                executed_tool_names.append(tool_name)
-                selected_tool = next((t for t in tools if t.name == tool_name), None)
-
-                if not selected_tool:
-                    logger.error(f"LLM called tool '{tool_name}' which is not available.")
-                    tool_results.append(
-                        ToolMessage(content=f"Error: Tool '{tool_name}' not found.", tool_call_id=tool_call_id))
-                    continue
-
-                try:
-                    stop_event = _AGENT_STOP_FLAGS.get(task_id)
-                    if stop_event and stop_event.is_set():
-                        logger.info(f"Stop requested before executing tool: {tool_name}")
-                        current_task["status"] = "pending"  # Or a new "stopped" status
-                        _save_plan_to_md(plan, output_dir)
-                        return {"stop_requested": True, "research_plan": plan, "current_category_index": cat_idx,
-                                "current_task_index_in_category": task_idx}
-
-                    logger.info(f"Executing tool: {tool_name}")
-                    tool_output = await selected_tool.ainvoke(tool_args)
-                    logger.info(f"Tool '{tool_name}' executed successfully.")
-
-                    if tool_name == "parallel_browser_search":
-                        current_search_results.extend(tool_output)  # tool_output is List[Dict]
-                    else:  # For other tools, we might need specific handling or just log
-                        logger.info(f"Result from tool '{tool_name}': {str(tool_output)[:200]}...")
-                        # Storing non-browser results might need a different structure or key in search_results
-                        current_search_results.append(
-                            {"tool_name": tool_name, "args": tool_args, "output": str(tool_output),
-                             "status": "completed"})
-
-                    tool_results.append(ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call_id))
-
-                except Exception as e:
-                    logger.error(f"Error executing tool '{tool_name}': {e}", exc_info=True)
-                    tool_results.append(
-                        ToolMessage(content=f"Error executing tool {tool_name}: {e}", tool_call_id=tool_call_id))
-                    current_search_results.append(
-                        {"tool_name": tool_name, "args": tool_args, "status": "failed", "error": str(e)})
-
-            # After processing all tool calls for this task
-            step_failed_tool_execution = any("Error:" in str(tr.content) for tr in tool_results)
-            # Consider a task successful if a browser search was attempted and didn't immediately error out during call
-            # The browser search itself returns status for each query.
-            browser_tool_attempted_successfully = "parallel_browser_search" in executed_tool_names and not step_failed_tool_execution
-
-            if step_failed_tool_execution:
-                current_task["status"] = "failed"
-                current_task[
-                    "result_summary"] = f"Tool execution failed. Errors: {[tr.content for tr in tool_results if 'Error' in str(tr.content)]}"
-            elif executed_tool_names:  # If any tool was called
-                current_task["status"] = "completed"
-                current_task["result_summary"] = f"Executed tool(s): {', '.join(executed_tool_names)}."
-                # TODO: Could ask LLM to summarize the tool_results for this task if needed, rather than just listing tools.
-            else:  # No tool calls but AI response had .tool_calls structure (empty)
-                current_task["status"] = "failed"  # Or a more specific status
-                current_task["result_summary"] = "LLM prepared for tool call but provided no tools."
-
-        # Save progress
-        _save_plan_to_md(plan, output_dir)
-        _save_search_results_to_json(current_search_results, output_dir)
-
-        # Determine next indices
-        next_task_idx = task_idx + 1
-        next_cat_idx = cat_idx
-        if next_task_idx >= len(current_category["tasks"]):
-            next_cat_idx += 1
-            next_task_idx = 0
-
-        updated_messages = state["messages"] + current_task_message_history + [ai_response] + tool_results
+            return {"messages": current_task_message_history + [ai_response], "search_results": []}
+
+        # Process tool calls concurrently, the turn takes as long as its slowest tool.
+        # Outcomes come back in tool call order, so the ToolMessages follow the AIMessage's calls.
+        executed_tool_names = [tool_call.get("name") for tool_call in ai_response.tool_calls]
+        outcomes = await asyncio.gather(*[
+            _run_tool_call(tool_call, tools, task_id, runtime.get("tool_semaphores") or {}, runtime.get("metrics"))
+            for tool_call in ai_response.tool_calls
+        ])
+        for outcome in outcomes:
+            new_search_results.extend(outcome["search_results"])
+            if "message" in outcome:
+                tool_results.append(outcome["message"])
+
+        if any(outcome.get("stopped") for outcome in outcomes):
+            current_task["status"] = "pending"  # Or a new "stopped" status
+            return {"stop_requested": True, "messages": [], "search_results": new_search_results}
+
+        # After processing all tool calls for this task
+        step_failed_tool_execution = any("Error:" in str(tr.content) for tr in tool_results)
+
+        if step_failed_tool_execution:
+            current_task["status"] = "failed"
+            current_task[
+                "result_summary"] = f"Tool execution failed. Errors: {[tr.content for tr in tool_results if 'Error' in str(tr.content)]}"
+        elif executed_tool_names:  # If any tool was called
+            current_task["status"] = "completed"
+            current_task["result_summary"] = f"Executed tool(s): {', '.join(executed_tool_names)}."
+            # TODO: Could ask LLM to summarize the tool_results for this task if needed, rather than just listing tools.
+        else:  # No tool calls but AI response had .tool_calls structure (empty)
+            current_task["status"] = "failed"  # Or a more specific status
+            current_task["result_summary"] = "LLM prepared for tool call but provided no tools."
 
         return {
-            "research_plan": plan,
-            "search_results": current_search_results,
-            "current_category_index": next_cat_idx,
-            "current_task_index_in_category": next_task_idx,
-            "messages": updated_messages,
+            "messages": current_task_message_history + [ai_response] + tool_results,
+            "search_results": new_search_results,
         }
 
     except Exception as e:
         logger.error(f"Unhandled error during research execution for task '{current_task['task_description']}': {e}",
                      exc_info=True)
         current_task["status"] = "failed"
-        _save_plan_to_md(plan, output_dir)
-        # Determine next indices even on error to attempt to move on
-        next_task_idx = task_idx + 1
-        next_cat_idx = cat_idx
-        if next_task_idx >= len(current_category["tasks"]):
-            next_cat_idx += 1
-            next_task_idx = 0
+        return {
+            "error_message": f"Core Execution Error on task '{current_task['task_description']}': {e}",
+            "messages": current_task_message_history,  # Preserve messages up to error
+            "search_results": [],
+        }
+
+
+async def _skip_low_gain_categories(
+        plan: List[ResearchCategoryItem],
+        batch: List[Tuple[int, int]],
+        outcomes: List[Dict[str, Any]],
+        prior_results: List[Dict[str, Any]],
+        min_gain: float,
+        embeddings: Optional[Embeddings],
+) -> List[Tuple[int, int]]:
+    """
+    Scores each completed task of the batch, in plan order, against the findings before it.
+    The pending tasks of a category are skipped once one of its tasks adds less than `min_gain`.
+    """
+    prior_results = list(prior_results)
+    skipped = []
+    for (c, t), outcome in zip(batch, outcomes):
+        task = plan[c]["tasks"][t]
+        if task["status"] == "completed":
+            gain = await score_information_gain(outcome["search_results"], prior_results, embeddings)
+            if gain is not None:
+                task["result_summary"] = f"{task['result_summary'] or ''} Information gain: {gain:.2f}.".strip()
+                if gain < min_gain:
+                    logger.info(f"Task '{task['task_description']}' added little new information ({gain:.2f}), "
+                                f"skipping the rest of category '{plan[c]['category_name']}'.")
+                    skipped += skip_pending_tasks(
+                        plan, f"low information gain ({gain:.2f}) in this category.", cat_idx=c
+                    )
+        prior_results.extend(outcome["search_results"])
+    return skipped
+
+
+async def research_execution_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Executes the next unfinished plan task, or the next `max_concurrent_tasks` of them
+    concurrently. Results are merged back in plan order, so the outcome does not depend
+    on which task finishes first.
+    """
+    logger.info("--- Entering Research Execution Node ---")
+    if state.get("stop_requested"):
+        logger.info("Stop requested, skipping research execution.")
+        return {
+            "stop_requested": True,
+            "current_category_index": state["current_category_index"],
+            "current_task_index_in_category": state["current_task_index_in_category"],
+        }
+
+    plan = state["research_plan"]
+    cat_idx = state["current_category_index"]
+    task_idx = state["current_task_index_in_category"]
+    output_dir = str(state["output_dir"])
+
+    # This check should ideally be handled by `should_continue`
+    if not plan or cat_idx >= len(plan):
+        logger.info("Research plan complete or categories exhausted.")
+        return {}  # should route to synthesis
+
+    runtime = config["configurable"]
+    budget_reason = exhausted_budget(
+        runtime.get("metrics"), state.get("max_browser_sessions"), state.get("max_research_tokens")
+    )
+    if budget_reason:
+        skipped = skip_pending_tasks(plan, budget_reason)
+        logger.info(f"Research budget exhausted, skipping {len(skipped)} remaining task(s): {budget_reason}")
+        if runtime.get("metrics"):
+            runtime["metrics"].increment("tasks_skipped", len(skipped))
+        append_research_events(output_dir, [task_status_event(c, t, plan[c]["tasks"][t]) for c, t in skipped])
+        _emit_task_finished(plan, skipped)
         return {
             "research_plan": plan,
+            "current_category_index": len(plan),
+            "current_task_index_in_category": 0,
+        }
+
+    max_tasks = max(1, state.get("max_concurrent_tasks") or 1)
+    batch, (next_cat_idx, next_task_idx) = _select_task_batch(plan, cat_idx, task_idx, max_tasks)
+    if not batch:
+        logger.info("All remaining tasks in the plan are already completed.")
+        return {
             "current_category_index": next_cat_idx,
             "current_task_index_in_category": next_task_idx,
-            "error_message": f"Core Execution Error on task '{current_task['task_description']}': {e}",
-            "messages": state["messages"] + current_task_message_history  # Preserve messages up to error
         }
 
+    base_messages = compact_messages(
+        state["messages"] or [SystemMessage(content=EXECUTION_SYSTEM_PROMPT)], state.get("max_history_tokens")
+    )
+    task_state = {**state, "messages": base_messages}
+    if len(batch) > 1:
+        logger.info(f"Executing {len(batch)} research tasks concurrently: {batch}")
+    for c, t in batch:
+        _emit_event(TASK_STARTED, category_index=c, task_index=t, category=plan[c]["category_name"],
+                    task=plan[c]["tasks"][t]["task_description"])
+    outcomes = await asyncio.gather(*[_execute_research_task(task_state, runtime, c, t) for c, t in batch])
+    for (c, t), outcome in zip(batch, outcomes):
+        for entry in outcome["search_results"]:
+            entry.setdefault("category", plan[c]["category_name"])
+            entry.setdefault("task", plan[c]["tasks"][t]["task_description"])
+
+    search_results = list(state.get("search_results", []))
+    updated_messages = list(base_messages)
+    stop_requested = False
+    error_message = None
+    for outcome in outcomes:
+        search_results.extend(outcome["search_results"])
+        updated_messages.extend(outcome["messages"])
+        stop_requested = stop_requested or outcome.get("stop_requested", False)
+        error_message = error_message or outcome.get("error_message")
+    # Tool payloads of this step are now recorded in search_results and can be compacted
+    updated_messages = compact_messages(updated_messages, state.get("max_history_tokens"))
+
+    skipped = []
+    min_gain = state.get("min_information_gain")
+    if min_gain is not None and not stop_requested:
+        skipped = await _skip_low_gain_categories(
+            plan, batch, outcomes, state.get("search_results", []), min_gain, runtime.get("embeddings")
+        )
+        if runtime.get("metrics"):
+            runtime["metrics"].increment("tasks_skipped", len(skipped))
+
+    # Save progress: only this step's changes are appended to the log. research_plan.md and
+    # search_info.json are refreshed when the log is compacted, and at the end of the run.
+    events = [task_status_event(c, t, plan[c]["tasks"][t]) for c, t in batch + skipped]
+    events += [result_event(entry) for outcome in outcomes for entry in outcome["search_results"]]
+    if append_research_events(output_dir, events):
+        await asyncio.to_thread(compact_research_log, output_dir)
+    _emit_task_finished(plan, batch + skipped)
+    new_results = search_results[len(state.get("search_results", [])):]
+    if new_results:
+        _emit_event(RESULTS_APPENDED, results=new_results, total=len(search_results))
+
+    update = {
+        "research_plan": plan,
+        "search_results": search_results,
+        "current_category_index": next_cat_idx,
+        "current_task_index_in_category": next_task_idx,
+        "messages": updated_messages,
+    }
+    if stop_requested:
+        # Resume from the first task of the batch that did not get to run
+        stopped_at = next(
+            ((c, t) for c, t in batch if plan[c]["tasks"][t]["status"] == "pending"), (next_cat_idx, next_task_idx)
+        )
+        update.update(
+            stop_requested=True,
+            current_category_index=stopped_at[0],
+            current_task_index_in_category=stopped_at[1],
+        )
+    if error_message:
+        update["error_message"] = error_message
+    return update
+
 
-async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
+async def synthesis_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
     """Synthesizes the final report from the collected search results."""
     logger.info("--- Entering Synthesis Node ---")
     if state.get("stop_requested"):
         logger.info("Stop requested, skipping synthesis.")
         return {"stop_requested": True}
 
-    llm = state["llm"]
+    llm = config["configurable"]["llm"]
     topic = state["topic"]
     search_results = state.get("search_results", [])
     output_dir = state["output_dir"]
@@ -831,42 +1340,40 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         f"Synthesizing report from {len(search_results)} collected search result entries."
     )
 
+    # Merge overlapping findings from different queries, the state keeps the raw results
+    dedup_threshold = state.get("dedup_threshold")
+    if dedup_threshold is not None:
+        try:
+            search_results = await dedup_findings(
+                search_results, dedup_threshold, config["configurable"].get("embeddings")
+            )
+        except Exception as e:
+            logger.warning(f"Finding dedup failed, synthesizing from all results: {e}", exc_info=True)
+
     # Prepare context for the LLM
-    # Format search results nicely, maybe group by query or original plan step
-    formatted_results = ""
+    synthesis_mode = state.get("synthesis_mode") or "auto"
+    formatted_results = format_search_results(search_results)
+    max_tokens = state.get("synthesis_max_tokens") or 24000
+    if synthesis_mode == "map_reduce" or (synthesis_mode == "auto" and estimate_tokens(formatted_results) > max_tokens):
+        logger.info("Using map-reduce synthesis: summarizing findings per category first.")
+        try:
+            formatted_results = await map_category_summaries(
+                llm, topic, search_results, plan, str(output_dir),
+                chunk_tokens=max_tokens // 4,
+                semaphore=config["configurable"].get("llm_semaphore"),
+                metrics=config["configurable"].get("metrics"),
+            )
+        except Exception as e:
+            logger.error(f"Error during map step of synthesis: {e}", exc_info=True)
+            return {"error_message": f"LLM Error during synthesis: {e}"}
     references = {}
-    ref_count = 1
-    for i, result_entry in enumerate(search_results):
-        query = result_entry.get("query", "Unknown Query")  # From parallel_browser_search
-        tool_name = result_entry.get("tool_name")  # From other tools
-        status = result_entry.get("status", "unknown")
-        result_data = result_entry.get("result")  # From BrowserUseAgent's final_result
-        tool_output_str = result_entry.get("output")  # From other tools
-
-        if tool_name == "parallel_browser_search" and status == "completed" and result_data:
-            # result_data is the summary from BrowserUseAgent
-            formatted_results += f'### Finding from Web Search Query: "{query}"\n'
-            formatted_results += f"- **Summary:**\n{result_data}\n"  # result_data is already a summary string here
-            # If result_data contained title/URL, you'd format them here.
-            # The current BrowserUseAgent returns a string summary directly as 'final_data' in run_single_browser_task
-            formatted_results += "---\n"
-        elif tool_name != "parallel_browser_search" and status == "completed" and tool_output_str:
-            formatted_results += f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n'
-            formatted_results += f"- **Output:**\n{tool_output_str}\n"
-            formatted_results += "---\n"
-        elif status == "failed":
-            error = result_entry.get("error")
-            q_or_t = f"Query: \"{query}\"" if query != "Unknown Query" else f"Tool: \"{tool_name}\""
-            formatted_results += f'### Failed {q_or_t}\n'
-            formatted_results += f"- **Error:** {error}\n"
-            formatted_results += "---\n"
 
     # Prepare the research plan context
     plan_summary = "\nResearch Plan Followed:\n"
     for cat_idx, category in enumerate(plan):
         plan_summary += f"\n#### Category {cat_idx + 1}: {category['category_name']}\n"
         for task_idx, task in enumerate(category['tasks']):
-            marker = "[x]" if task["status"] == "completed" else "[ ]" if task["status"] == "pending" else "[-]"
+            marker = PLAN_MARKERS.get(task["status"], "[-]")
             plan_summary += f"  - {marker} {task['task_description']}\n"
 
     synthesis_prompt = ChatPromptTemplate.from_messages(
@@ -886,7 +1393,7 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
             ),
             (
                 "human",
-                f"""
+                """
             **Research Topic:** {topic}
 
             {plan_summary}
@@ -903,14 +1410,16 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
     )
 
     try:
-        response = await llm.ainvoke(
+        # Stream the report so report.md and stream listeners see it while it is being written
+        final_report_md = await _stream_report_to_md(
+            llm,
             synthesis_prompt.format_prompt(
                 topic=topic,
                 plan_summary=plan_summary,
                 formatted_results=formatted_results,
-            ).to_messages()
+            ).to_messages(),
+            output_dir,
         )
-        final_report_md = response.content
 
         # Append the reference list automatically to the end of the generated markdown
         if references:
@@ -932,6 +1441,27 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         return {"error_message": f"LLM Error during synthesis: {e}"}
 
 
+def _instrumented(name: str, node: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wraps a graph node so its wall time is recorded in the run's metrics. A cancelled node is also
+    noted in the run's "cancelled_nodes", since LangGraph's custom stream does not raise it.
+    """
+
+    async def run_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
+        with metrics_span(config["configurable"].get("metrics"), "node", name) as span:
+            try:
+                update = await node(state, config)
+            except asyncio.CancelledError:
+                cancelled_nodes = config["configurable"].get("cancelled_nodes")
+                if cancelled_nodes is not None:
+                    cancelled_nodes.append(name)
+                raise
+            span["status"] = "failed" if update.get("error_message") else "completed"
+            return update
+
+    return run_node
+
+
 # --- Langgraph Edges and Conditional Logic ---
 
 
@@ -985,6 +1515,27 @@ class DeepResearchAgent:
             llm: Any,
             browser_config: Dict[str, Any],
             mcp_server_config: Optional[Dict[str, Any]] = None,
+            use_browser_pool: bool = True,
+            browser_pool_max_uses: int = 10,
+            contexts_per_browser: int = 1,
+            max_history_tokens: Optional[int] = 8000,
+            synthesis_mode: str = "auto",
+            synthesis_max_tokens: int = 24000,
+            enable_checkpointing: bool = False,
+            search_cache_ttl_seconds: Optional[float] = 7 * 24 * 3600,
+            search_cache_max_entries: int = 5000,
+            dedup_threshold: Optional[float] = 0.85,
+            embeddings: Optional[Embeddings] = None,
+            plan_cache_threshold: Optional[float] = None,
+            refresh_cached_plans: bool = False,
+            adaptive_depth: bool = False,
+            min_information_gain: float = 0.2,
+            max_browser_sessions: Optional[int] = None,
+            max_research_tokens: Optional[int] = None,
+            use_static_fetch: bool = False,
+            static_fetcher: Optional[StaticFetcher] = None,
+            stop_grace_seconds: float = 0.5,
+            shutdown_timeout: float = 5.0,
     ):
         """
         Initializes the DeepSearchAgent.
@@ -994,19 +1545,89 @@ class DeepResearchAgent:
             browser_config: Configuration dictionary for the BrowserUseAgent tool.
                             Example: {"headless": True, "window_width": 1280, ...}
             mcp_server_config: Optional configuration for the MCP client.
+            use_browser_pool: Reuse warm browsers across searches instead of launching one per query.
+            browser_pool_max_uses: Number of searches a pooled browser serves before it is recycled.
+            contexts_per_browser: Parallel searches sharing one pooled browser process, each in its own
+                                  context. max_parallel_browsers searches then need only
+                                  max_parallel_browsers / contexts_per_browser browsers.
+            max_history_tokens: Approximate token budget for the research message history. Older task
+                                rounds are summarized once it is exceeded. None disables summarization.
+            synthesis_mode: "single" writes the report in one LLM call, "map_reduce" first summarizes each
+                            category in parallel, "auto" switches to map-reduce when the findings exceed
+                            synthesis_max_tokens.
+            synthesis_max_tokens: Approximate token size of the findings a single synthesis call may receive.
+            enable_checkpointing: Checkpoint every graph step to a SQLite file in the task directory, so
+                                  resuming a task continues at the interrupted node with its messages.
+                                  Off by default: every checkpoint stores the full results and message
+                                  history, so the file grows quadratically with the plan size. Without it,
+                                  resuming replays the research log and starts a fresh message history.
+            search_cache_ttl_seconds: Lifetime of cached browser search results, shared across runs in the
+                                      same save directory. 0 disables the cache, None never expires entries.
+            search_cache_max_entries: Number of cached search results kept before the least recently used
+                                      ones are evicted.
+            dedup_threshold: Cosine similarity at which findings are merged as near-duplicates before
+                             synthesis. None sends every finding to the synthesis LLM.
+            embeddings: Embeddings used to compare findings and topics. Defaults to local hashing embeddings.
+            plan_cache_threshold: Topic similarity at which the plan of an earlier topic in the same save
+                                  directory is reused instead of asking the LLM for a new one. None (the
+                                  default) disables the plan cache. Similarity is lexical, so related but
+                                  different topics (e.g. "software testing" and "software security") can
+                                  reach 0.8; use a threshold close to 1 to reuse only reworded topics.
+            refresh_cached_plans: When a cached plan is reused, also ask the LLM for a new plan in the
+                                  background and store it for later runs.
+            adaptive_depth: Score every finished task for the new information it found. Once a task scores
+                            below min_information_gain, the remaining tasks of its category are skipped.
+            min_information_gain: Novelty score (0-1) a task must reach to keep its category going.
+            max_browser_sessions: Browser sessions a run may start. Remaining tasks are skipped once used up.
+            max_research_tokens: LLM tokens (as reported by the provider) a run may use before remaining
+                                 tasks are skipped. Both budgets are checked before each research step.
+            use_static_fetch: Try to answer each search query from plain HTTP fetches of search results before
+                              starting a browser agent for it. Off by default: it sends every query to the
+                              static_fetcher's search engine and adds an LLM call per query.
+            static_fetcher: Fetcher for the static fast path, e.g. with another search URL. Defaults to a
+                            StaticFetcher on the DuckDuckGo HTML endpoint.
+            stop_grace_seconds: Time stop() gives in-flight work to finish before cancelling it.
+            shutdown_timeout: Time stop() waits for cancelled work to wind down before killing the
+                              task's browsers.
         """
         self.llm = llm
         self.browser_config = browser_config
         self.mcp_server_config = mcp_server_config
+        self.use_browser_pool = use_browser_pool
+        self.browser_pool_max_uses = browser_pool_max_uses
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.browser_pool: Optional[BrowserPool] = None
+        self.max_history_tokens = max_history_tokens
+        self.synthesis_mode = synthesis_mode
+        self.synthesis_max_tokens = synthesis_max_tokens
+        self.enable_checkpointing = enable_checkpointing
+        self.search_cache_ttl_seconds = search_cache_ttl_seconds
+        self.search_cache_max_entries = search_cache_max_entries
+        self.search_cache: Optional[SearchResultCache] = None
+        self.dedup_threshold = dedup_threshold
+        self.embeddings = embeddings
+        self.plan_cache_threshold = plan_cache_threshold
+        self.refresh_cached_plans = refresh_cached_plans
+        self.adaptive_depth = adaptive_depth
+        self.min_information_gain = min_information_gain
+        self.max_browser_sessions = max_browser_sessions
+        self.max_research_tokens = max_research_tokens
+        self.static_fetcher = (static_fetcher or StaticFetcher()) if use_static_fetch else None
+        self.stop_grace_seconds = stop_grace_seconds
+        self.shutdown_timeout = shutdown_timeout
+        self.plan_cache: Optional[PlanCache] = None
         self.mcp_client = None
         self.stopped = False
         self.graph = self._compile_graph()
         self.current_task_id: Optional[str] = None
         self.stop_event: Optional[threading.Event] = None
         self.runner: Optional[asyncio.Task] = None  # To hold the asyncio task for run
+        self._event_listeners: List[asyncio.Queue] = []
+        self.metrics: Optional[RunMetrics] = None
 
     async def _setup_tools(
-            self, task_id: str, stop_event: threading.Event, max_parallel_browsers: int = 1
+            self, task_id: str, stop_event: threading.Event, max_parallel_browsers: int = 1,
+            llm_semaphore: Optional[asyncio.Semaphore] = None,
     ) -> List[Tool]:
         """Sets up the basic tools (File I/O) and optional MCP tools."""
         tools = [
@@ -1020,6 +1641,11 @@ class DeepResearchAgent:
             task_id=task_id,
             stop_event=stop_event,
             max_parallel_browsers=max_parallel_browsers,
+            browser_pool=self.browser_pool,
+            search_cache=self.search_cache,
+            metrics=self.metrics,
+            static_fetcher=self.static_fetcher,
+            llm_semaphore=llm_semaphore,
         )
         tools += [browser_use_tool]
         # Add MCP tools if config is provided
@@ -1047,14 +1673,14 @@ class DeepResearchAgent:
             await self.mcp_client.__aexit__(None, None, None)
             self.mcp_client = None
 
-    def _compile_graph(self) -> StateGraph:
-        """Compiles the Langgraph state machine."""
+    def _compile_graph(self, checkpointer: Any = None) -> StateGraph:
+        """Compiles the Langgraph state machine, optionally checkpointing every node transition."""
         workflow = StateGraph(DeepResearchState)
 
         # Add nodes
-        workflow.add_node("plan_research", planning_node)
-        workflow.add_node("execute_research", research_execution_node)
-        workflow.add_node("synthesize_report", synthesis_node)
+        workflow.add_node("plan_research", _instrumented("plan_research", planning_node))
+        workflow.add_node("execute_research", _instrumented("execute_research", research_execution_node))
+        workflow.add_node("synthesize_report", _instrumented("synthesize_report", synthesis_node))
         workflow.add_node(
             "end_run", lambda state: logger.info("--- Reached End Run Node ---") or {}
         )  # Simple end node
@@ -1079,15 +1705,54 @@ class DeepResearchAgent:
 
         workflow.add_edge("synthesize_report", "end_run")  # End after synthesis
 
-        app = workflow.compile()
+        app = workflow.compile(checkpointer=checkpointer)
         return app
 
+    @asynccontextmanager
+    async def _open_checkpointer(self, output_dir: str):
+        """Yields a SQLite checkpointer stored in the task directory, or None if checkpointing is off."""
+        if not self.enable_checkpointing:
+            yield None
+            return
+        if AsyncSqliteSaver is None:
+            logger.warning("langgraph-checkpoint-sqlite is not installed, running without checkpoints.")
+            yield None
+            return
+        async with AsyncSqliteSaver.from_conn_string(os.path.join(output_dir, CHECKPOINT_FILENAME)) as saver:
+            yield saver
+
+    @staticmethod
+    async def _prepare_checkpoint_resume(graph: Any, config: RunnableConfig, settings: Dict[str, Any]) -> bool:
+        """
+        Checks the task's checkpointed thread and readies it for resuming with the `settings` of the
+        current run (see RUN_SETTING_KEYS), which replace the ones the thread was started with.
+        Returns True if the graph should continue the thread instead of starting from the initial state.
+        """
+        snapshot = await graph.aget_state(config)
+        values = snapshot.values or {}
+        if snapshot.next:
+            logger.info(f"Resuming interrupted run at node(s) {snapshot.next} from its last checkpoint.")
+            # Written as the node that produced the checkpoint, so the thread still continues at snapshot.next
+            await graph.aupdate_state(config, settings)
+            return True
+        if values.get("research_plan") and not values.get("final_report"):
+            # The run was stopped or ended on an error: continue executing the plan it left behind
+            logger.info("Resuming stopped run from its last checkpoint.")
+            await graph.aupdate_state(config, {**settings, "stop_requested": False, "error_message": None},
+                                      as_node="plan_research")
+            return True
+        return False
+
     async def run(
             self,
             topic: str,
             task_id: Optional[str] = None,
             save_dir: str = "./tmp/deep_research",
             max_parallel_browsers: int = 1,
+            max_concurrent_tasks: int = 1,
+            max_concurrent_llm_calls: Optional[int] = None,
+            tool_concurrency_limits: Optional[Dict[str, int]] = None,
+            resume: Optional[bool] = None,
     ) -> Dict[str, Any]:
         """
         Starts the deep research process (Async Generator Version).
@@ -1095,6 +1760,14 @@ class DeepResearchAgent:
         Args:
             topic: The research topic.
             task_id: Optional existing task ID to resume. If None, a new ID is generated.
+            resume: Whether to resume the task's earlier state. Defaults to resuming when a task_id is given;
+                    pass False to start a new task under a chosen ID.
+            max_parallel_browsers: Browser searches allowed to run at once across all tasks.
+            max_concurrent_tasks: Number of plan tasks executed concurrently per graph step.
+            max_concurrent_llm_calls: LLM calls allowed at once across tasks, including those of browser agents
+                                      and static fetches. Defaults to max_concurrent_tasks.
+            tool_concurrency_limits: Calls allowed at once per tool name, across tasks. Tools that are not
+                                     listed allow DEFAULT_TOOL_CONCURRENCY calls.
 
         Yields:
              Intermediate state updates or messages during execution.
@@ -1111,6 +1784,7 @@ class DeepResearchAgent:
             }
 
         self.current_task_id = task_id if task_id else str(uuid.uuid4())
+        resume = bool(task_id) if resume is None else resume and bool(task_id)
         safe_root_dir = "./tmp/deep_research"
         normalized_save_dir = os.path.normpath(save_dir)
         if not normalized_save_dir.startswith(os.path.abspath(safe_root_dir)):
@@ -1126,52 +1800,114 @@ class DeepResearchAgent:
 
         self.stop_event = threading.Event()
         _AGENT_STOP_FLAGS[self.current_task_id] = self.stop_event
-        agent_tools = await self._setup_tools(
-            self.current_task_id, self.stop_event, max_parallel_browsers
-        )
-        initial_state: DeepResearchState = {
-            "task_id": self.current_task_id,
-            "topic": topic,
-            "research_plan": [],
-            "search_results": [],
-            "messages": [],
-            "llm": self.llm,
-            "tools": agent_tools,
-            "output_dir": Path(output_dir),
-            "browser_config": self.browser_config,
-            "final_report": None,
-            "current_category_index": 0,
-            "current_task_index_in_category": 0,
-            "stop_requested": False,
-            "error_message": None,
-        }
-
-        if task_id:
-            logger.info(f"Attempting to resume task {task_id}...")
-            loaded_state = _load_previous_state(task_id, output_dir)
-            initial_state.update(loaded_state)
-            if loaded_state.get("research_plan"):
-                logger.info(
-                    f"Resuming with {len(loaded_state['research_plan'])} plan categories "
-                    f"and {len(loaded_state.get('search_results', []))} existing results. "
-                    f"Next task: Cat {initial_state['current_category_index']}, Task {initial_state['current_task_index_in_category']}"
-                )
-                initial_state["topic"] = (
-                    topic  # Allow overriding topic even when resuming? Or use stored topic? Let's use new one.
-                )
-            else:
-                logger.warning(
-                    f"Resume requested for {task_id}, but no previous plan found. Starting fresh."
-                )
-
-        # --- Execute Graph using ainvoke ---
+        self._publish_event({"type": RUN_STARTED, "task_id": self.current_task_id, "topic": topic})
+        self.metrics = RunMetrics(self.current_task_id)
         final_state = None
         status = "unknown"
         message = None
+        background_tasks = set()
         try:
+            # Set up inside the try, so the finally closes whatever was started if setup fails
+            if self.use_browser_pool:
+                self.browser_pool = create_browser_pool(
+                    self.browser_config,
+                    max_size=math.ceil(max_parallel_browsers / self.contexts_per_browser),
+                    max_uses=self.browser_pool_max_uses,
+                    contexts_per_browser=self.contexts_per_browser,
+                )
+                await self.browser_pool.start()
+            if self.search_cache_ttl_seconds != 0 and self.search_cache is None:
+                self.search_cache = SearchResultCache(
+                    os.path.join(normalized_save_dir, SEARCH_CACHE_FILENAME),
+                    ttl_seconds=self.search_cache_ttl_seconds,
+                    max_entries=self.search_cache_max_entries,
+                )
+            if self.plan_cache_threshold is not None and self.plan_cache is None:
+                self.plan_cache = PlanCache(
+                    os.path.join(normalized_save_dir, PLAN_CACHE_FILENAME),
+                    embeddings=self.embeddings,
+                    threshold=self.plan_cache_threshold,
+                )
+            llm_semaphore = asyncio.Semaphore(max(1, max_concurrent_llm_calls or max_concurrent_tasks))
+            agent_tools = await self._setup_tools(
+                self.current_task_id, self.stop_event, max_parallel_browsers, llm_semaphore
+            )
+            initial_state: DeepResearchState = {
+                "task_id": self.current_task_id,
+                "topic": topic,
+                "research_plan": [],
+                "search_results": [],
+                "messages": [],
+                "output_dir": Path(output_dir),
+                "browser_config": self.browser_config,
+                "final_report": None,
+                "current_category_index": 0,
+                "current_task_index_in_category": 0,
+                "stop_requested": False,
+                "error_message": None,
+                "max_concurrent_tasks": max(1, max_concurrent_tasks),
+                "max_history_tokens": self.max_history_tokens,
+                "synthesis_mode": self.synthesis_mode,
+                "synthesis_max_tokens": self.synthesis_max_tokens,
+                "dedup_threshold": self.dedup_threshold,
+                "min_information_gain": self.min_information_gain if self.adaptive_depth else None,
+                "max_browser_sessions": self.max_browser_sessions,
+                "max_research_tokens": self.max_research_tokens,
+            }
+            run_config: RunnableConfig = {
+                "recursion_limit": GRAPH_RECURSION_LIMIT,
+                "callbacks": [self.metrics.callback_handler],
+                "configurable": {
+                    "thread_id": self.current_task_id,
+                    "llm": self.llm,
+                    "tools": agent_tools,
+                    "llm_semaphore": llm_semaphore,
+                    "embeddings": self.embeddings,
+                    "metrics": self.metrics,
+                    "plan_cache": self.plan_cache,
+                    "background_tasks": background_tasks if self.refresh_cached_plans else None,
+                    "cancelled_nodes": [],
+                    "tool_semaphores": {
+                        tool.name: asyncio.Semaphore(max(1, (tool_concurrency_limits or {}).get(
+                            tool.name, DEFAULT_TOOL_CONCURRENCY)))
+                        for tool in agent_tools
+                    },
+                },
+            }
+
+            if resume:
+                logger.info(f"Attempting to resume task {task_id}...")
+                loaded_state = _load_previous_state(task_id, output_dir)
+                initial_state.update(loaded_state)
+                if loaded_state.get("research_plan"):
+                    if not os.path.exists(os.path.join(output_dir, RESEARCH_LOG_FILENAME)):
+                        # Start a research log for runs that only have the markdown/json files
+                        write_research_snapshot(output_dir, loaded_state["research_plan"],
+                                                loaded_state.get("search_results", []))
+                    logger.info(
+                        f"Resuming with {len(loaded_state['research_plan'])} plan categories "
+                        f"and {len(loaded_state.get('search_results', []))} existing results. "
+                        f"Next task: Cat {initial_state['current_category_index']}, Task {initial_state['current_task_index_in_category']}"
+                    )
+                    initial_state["topic"] = (
+                        topic  # Allow overriding topic even when resuming? Or use stored topic? Let's use new one.
+                    )
+                else:
+                    logger.warning(
+                        f"Resume requested for {task_id}, but no previous plan found. Starting fresh."
+                    )
+
+            # --- Execute Graph ---
             logger.info(f"Invoking graph execution for task {self.current_task_id}...")
-            self.runner = asyncio.create_task(self.graph.ainvoke(initial_state))
-            final_state = await self.runner
+            async with self._open_checkpointer(output_dir) as checkpointer:
+                graph = self._compile_graph(checkpointer) if checkpointer else self.graph
+                graph_input = initial_state
+                run_settings = {key: initial_state[key] for key in RUN_SETTING_KEYS}
+                if checkpointer and resume and await self._prepare_checkpoint_resume(
+                        graph, run_config, run_settings):
+                    graph_input = None  # Continue the checkpointed thread
+                self.runner = asyncio.create_task(self._run_graph(graph, graph_input, run_config))
+                final_state = await self.runner
             logger.info(f"Graph execution finished for task {self.current_task_id}.")
 
             # Determine status based on final state
@@ -1194,8 +1930,13 @@ class DeepResearchAgent:
                 logger.warning(message)
 
         except asyncio.CancelledError:
-            status = "cancelled"
-            message = f"Agent run task cancelled for {self.current_task_id}."
+            if self.stop_event and self.stop_event.is_set():
+                # stop() cancelled the work that did not finish after the stop signal
+                status = "stopped"
+                message = "Research process was stopped by request."
+            else:
+                status = "cancelled"
+                message = f"Agent run task cancelled for {self.current_task_id}."
             logger.info(message)
             # final_state will remain None or the state before cancellation if checkpointing was used
         except Exception as e:
@@ -1207,11 +1948,37 @@ class DeepResearchAgent:
             logger.info(f"Cleaning up resources for task {self.current_task_id}")
             task_id_to_clean = self.current_task_id
 
+            _AGENT_STOP_FLAGS.pop(task_id_to_clean, None)
             self.stop_event = None
             self.current_task_id = None
             self.runner = None  # Mark runner as finished
+            try:
+                await asyncio.to_thread(compact_research_log, output_dir)
+            except Exception as e:
+                logger.error(f"Failed to compact research log for task {task_id_to_clean}: {e}")
+            if self.browser_pool:
+                await self.browser_pool.close()
+                self.browser_pool = None
             if self.mcp_client:
                 await self.mcp_client.__aexit__(None, None, None)
+            search_cache_metrics = None
+            if self.search_cache:
+                search_cache_metrics = self.search_cache.metrics()
+                logger.info(f"Search cache metrics for task {task_id_to_clean}: {search_cache_metrics}")
+                self.search_cache.close()
+                self.search_cache = None
+            self._publish_event({"type": RUN_FINISHED, "task_id": task_id_to_clean, "status": status,
+                                 "message": message})
+            self._publish_event(None)  # Ends the event streams of this run
+            if background_tasks:
+                await asyncio.gather(*background_tasks, return_exceptions=True)
+            if self.plan_cache:
+                self.plan_cache.close()
+                self.plan_cache = None
+            metrics_summary = self.metrics.save(output_dir, {
+                "status": status, "search_cache": search_cache_metrics, "llm_governors": llm_governor_metrics(),
+            })
+            self.metrics = None
 
             # Return a result dictionary including the status and the final state if available
             return {
@@ -1221,8 +1988,76 @@ class DeepResearchAgent:
                 "final_state": final_state
                 if final_state
                 else {},  # Return the final state dict
+                "search_cache": search_cache_metrics,
+                "metrics": metrics_summary,
             }
 
+    async def _run_graph(self, graph: Any, graph_input: Any, run_config: RunnableConfig) -> Dict[str, Any]:
+        """
+        Runs the graph to its final state, publishing the progress events its nodes emit. A node
+        cancelled by anything but stop() cancels the run, as it would outside of streaming.
+        """
+        final_state = None
+        cancelled_nodes = run_config["configurable"]["cancelled_nodes"]
+        async for mode, chunk in graph.astream(graph_input, run_config, stream_mode=["custom", "values"]):
+            if mode == "custom":
+                self._publish_event(chunk)
+            else:
+                final_state = chunk
+        if cancelled_nodes and not (self.stop_event and self.stop_event.is_set()):
+            raise asyncio.CancelledError(f"Graph node {cancelled_nodes[0]} was cancelled")
+        return final_state
+
+    def _publish_event(self, event: Optional[Dict[str, Any]]):
+        for queue in self._event_listeners:
+            queue.put_nowait(event)
+
+    def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Returns an async iterator over the progress events of the next or current run, pushed as they
+        happen. Every event is a dict with a "type":
+
+        - run_started: task_id, topic
+        - plan_created: plan, resumed
+        - task_started: category_index, task_index, category, task
+        - task_finished: category_index, task_index, status, result_summary
+        - search_result: result of one browser search, as soon as it finishes
+        - results_appended: results of a research step, total number of results
+        - report_chunk: text of the report as the synthesis LLM writes it
+        - run_finished: task_id, status, message
+
+        The iterator ends after run_finished.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._event_listeners.append(queue)
+
+        async def iterate():
+            try:
+                while (event := await queue.get()) is not None:
+                    yield event
+            finally:
+                if queue in self._event_listeners:
+                    self._event_listeners.remove(queue)
+
+        return iterate()
+
+    def stream_report(self) -> AsyncIterator[str]:
+        """
+        Returns an async iterator over the report text chunks of the next or current run, as the
+        synthesis LLM produces them. The iterator ends when the run finishes.
+        """
+        events = self.events()
+
+        async def iterate():
+            try:
+                async for event in events:
+                    if event["type"] == REPORT_CHUNK:
+                        yield event["text"]
+            finally:
+                await events.aclose()
+
+        return iterate()
+
     async def _stop_lingering_browsers(self, task_id):
         """Attempts to stop any BrowserUseAgent instances associated with the task_id."""
         keys_to_stop = [
@@ -1238,24 +2073,55 @@ class DeepResearchAgent:
             agent_instance = _BROWSER_AGENT_INSTANCES.get(key)
             try:
                 if agent_instance:
-                    # Assuming BU agent has an async stop method
-                    await agent_instance.stop()
+                    maybe_awaitable = agent_instance.stop()
+                    if inspect.isawaitable(maybe_awaitable):
+                        await maybe_awaitable
                     logger.info(f"Called stop() on browser agent instance {key}")
             except Exception as e:
                 logger.error(
                     f"Error calling stop() on browser agent instance {key}: {e}"
                 )
 
+    def _kill_browsers(self, task_id: str):
+        """Kills the browsers the task launched and those of the browser pool."""
+        for browser in _OPEN_BROWSERS.pop(task_id, set()):
+            try:
+                browser.kill()
+            except Exception as e:
+                logger.error(f"Error killing browser of task {task_id}: {e}")
+        if self.browser_pool:
+            self.browser_pool.kill()
+
     async def stop(self):
-        """Signals the currently running agent task to stop."""
+        """
+        Stops the currently running agent task. Work still running `stop_grace_seconds` after the
+        stop signal, such as LLM calls and browser sessions, is cancelled. Browsers that are still
+        open `shutdown_timeout` seconds after that are killed.
+        """
         if not self.current_task_id or not self.stop_event:
             logger.info("No agent task is currently running.")
             return
 
-        logger.info(f"Stop requested for task ID: {self.current_task_id}")
+        task_id = self.current_task_id
+        runner = self.runner
+        logger.info(f"Stop requested for task ID: {task_id}")
         self.stop_event.set()  # Signal the stop event
         self.stopped = True
-        await self._stop_lingering_browsers(self.current_task_id)
+        await self._stop_lingering_browsers(task_id)
+        if not runner or runner.done():
+            return
+
+        done, _ = await asyncio.wait({runner}, timeout=self.stop_grace_seconds)
+        if done:
+            return
+        logger.info(f"Task {task_id} still running after the stop signal, cancelling in-flight work.")
+        runner.cancel()
+        # Cancelling the graph cancels its browser sessions, but it does not wait for them to close
+        in_flight = {runner, *_BROWSER_SESSION_TASKS.get(task_id, ())}
+        _, still_running = await asyncio.wait(in_flight, timeout=self.shutdown_timeout)
+        if still_running:
+            logger.warning(f"Task {task_id} did not shut down within {self.shutdown_timeout}s, killing its browsers.")
+            self._kill_browsers(task_id)
 
     def close(self):
         self.stopped = False
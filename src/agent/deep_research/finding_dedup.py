@@ -0,0 +1,127 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.utils.embeddings import HashingEmbeddings
+
+logger = logging.getLogger(__name__)
+
+faiss = None
+try:
+    import faiss
+except Exception as e:
+    print(f"Warning: Could not import faiss, finding dedup falls back to numpy search: {e}")
+
+_TOKEN_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def finding_text(entry: Dict[str, Any]) -> Optional[str]:
+    """Returns the text to compare for completed findings, None for entries that are never merged."""
+    if entry.get("status") != "completed":
+        return None
+    text = entry.get("output") if entry.get("tool_name") not in (None, "parallel_browser_search") else entry.get("result")
+    return str(text) if text else None
+
+
+async def embed_normalized(texts: Sequence[str], embeddings: Optional[Embeddings] = None) -> np.ndarray:
+    """Embeds texts as rows of unit length, so inner products are cosine similarities."""
+    embeddings = embeddings or HashingEmbeddings()
+    vectors = np.asarray(await embeddings.aembed_documents(list(texts)), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _source(entry: Dict[str, Any]) -> Dict[str, Any]:
+    source = {"query": entry.get("query") or entry.get("tool_name")}
+    for key in ("category", "task"):
+        if entry.get(key):
+            source[key] = entry[key]
+    return source
+
+
+def _merge_text(kept: str, duplicate: str) -> str:
+    """Appends the sentences of a duplicate finding that the kept finding does not contain yet."""
+    seen = {" ".join(_TOKEN_RE.findall(s.casefold())) for s in _SENTENCE_RE.split(kept)}
+    extra = []
+    for sentence in _SENTENCE_RE.split(duplicate):
+        key = " ".join(_TOKEN_RE.findall(sentence.casefold()))
+        if key and key not in seen:
+            seen.add(key)
+            extra.append(sentence.strip())
+    return kept if not extra else kept.rstrip() + "\n" + " ".join(extra)
+
+
+class _VectorIndex:
+    """Inner-product index over normalized vectors, backed by faiss when it is available."""
+
+    def __init__(self, dimensions: int):
+        self._faiss_index = faiss.IndexFlatIP(dimensions) if faiss is not None else None
+        self._vectors: List[np.ndarray] = []
+
+    def add(self, vector: np.ndarray):
+        if self._faiss_index is not None:
+            self._faiss_index.add(vector.reshape(1, -1))
+        else:
+            self._vectors.append(vector)
+
+    def nearest(self, vector: np.ndarray):
+        """Returns (position, similarity) of the most similar stored vector, or (-1, -1.0) if empty."""
+        if self._faiss_index is not None:
+            if self._faiss_index.ntotal == 0:
+                return -1, -1.0
+            similarities, positions = self._faiss_index.search(vector.reshape(1, -1), 1)
+            return int(positions[0][0]), float(similarities[0][0])
+        if not self._vectors:
+            return -1, -1.0
+        similarities = np.stack(self._vectors) @ vector
+        position = int(np.argmax(similarities))
+        return position, float(similarities[position])
+
+
+async def dedup_findings(
+        search_results: Sequence[Dict[str, Any]],
+        threshold: float = 0.85,
+        embeddings: Optional[Embeddings] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Merges near-duplicate findings before synthesis.
+
+    Every completed finding is embedded and compared with the findings kept so far. One whose
+    cosine similarity to a kept finding reaches `threshold` is folded into it: sentences it adds
+    are appended and its query, category and task are listed under `merged_from`. Failed entries
+    are kept unchanged. The input entries are not modified.
+    """
+    candidates = [(i, text) for i, text in enumerate(finding_text(entry) for entry in search_results) if text]
+    if len(candidates) < 2:
+        return [dict(entry) for entry in search_results]
+
+    vectors = await embed_normalized([text for _, text in candidates], embeddings)
+
+    index = _VectorIndex(vectors.shape[1])
+    kept_positions: List[int] = []  # Position in `deduped` of each vector in the index
+    merged = 0
+    vector_by_result = {result_idx: vector for (result_idx, _), vector in zip(candidates, vectors)}
+    deduped: List[Dict[str, Any]] = []
+
+    for result_idx, entry in enumerate(search_results):
+        vector = vector_by_result.get(result_idx)
+        if vector is not None:
+            position, similarity = index.nearest(vector)
+            if position >= 0 and similarity >= threshold:
+                kept = deduped[kept_positions[position]]
+                text_key = "output" if "output" in kept else "result"
+                kept[text_key] = _merge_text(str(kept[text_key]), finding_text(entry))
+                kept.setdefault("merged_from", []).append(_source(entry))
+                merged += 1
+                continue
+            index.add(vector)
+            kept_positions.append(len(deduped))
+        deduped.append(dict(entry))
+
+    if merged:
+        logger.info(f"Merged {merged} near-duplicate finding(s), {len(deduped)} findings remain.")
+    return deduped
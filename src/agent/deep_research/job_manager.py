@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+@dataclass
+class ResearchJob:
+    """A research topic submitted to the job manager, with its quotas and outcome."""
+    job_id: str
+    topic: str
+    owner: str = "default"
+    max_parallel_browsers: int = 1
+    max_concurrent_llm_calls: int = 1
+    max_concurrent_tasks: int = 1
+    run_kwargs: Dict[str, Any] = field(default_factory=dict)
+    resume: bool = False
+    stop_requested: bool = False
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    agent: Optional[DeepResearchAgent] = field(default=None, repr=False)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+
+class ResearchJobManager:
+    """
+    Runs several deep research jobs concurrently in one process.
+
+    Every job gets its own DeepResearchAgent, so its runner, stop flag, browser pool and
+    semaphores are isolated from the other jobs. A job reserves its browser and LLM call
+    quotas while it runs; jobs that do not fit the remaining capacity wait in a queue.
+    Queued jobs are admitted round-robin across owners, so one owner submitting many
+    topics does not hold back the others, and in submission order within an owner.
+    """
+
+    def __init__(
+            self,
+            agent_factory: Callable[[], DeepResearchAgent],
+            max_concurrent_jobs: int = 2,
+            max_total_browsers: int = 4,
+            max_total_llm_calls: int = 8,
+            save_dir: str = "./tmp/deep_research",
+    ):
+        self.agent_factory = agent_factory
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.max_total_browsers = max(1, max_total_browsers)
+        self.max_total_llm_calls = max(1, max_total_llm_calls)
+        self.save_dir = save_dir
+        self.jobs: Dict[str, ResearchJob] = {}
+        self._queues: "OrderedDict[str, Deque[ResearchJob]]" = OrderedDict()
+        self._runners: Dict[str, asyncio.Task] = {}
+        self._browsers_in_use = 0
+        self._llm_calls_in_use = 0
+        self._shutting_down = False
+
+    async def submit(
+            self,
+            topic: str,
+            task_id: Optional[str] = None,
+            owner: str = "default",
+            max_parallel_browsers: int = 1,
+            max_concurrent_llm_calls: int = 1,
+            max_concurrent_tasks: int = 1,
+            **run_kwargs,
+    ) -> ResearchJob:
+        """
+        Queues a research job and starts it as soon as capacity allows.
+        Pass the task_id of an earlier job to resume it. Quotas are capped at the manager's capacity.
+        The LLM call quota covers every LLM call of the job: research turns, synthesis, browser agents
+        and static fetches.
+        """
+        if self._shutting_down:
+            raise RuntimeError("The research job manager is shutting down.")
+        job_id = task_id or str(uuid.uuid4())
+        existing = self.jobs.get(job_id)
+        if existing and existing.status in ACTIVE_STATUSES:
+            raise ValueError(f"Research job {job_id} is already {existing.status}.")
+
+        job = ResearchJob(
+            job_id=job_id,
+            topic=topic,
+            owner=owner,
+            max_parallel_browsers=min(max(1, max_parallel_browsers), self.max_total_browsers),
+            max_concurrent_llm_calls=min(max(1, max_concurrent_llm_calls), self.max_total_llm_calls),
+            max_concurrent_tasks=max(1, max_concurrent_tasks),
+            run_kwargs=run_kwargs,
+            resume=task_id is not None,
+        )
+        self.jobs[job_id] = job
+        self._queues.setdefault(owner, deque()).append(job)
+        logger.info(f"Queued research job {job_id} for owner '{owner}': '{topic}'")
+        self._schedule()
+        return job
+
+    def _fits(self, job: ResearchJob) -> bool:
+        return (
+                len(self._runners) < self.max_concurrent_jobs
+                and self._browsers_in_use + job.max_parallel_browsers <= self.max_total_browsers
+                and self._llm_calls_in_use + job.max_concurrent_llm_calls <= self.max_total_llm_calls
+        )
+
+    def _schedule(self):
+        """Starts queued jobs, visiting owners round-robin, while the next job fits the free capacity."""
+        while self._queues and not self._shutting_down:
+            owner, queue = next(iter(self._queues.items()))
+            job = queue[0]
+            # Waiting instead of skipping ahead keeps jobs with large quotas from starving
+            if not self._fits(job):
+                return
+            queue.popleft()
+            self._queues.pop(owner)
+            if queue:
+                self._queues[owner] = queue  # Back of the rotation
+            self._start(job)
+
+    def _start(self, job: ResearchJob):
+        self._browsers_in_use += job.max_parallel_browsers
+        self._llm_calls_in_use += job.max_concurrent_llm_calls
+        job.status = "running"
+        job.started_at = time.time()
+        job.agent = self.agent_factory()
+        self._runners[job.job_id] = asyncio.create_task(self._run_job(job))
+        logger.info(
+            f"Started research job {job.job_id} ({len(self._runners)}/{self.max_concurrent_jobs} jobs, "
+            f"{self._browsers_in_use}/{self.max_total_browsers} browsers, "
+            f"{self._llm_calls_in_use}/{self.max_total_llm_calls} LLM calls reserved)"
+        )
+
+    async def _run_job(self, job: ResearchJob):
+        try:
+            if job.stop_requested:
+                # Stopped before the agent picked the job up
+                job.result = {"status": "stopped", "message": "Research job was stopped before it started.",
+                              "task_id": job.job_id}
+                job.status = "stopped"
+                return
+            job.result = await job.agent.run(
+                job.topic,
+                task_id=job.job_id,
+                resume=job.resume,
+                save_dir=self.save_dir,
+                max_parallel_browsers=job.max_parallel_browsers,
+                max_concurrent_tasks=job.max_concurrent_tasks,
+                max_concurrent_llm_calls=job.max_concurrent_llm_calls,
+                **job.run_kwargs,
+            )
+            job.status = job.result.get("status", "unknown")
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Research job {job.job_id} failed: {e}", exc_info=True)
+            job.result = {"status": "error", "message": str(e), "task_id": job.job_id}
+            job.status = "error"
+        finally:
+            job.finished_at = time.time()
+            self._runners.pop(job.job_id, None)
+            self._browsers_in_use -= job.max_parallel_browsers
+            self._llm_calls_in_use -= job.max_concurrent_llm_calls
+            job.done.set()
+            logger.info(f"Research job {job.job_id} finished with status '{job.status}'.")
+            self._schedule()
+
+    def get(self, job_id: str) -> Optional[ResearchJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[ResearchJob]:
+        return list(self.jobs.values())
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Waits for the job to finish and returns its run result."""
+        job = self.jobs[job_id]
+        await job.done.wait()
+        return job.result
+
+    async def stop(self, job_id: str):
+        """
+        Removes a queued job from the queue, or signals a running job to stop. A job whose agent
+        has not started yet is marked, and its runner ends without starting the agent.
+        """
+        job = self.jobs.get(job_id)
+        if not job or job.status not in ACTIVE_STATUSES:
+            return
+        if job.status == "queued":
+            queue = self._queues.get(job.owner)
+            if queue is not None:
+                queue.remove(job)
+                if not queue:
+                    self._queues.pop(job.owner)
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            job.done.set()
+            logger.info(f"Removed queued research job {job_id}.")
+            self._schedule()
+            return
+        job.stop_requested = True
+        await job.agent.stop()
+
+    async def shutdown(self):
+        """Cancels queued jobs, stops running ones and waits for them to wind down. No new jobs are admitted."""
+        self._shutting_down = True
+        for job in list(self.jobs.values()):
+            if job.status == "queued":
+                await self.stop(job.job_id)
+        for job_id in list(self._runners):
+            await self.stop(job_id)
+        if self._runners:
+            await asyncio.gather(*self._runners.values(), return_exceptions=True)
@@ -0,0 +1,133 @@
+import json
+import logging
+from typing import Callable, List, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MARKER = "research_history_summary"
+COMPACTED_MARKER = "payload_compacted"
+SUMMARY_HEADER = "Summary of earlier research rounds (raw results are stored in search_results):"
+
+
+def _is_summary(message: BaseMessage) -> bool:
+    return isinstance(message, HumanMessage) and message.additional_kwargs.get(SUMMARY_MARKER, False)
+
+
+def _split_rounds(messages: Sequence[BaseMessage]):
+    """Splits a history into leading system messages, the existing summary lines and task rounds."""
+    system_messages: List[BaseMessage] = []
+    summary_lines: List[str] = []
+    rounds: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, SystemMessage) and not rounds:
+            system_messages.append(message)
+        elif _is_summary(message):
+            summary_lines.extend(message.content.splitlines()[1:])
+        elif isinstance(message, HumanMessage) or not rounds:
+            rounds.append([message])
+        else:
+            rounds[-1].append(message)
+    return system_messages, summary_lines, rounds
+
+
+def _stub_tool_payload(message: ToolMessage) -> ToolMessage:
+    """Replaces a tool payload that is already recorded in search_results with a short note."""
+    if message.additional_kwargs.get(COMPACTED_MARKER):
+        return message
+    try:
+        payload = json.loads(message.content)
+    except (TypeError, ValueError):
+        payload = None
+    if isinstance(payload, list) and all(isinstance(entry, dict) for entry in payload):
+        outcomes = [f"'{entry.get('query', '?')}': {entry.get('status', 'unknown')}" for entry in payload]
+        note = f"[{len(payload)} result(s) recorded in search_results. " + "; ".join(outcomes) + "]"
+    elif str(message.content).startswith("Error"):
+        # Errors are short and useful to the model, keep them as they are
+        return message
+    else:
+        note = f"[Tool output ({len(str(message.content))} chars) recorded in search_results.]"
+    return ToolMessage(
+        content=note,
+        tool_call_id=message.tool_call_id,
+        additional_kwargs={COMPACTED_MARKER: True},
+    )
+
+
+def _summarize_round(round_messages: Sequence[BaseMessage]) -> str:
+    """Builds a one-line, extractive summary of a task round."""
+    task = "Unknown task"
+    first = round_messages[0]
+    if isinstance(first, HumanMessage):
+        content = str(first.content)
+        task = content.split("Specific Task: ", 1)[1].split("\n", 1)[0] if "Specific Task: " in content else content[:200]
+
+    actions = []
+    for message in round_messages[1:]:
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls:
+                args = tool_call.get("args", {})
+                queries = args.get("queries")
+                actions.append(f"{tool_call.get('name')}({', '.join(queries) if queries else json.dumps(args)[:100]})")
+            if not message.tool_calls and message.content:
+                actions.append(f"answered: {str(message.content)[:150]}")
+    failures = sum(1 for m in round_messages if isinstance(m, ToolMessage) and str(m.content).startswith("Error"))
+    line = f"- Task: {task}"
+    if actions:
+        line += f" | Actions: {'; '.join(actions)}"
+    if failures:
+        line += f" | {failures} tool error(s)"
+    return line
+
+
+def compact_messages(
+        messages: Sequence[BaseMessage],
+        max_tokens: Optional[int],
+        count_tokens: Callable[[Sequence[BaseMessage]], int] = count_tokens_approximately,
+) -> List[BaseMessage]:
+    """
+    Keeps the research message history under `max_tokens`.
+
+    Tool payloads are always replaced by short notes since the full results live in
+    `search_results`. If the history is still too large, the oldest task rounds are
+    folded into a single summary message placed after the system message(s).
+    """
+    system_messages, summary_lines, rounds = _split_rounds(messages)
+    rounds = [
+        [_stub_tool_payload(m) if isinstance(m, ToolMessage) else m for m in round_messages]
+        for round_messages in rounds
+    ]
+
+    def assemble() -> List[BaseMessage]:
+        summary = []
+        if summary_lines:
+            summary = [HumanMessage(
+                content="\n".join([SUMMARY_HEADER] + summary_lines),
+                additional_kwargs={SUMMARY_MARKER: True},
+            )]
+        return system_messages + summary + [m for round_messages in rounds for m in round_messages]
+
+    compacted = assemble()
+    if not max_tokens or count_tokens(compacted) <= max_tokens:
+        return compacted
+
+    folded = 0
+    while rounds and count_tokens(compacted) > max_tokens:
+        summary_lines.append(_summarize_round(rounds.pop(0)))
+        folded += 1
+        compacted = assemble()
+    # The summary itself may outgrow the budget on very long runs, drop its oldest lines
+    while len(summary_lines) > 1 and count_tokens(compacted) > max_tokens:
+        summary_lines.pop(0)
+        compacted = assemble()
+    logger.info(f"Compacted research history: folded {folded} round(s) into the summary, "
+                f"{len(compacted)} messages remain.")
+    return compacted
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.utils.embeddings import HashingEmbeddings
+from src.agent.deep_research.search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_FILENAME = "plan_cache.sqlite"
+
+
+class PlanCache:
+    """
+    Disk-backed cache of research plans keyed by topic embedding.
+
+    `lookup` returns the plan of the most similar cached topic if its cosine similarity reaches
+    `threshold`. Topics that normalize to the same text always match. Only the plan structure
+    (category names and task descriptions) is stored; task statuses start over on every hit.
+    """
+
+    def __init__(self, db_path: str, embeddings: Optional[Embeddings] = None, threshold: float = 0.8,
+                 ttl_seconds: Optional[float] = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache ("
+                " topic_key TEXT PRIMARY KEY,"
+                " topic TEXT NOT NULL,"
+                " embedding TEXT NOT NULL,"
+                " plan TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+
+    async def _embed(self, topic: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(normalize_query(topic)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def lookup(self, topic: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"topic", "similarity", "plan"} for the closest cached topic above the threshold,
+        or None. The plan's tasks are all pending.
+        """
+        topic_key = normalize_query(topic)
+        vector = await self._embed(topic)
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds is not None else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT topic_key, topic, embedding, plan FROM plan_cache WHERE created_at >= ?", (oldest,)
+            ).fetchall()
+
+        best = None
+        for row_key, row_topic, embedding, plan in rows:
+            cached_vector = np.asarray(json.loads(embedding), dtype=np.float32)
+            if cached_vector.shape != vector.shape:  # Stored with different embeddings
+                continue
+            similarity = 1.0 if row_key == topic_key else float(cached_vector @ vector)
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"topic": row_topic, "similarity": similarity, "plan": plan}
+        if best is None:
+            return None
+
+        best["plan"] = [
+            {
+                "category_name": category["category_name"],
+                "tasks": [
+                    {"task_description": task, "status": "pending", "queries": None, "result_summary": None}
+                    for task in category["tasks"]
+                ],
+            }
+            for category in json.loads(best["plan"])
+        ]
+        return best
+
+    async def store(self, topic: str, plan: List[Dict[str, Any]]):
+        """Stores the structure of a validated plan under the topic, replacing an older plan for it."""
+        skeleton = [
+            {"category_name": category["category_name"],
+             "tasks": [task["task_description"] for task in category["tasks"]]}
+            for category in plan if category["tasks"]
+        ]
+        if not skeleton:
+            return
+        vector = await self._embed(topic)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (topic_key, topic, embedding, plan, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (normalize_query(topic), topic, json.dumps(vector.tolist()),
+                 json.dumps(skeleton, ensure_ascii=False), time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,171 @@
+import copy
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.agent.deep_research.adaptive_depth import SKIPPED
+
+logger = logging.getLogger(__name__)
+
+RESEARCH_LOG_FILENAME = "research_log.jsonl"
+SEARCH_INFO_FILENAME = "search_info.json"
+PLAN_FILENAME = "research_plan.md"
+# Task status markers in research_plan.md
+PLAN_MARKERS = {"completed": "[x]", "pending": "[ ]", SKIPPED: "[~]"}
+
+# Number of superseded events (task status updates, older plans) tolerated before compaction
+COMPACT_AFTER_EVENTS = 200
+
+_redundant_events: Dict[str, int] = {}
+
+
+def _log_path(output_dir: str) -> str:
+    return os.path.join(str(output_dir), RESEARCH_LOG_FILENAME)
+
+
+def plan_event(plan: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """A full plan snapshot. Replaying it starts a new plan and drops earlier results."""
+    return {"type": "plan", "plan": plan}
+
+
+def task_status_event(cat_idx: int, task_idx: int, task: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "task_status",
+        "category_index": cat_idx,
+        "task_index": task_idx,
+        "status": task["status"],
+        "result_summary": task.get("result_summary"),
+    }
+
+
+def result_event(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "result", "result": result}
+
+
+def append_research_events(output_dir: str, events: Sequence[Dict[str, Any]]) -> bool:
+    """
+    Appends events to the research log and flushes them to disk.
+    Returns True once enough superseded events piled up that the log should be compacted.
+    """
+    if not events:
+        return False
+    path = _log_path(output_dir)
+    lines = "".join(
+        json.dumps({"ts": time.time(), **event}, ensure_ascii=False, default=str) + "\n" for event in events
+    )
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+    except Exception as e:
+        logger.error(f"Failed to append to research log {path}: {e}")
+        return False
+    redundant = sum(1 for event in events if event["type"] != "result")
+    _redundant_events[path] = _redundant_events.get(path, 0) + redundant
+    return _redundant_events[path] >= COMPACT_AFTER_EVENTS
+
+
+def replay_research_log(output_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Rebuilds the plan and search results from the research log.
+    Returns None if there is no log or it holds no plan.
+    """
+    path = _log_path(output_dir)
+    if not os.path.exists(path):
+        return None
+
+    plan: Optional[List[Dict[str, Any]]] = None
+    search_results: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave the last line half written
+                logger.warning(f"Skipping corrupt line {line_num} in research log {path}")
+                continue
+            if event["type"] == "plan":
+                plan = copy.deepcopy(event["plan"])
+                search_results = []
+            elif event["type"] == "task_status" and plan is not None:
+                try:
+                    task = plan[event["category_index"]]["tasks"][event["task_index"]]
+                except (IndexError, KeyError):
+                    logger.warning(f"Task status event on line {line_num} does not match the plan, skipping.")
+                    continue
+                task["status"] = event["status"]
+                task["result_summary"] = event.get("result_summary")
+            elif event["type"] == "result":
+                search_results.append(event["result"])
+
+    if plan is None:
+        return None
+    return {"research_plan": plan, "search_results": search_results}
+
+
+def format_plan_markdown(plan: Sequence[Dict[str, Any]]) -> str:
+    """Renders the plan as the markdown checklist of research_plan.md."""
+    lines = ["# Research Plan\n\n"]
+    for cat_idx, category in enumerate(plan):
+        lines.append(f"## {cat_idx + 1}. {category['category_name']}\n\n")
+        for task in category["tasks"]:
+            marker = "- " + PLAN_MARKERS.get(task["status"], "[-]")  # [-] for failed
+            lines.append(f"  {marker} {task['task_description']}\n")
+        lines.append("\n")
+    return "".join(lines)
+
+
+def write_plan_markdown(output_dir: str, plan: Sequence[Dict[str, Any]]):
+    """Writes research_plan.md. Plan status changes in between are only appended to the log."""
+    plan_file = os.path.join(str(output_dir), PLAN_FILENAME)
+    try:
+        with open(plan_file, "w", encoding="utf-8") as f:
+            f.write(format_plan_markdown(plan))
+        logger.info(f"Hierarchical research plan saved to {plan_file}")
+    except Exception as e:
+        logger.error(f"Failed to save research plan to {plan_file}: {e}")
+
+
+def write_research_snapshot(output_dir: str, plan: Sequence[Dict[str, Any]],
+                            search_results: Sequence[Dict[str, Any]]):
+    """
+    Rewrites the log as one plan event plus the results, and refreshes search_info.json and
+    research_plan.md.
+    The new log is written to a temporary file first so a crash never loses the old one.
+    """
+    path = _log_path(output_dir)
+    tmp_path = path + ".tmp"
+    events = [plan_event(plan)] + [result_event(result) for result in search_results]
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps({"ts": time.time(), **event}, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _redundant_events[path] = 0
+    except Exception as e:
+        logger.error(f"Failed to write research log snapshot {path}: {e}")
+        return
+
+    search_file = os.path.join(str(output_dir), SEARCH_INFO_FILENAME)
+    try:
+        with open(search_file, "w", encoding="utf-8") as f:
+            json.dump(list(search_results), f, indent=2, ensure_ascii=False, default=str)
+        logger.info(f"Search results saved to {search_file}")
+    except Exception as e:
+        logger.error(f"Failed to save search results to {search_file}: {e}")
+    write_plan_markdown(output_dir, plan)
+
+
+def compact_research_log(output_dir: str):
+    """Replays the log and rewrites it without superseded events."""
+    state = replay_research_log(output_dir)
+    if state is None:
+        return
+    write_research_snapshot(output_dir, state["research_plan"], state["search_results"])
+    logger.info(f"Compacted research log in {output_dir}")
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILENAME = "metrics.json"
+
+
+class RunMetrics:
+    """
+    Collects wall time, token usage, browser session time and cache hits of one research run.
+
+    Graph nodes, tool calls and browser sessions are timed with `span`, LLM calls are recorded
+    by `callback_handler`, which is passed to the graph in the run config.
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans: Dict[str, List[Dict[str, Any]]] = defaultdict(list)  # kind -> span records
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.callback_handler = MetricsCallbackHandler(self)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Times the block as a `kind` span. Callers may add attributes to the yielded record."""
+        record = {"name": name, **attrs}
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.setdefault("status", "failed" if isinstance(e, Exception) else "cancelled")
+            raise
+        finally:
+            record["start_s"] = round(started - self._started, 4)
+            record["duration_s"] = round(time.perf_counter() - started, 4)
+            self.spans[kind].append(record)
+
+    def increment(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+
+    def record_llm_call(self, node: Optional[str], duration_s: float, input_tokens: Optional[int],
+                        output_tokens: Optional[int]):
+        self.llm_calls.append({
+            "node": node,
+            "duration_s": round(duration_s, 4),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        })
+
+    def browser_sessions(self) -> int:
+        return len(self.spans["browser_session"])
+
+    def llm_tokens(self) -> int:
+        """Input plus output tokens of the LLM calls whose provider reported usage."""
+        return sum((call["input_tokens"] or 0) + (call["output_tokens"] or 0) for call in self.llm_calls)
+
+    @staticmethod
+    def _aggregate(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        aggregated: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            entry = aggregated.setdefault(record["name"], {"count": 0, "total_s": 0.0, "max_s": 0.0, "failures": 0})
+            entry["count"] += 1
+            entry["total_s"] = round(entry["total_s"] + record["duration_s"], 4)
+            entry["max_s"] = max(entry["max_s"], record["duration_s"])
+            entry["failures"] += record.get("status") in ("failed", "cancelled")
+        return aggregated
+
+    def summary(self) -> Dict[str, Any]:
+        nodes = self._aggregate(self.spans["node"])
+        for node in nodes.values():
+            node.update(llm_calls=0, input_tokens=0, output_tokens=0)
+        llm = {"calls": len(self.llm_calls), "input_tokens": 0, "output_tokens": 0, "calls_without_usage": 0,
+               "total_s": 0.0}
+        for call in self.llm_calls:
+            llm["total_s"] = round(llm["total_s"] + call["duration_s"], 4)
+            if call["input_tokens"] is None and call["output_tokens"] is None:
+                llm["calls_without_usage"] += 1
+            llm["input_tokens"] += call["input_tokens"] or 0
+            llm["output_tokens"] += call["output_tokens"] or 0
+            node = nodes.get(call["node"])
+            if node is not None:
+                node["llm_calls"] += 1
+                node["input_tokens"] += call["input_tokens"] or 0
+                node["output_tokens"] += call["output_tokens"] or 0
+        browser_sessions = self.spans["browser_session"]
+        return {
+            "task_id": self.task_id,
+            "wall_time_s": round(time.perf_counter() - self._started, 4),
+            "nodes": nodes,
+            "tools": self._aggregate(self.spans["tool"]),
+            "llm": llm,
+            "browser": {
+                "sessions": len(browser_sessions),
+                "total_s": round(sum(s["duration_s"] for s in browser_sessions), 4),
+                "failures": sum(1 for s in browser_sessions if s.get("status") != "completed"),
+            },
+            "counters": dict(self.counters),
+        }
+
+    def save(self, output_dir: str, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Writes the summary and the raw spans to metrics.json and returns the summary."""
+        summary = {**self.summary(), **(extra or {})}
+        metrics_file = os.path.join(output_dir, METRICS_FILENAME)
+        try:
+            with open(metrics_file, "w", encoding="utf-8") as f:
+                json.dump({
+                    "started_at": self.started_at,
+                    "summary": summary,
+                    "spans": self.spans,
+                    "llm_calls": self.llm_calls,
+                }, f, indent=2, default=str)
+            logger.info(f"Run metrics saved to {metrics_file}")
+        except Exception as e:
+            logger.error(f"Failed to save run metrics to {metrics_file}: {e}")
+        return summary
+
+
+def metrics_span(metrics: Optional[RunMetrics], kind: str, name: str, **attrs):
+    """`metrics.span(...)`, or a no-op context yielding a throwaway record when metrics are off."""
+    return metrics.span(kind, name, **attrs) if metrics else nullcontext({})
+
+
+def _usage_from_result(response: LLMResult):
+    """Returns (input_tokens, output_tokens) reported by the provider, None where unknown."""
+    input_tokens = output_tokens = None
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens = (input_tokens or 0) + usage.get("input_tokens", 0)
+                output_tokens = (output_tokens or 0) + usage.get("output_tokens", 0)
+    if input_tokens is None and response.llm_output:
+        token_usage = response.llm_output.get("token_usage") or response.llm_output.get("usage") or {}
+        input_tokens = token_usage.get("prompt_tokens", token_usage.get("input_tokens"))
+        output_tokens = token_usage.get("completion_tokens", token_usage.get("output_tokens"))
+    return input_tokens, output_tokens
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records the duration and token usage of every LLM call, attributed to the graph node making it."""
+
+    run_inline = True
+
+    def __init__(self, metrics: RunMetrics):
+        self.metrics = metrics
+        self._pending: Dict[UUID, tuple] = {}
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]]):
+        self._pending[run_id] = ((metadata or {}).get("langgraph_node"), time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        node, started = self._pending.pop(run_id, (None, time.perf_counter()))
+        self.metrics.record_llm_call(node, time.perf_counter() - started, *_usage_from_result(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        node, started = self._pending.pop(run_id, (None, time.perf_counter()))
+        self.metrics.record_llm_call(node, time.perf_counter() - started, None, None)
+        self.metrics.increment("llm_errors")
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_FILENAME = "search_cache.sqlite"
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s+#.%$-]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query so trivially different spellings share a cache entry."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    text = _WHITESPACE_RE.sub(" ", text).strip(" .-")
+    return text
+
+
+class SearchResultCache:
+    """
+    Disk-backed cache of browser search results keyed by normalized query.
+
+    Entries expire after `ttl_seconds` and the least recently used entries are evicted
+    once more than `max_entries` are stored. Hit and miss counters cover this process.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: Optional[float] = 7 * 24 * 3600, max_entries: int = 5000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " query_key TEXT PRIMARY KEY,"
+                " query TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_accessed REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_search_cache_last_accessed ON search_cache (last_accessed)"
+            )
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached result entry for the query, or None on a miss."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM search_cache WHERE query_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            result, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM search_cache WHERE query_key = ?", (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE search_cache SET last_accessed = ? WHERE query_key = ?", (now, key))
+        self.stats["hits"] += 1
+        return json.loads(result)
+
+    def put(self, query: str, result: Dict[str, Any]):
+        """Stores a result entry and evicts the least recently used entries beyond `max_entries`."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (query_key, query, result, created_at, last_accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, query, json.dumps(result, ensure_ascii=False, default=str), now, now),
+            )
+            self.stats["writes"] += 1
+            count = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM search_cache WHERE query_key IN"
+                    " (SELECT query_key FROM search_cache ORDER BY last_accessed ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.stats["evictions"] += excess
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM search_cache")
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, quote_plus, urljoin, urlparse
+
+import httpx
+import lxml.html
+
+logger = logging.getLogger(__name__)
+
+trafilatura = None
+try:
+    import trafilatura
+except Exception as e:
+    print(f"Warning: Could not import trafilatura, static fetch falls back to MainContentExtractor: {e}")
+
+MainContentExtractor = None
+try:
+    from main_content_extractor import MainContentExtractor
+except Exception as e:
+    print(f"Warning: Could not import MainContentExtractor: {e}")
+
+DEFAULT_SEARCH_URL = "https://html.duckduckgo.com/html/?q={query}"
+# Result links of the DuckDuckGo HTML endpoint, other search pages can pass their own XPath
+DEFAULT_RESULT_LINK_XPATH = "//a[contains(concat(' ', normalize-space(@class), ' '), ' result__a ')]/@href"
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# Pages saying they need JavaScript have to go through the browser agent
+JS_GATE_MARKERS = (
+    "enable javascript",
+    "javascript is required",
+    "javascript is disabled",
+    "requires javascript",
+    "turn on javascript",
+    "checking your browser",
+)
+
+
+def _extract_main_content(html: str, url: str) -> str:
+    text = None
+    if trafilatura is not None:
+        text = trafilatura.extract(html, url=url, include_comments=False, include_tables=True)
+    if not text and MainContentExtractor is not None:
+        text = MainContentExtractor.extract(html, output_format="markdown", include_links=False)
+    return (text or "").strip()
+
+
+def _result_url(href: str, search_url: str) -> Optional[str]:
+    """Resolves a result link, unwrapping search engine redirect links such as DuckDuckGo's `uddg`."""
+    url = urljoin(search_url, href)
+    redirect_target = parse_qs(urlparse(url).query).get("uddg")
+    if redirect_target:
+        url = redirect_target[0]
+    return url if urlparse(url).scheme in ("http", "https") else None
+
+
+class StaticFetcher:
+    """
+    Fetches pages for research queries over plain HTTP: runs the query against a static search
+    results page, fetches the top results concurrently and extracts their main content.
+    Pages that are JS-gated, not HTML, unreachable or shorter than `min_chars` are dropped.
+    """
+
+    def __init__(
+            self,
+            search_url: str = DEFAULT_SEARCH_URL,
+            result_link_xpath: str = DEFAULT_RESULT_LINK_XPATH,
+            max_pages: int = 3,
+            min_chars: int = 400,
+            max_chars_per_page: int = 6000,
+            timeout: float = 10.0,
+            user_agent: str = DEFAULT_USER_AGENT,
+    ):
+        self.search_url = search_url
+        self.result_link_xpath = result_link_xpath
+        self.max_pages = max_pages
+        self.min_chars = min_chars
+        self.max_chars_per_page = max_chars_per_page
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+    async def _search_links(self, client: httpx.AsyncClient, query: str) -> List[str]:
+        search_url = self.search_url.format(query=quote_plus(query))
+        response = await client.get(search_url)
+        response.raise_for_status()
+        links = []
+        for href in lxml.html.fromstring(response.text).xpath(self.result_link_xpath):
+            url = _result_url(str(href), search_url)
+            if url and url not in links:
+                links.append(url)
+        return links[:self.max_pages]
+
+    async def _fetch_page(self, client: httpx.AsyncClient, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+        except Exception as e:
+            logger.info(f"Static fetch of {url} failed: {e}")
+            return None
+        if "html" not in response.headers.get("content-type", "html"):
+            return None
+        html = response.text
+        text = await asyncio.to_thread(_extract_main_content, html, str(response.url))
+        lowered = text.lower()
+        if any(marker in lowered for marker in JS_GATE_MARKERS):
+            logger.info(f"Static fetch of {url} is JS-gated, leaving it to the browser.")
+            return None
+        if len(text) < self.min_chars:
+            return None
+        title = lxml.html.fromstring(html).findtext(".//title") or url
+        return {"url": str(response.url), "title": title.strip(), "text": text[:self.max_chars_per_page]}
+
+    async def fetch(self, query: str) -> List[Dict[str, Any]]:
+        """Returns the usable pages for the query, as dicts with url, title and text. Empty if none."""
+        async with httpx.AsyncClient(
+                timeout=self.timeout, follow_redirects=True, headers={"User-Agent": self.user_agent}
+        ) as client:
+            try:
+                links = await self._search_links(client, query)
+            except Exception as e:
+                logger.info(f"Static search for '{query}' failed: {e}")
+                return []
+            pages = await asyncio.gather(*[self._fetch_page(client, url) for url in links])
+        return [page for page in pages if page]
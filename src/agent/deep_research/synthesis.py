@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+logger = logging.getLogger(__name__)
+
+MAP_CACHE_FILENAME = "synthesis_map_cache.json"
+UNCATEGORIZED = "Other Findings"
+
+
+def estimate_tokens(text: str) -> int:
+    return count_tokens_approximately([HumanMessage(content=text)])
+
+
+def _format_sources(result_entry: Dict[str, Any]) -> str:
+    """Lists the queries of near-duplicate findings merged into this one."""
+    merged_from = result_entry.get("merged_from")
+    if not merged_from:
+        return ""
+    return "- **Also found by:** " + "; ".join(f'"{source.get("query")}"' for source in merged_from) + "\n"
+
+
+def format_search_result(result_entry: Dict[str, Any]) -> str:
+    """Formats one search_results entry as a markdown finding. Returns "" for entries without content."""
+    query = result_entry.get("query", "Unknown Query")  # From parallel_browser_search
+    tool_name = result_entry.get("tool_name")  # From other tools, browser results carry no tool_name
+    status = result_entry.get("status", "unknown")
+    result_data = result_entry.get("result")  # From BrowserUseAgent's final_result
+    tool_output_str = result_entry.get("output")  # From other tools
+
+    if tool_name in (None, "parallel_browser_search") and status == "completed" and result_data:
+        # result_data is the summary string from BrowserUseAgent
+        return (f'### Finding from Web Search Query: "{query}"\n'
+                f"{_format_sources(result_entry)}"
+                f"- **Summary:**\n{result_data}\n"
+                "---\n")
+    elif tool_name and status == "completed" and tool_output_str:
+        return (f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n'
+                f"{_format_sources(result_entry)}"
+                f"- **Output:**\n{tool_output_str}\n"
+                "---\n")
+    elif status == "failed":
+        error = result_entry.get("error")
+        q_or_t = f"Query: \"{query}\"" if query != "Unknown Query" else f"Tool: \"{tool_name}\""
+        return (f'### Failed {q_or_t}\n'
+                f"- **Error:** {error}\n"
+                "---\n")
+    return ""
+
+
+def format_search_results(search_results: Sequence[Dict[str, Any]]) -> str:
+    return "".join(format_search_result(entry) for entry in search_results)
+
+
+def group_results_by_category(
+        search_results: Sequence[Dict[str, Any]], plan: Sequence[Dict[str, Any]]
+) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Groups search results by their plan category, in plan order. Untagged results go last."""
+    groups: Dict[str, List[Dict[str, Any]]] = {category["category_name"]: [] for category in plan}
+    for entry in search_results:
+        groups.setdefault(entry.get("category") or UNCATEGORIZED, []).append(entry)
+    return [(name, entries) for name, entries in groups.items() if entries]
+
+
+def chunk_by_tokens(texts: Sequence[str], max_tokens: int) -> List[str]:
+    """Packs texts into chunks of at most `max_tokens`, truncating single texts that are larger."""
+    chunks: List[str] = []
+    current, current_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if tokens > max_tokens:
+            # Keep the head of oversized findings, roughly 4 characters per token
+            text = text[:max_tokens * 4] + "\n[...truncated...]\n"
+            tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _load_map_cache(output_dir: str) -> Dict[str, str]:
+    cache_file = os.path.join(output_dir, MAP_CACHE_FILENAME)
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable synthesis map cache {cache_file}: {e}")
+        return {}
+
+
+def _save_map_cache(cache: Dict[str, str], output_dir: str):
+    cache_file = os.path.join(output_dir, MAP_CACHE_FILENAME)
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"Failed to save synthesis map cache to {cache_file}: {e}")
+
+
+def _map_cache_key(topic: str, category_name: str, chunk: str) -> str:
+    return hashlib.sha256(f"{topic}\x00{category_name}\x00{chunk}".encode("utf-8")).hexdigest()
+
+
+async def _summarize_chunk(llm: Any, topic: str, category_name: str, chunk: str,
+                           semaphore: Optional[asyncio.Semaphore]) -> str:
+    messages = [
+        SystemMessage(content="You are a research analyst condensing raw findings into dense, factual notes."),
+        HumanMessage(content=(
+            f"Research Topic: {topic}\n"
+            f"Research Category: {category_name}\n\n"
+            "Summarize the findings below into concise markdown notes for a later report. "
+            "Keep every concrete fact, figure, name, source title and URL; drop repetition and irrelevant details. "
+            "Mention failed searches only if they leave a gap in this category.\n\n"
+            f"Findings:\n{chunk}"
+        )),
+    ]
+    if semaphore is None:
+        response = await llm.ainvoke(messages)
+    else:
+        async with semaphore:
+            response = await llm.ainvoke(messages)
+    return response.content
+
+
+async def map_category_summaries(
+        llm: Any,
+        topic: str,
+        search_results: Sequence[Dict[str, Any]],
+        plan: Sequence[Dict[str, Any]],
+        output_dir: str,
+        chunk_tokens: int = 6000,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        metrics: Optional[Any] = None,
+) -> str:
+    """
+    Map step of the hierarchical synthesis. Summarizes each category's findings in
+    token-bounded chunks, in parallel, and returns the summaries formatted per category.
+    Chunk summaries are cached in the output directory so a retry only redoes the reduce step.
+    Cache hits are counted on `metrics` (a RunMetrics) when given.
+    """
+    cache = _load_map_cache(output_dir)
+    jobs: List[Tuple[str, str, str]] = []  # (category, cache key, chunk)
+    for category_name, entries in group_results_by_category(search_results, plan):
+        findings = [text for text in (format_search_result(entry) for entry in entries) if text]
+        for chunk in chunk_by_tokens(findings, chunk_tokens):
+            jobs.append((category_name, _map_cache_key(topic, category_name, chunk), chunk))
+
+    missing = [(category_name, key, chunk) for category_name, key, chunk in jobs if key not in cache]
+    logger.info(f"Map step: {len(jobs)} chunk(s), {len(jobs) - len(missing)} cached, {len(missing)} to summarize.")
+    if metrics:
+        metrics.increment("map_cache_hits", len(jobs) - len(missing))
+    summaries = await asyncio.gather(
+        *[_summarize_chunk(llm, topic, category_name, chunk, semaphore) for category_name, _, chunk in missing],
+        return_exceptions=True,
+    )
+    failures = []
+    for (category_name, key, _), summary in zip(missing, summaries):
+        if isinstance(summary, Exception):
+            failures.append(f"{category_name}: {summary}")
+        else:
+            cache[key] = summary
+    _save_map_cache(cache, output_dir)
+    if failures:
+        raise RuntimeError(f"Map step failed for {len(failures)} chunk(s): {failures}")
+
+    sections: Dict[str, List[str]] = {}
+    for category_name, key, _ in jobs:
+        sections.setdefault(category_name, []).append(cache[key])
+    return "".join(
+        f"## Category Summary: {category_name}\n" + "\n\n".join(parts) + "\n---\n"
+        for category_name, parts in sections.items()
+    )
@@ -0,0 +1,197 @@
+import asyncio
+import itertools
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from browser_use.browser.context import BrowserContextConfig
+
+from .custom_browser import CustomBrowser
+from .custom_context import CustomBrowserContext
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PooledBrowser:
+    browser: CustomBrowser
+    uses: int = 0
+    active: int = 0  # Contexts currently checked out of this browser
+    launching: Optional[asyncio.Task] = None  # Set while the browser process starts
+
+
+class BrowserPool:
+    """
+    Size-bounded pool of pre-launched browsers.
+
+    Callers check out a browser together with a fresh context, and the context is
+    closed again on return. Browsers are health-checked on every checkout and are
+    recycled (closed and relaunched) after `max_uses` checkouts.
+
+    With `contexts_per_browser` above 1, up to that many callers share one browser
+    process, each in its own isolated context with its own downloads directory.
+    New checkouts fill the browsers already in use before another one is launched.
+    Browsers are launched outside the checkout lock, so a slow launch only holds up
+    the checkouts that wait for that browser.
+    """
+
+    def __init__(
+            self,
+            browser_factory: Callable[[], CustomBrowser],
+            context_config: Optional[BrowserContextConfig] = None,
+            max_size: int = 1,
+            max_uses: int = 10,
+            contexts_per_browser: int = 1,
+    ):
+        self.browser_factory = browser_factory
+        self.context_config = context_config
+        self.max_size = max(1, max_size)
+        self.max_uses = max(1, max_uses)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self._idle: asyncio.LifoQueue[_PooledBrowser] = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(self.max_size * self.contexts_per_browser)
+        self._checkout_lock = asyncio.Lock()
+        self._in_use: List[_PooledBrowser] = []
+        self._context_ids = itertools.count()
+        self._closed = False
+
+    async def start(self):
+        """Pre-launches browsers up to the pool size."""
+        entries = await asyncio.gather(
+            *[self._launch() for _ in range(self.max_size - self._idle.qsize())],
+            return_exceptions=True,
+        )
+        for entry in entries:
+            if isinstance(entry, Exception):
+                logger.warning(f"Failed to pre-launch pooled browser: {entry}")
+            else:
+                self._idle.put_nowait(entry)
+        logger.info(f"Browser pool started with {self._idle.qsize()}/{self.max_size} warm browsers.")
+
+    async def _launch(self) -> _PooledBrowser:
+        browser = self.browser_factory()
+        await browser.get_playwright_browser()
+        return _PooledBrowser(browser=browser)
+
+    @staticmethod
+    def _is_healthy(entry: _PooledBrowser) -> bool:
+        playwright_browser = getattr(entry.browser, "playwright_browser", None)
+        try:
+            return playwright_browser is not None and playwright_browser.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    async def _close_browser(entry: _PooledBrowser):
+        try:
+            await entry.browser.close()
+        except Exception as e:
+            logger.error(f"Error closing pooled browser: {e}")
+
+    def _has_room(self, entry: _PooledBrowser) -> bool:
+        starting = entry.launching is not None and not entry.launching.done()
+        return (entry.active < self.contexts_per_browser and entry.uses + entry.active < self.max_uses
+                and (starting or self._is_healthy(entry)))
+
+    async def _checkout(self) -> _PooledBrowser:
+        async with self._checkout_lock:
+            entry = next((e for e in self._in_use if self._has_room(e)), None)
+            while entry is None and not self._idle.empty():
+                entry = self._idle.get_nowait()
+                if not self._is_healthy(entry):
+                    logger.warning("Discarding unhealthy pooled browser.")
+                    await self._close_browser(entry)
+                    entry = None
+            if entry is None:
+                # Reserve the new browser here and launch it after releasing the lock
+                entry = _PooledBrowser(browser=self.browser_factory())
+                entry.launching = asyncio.create_task(entry.browser.get_playwright_browser())
+            if entry.active == 0:
+                self._in_use.append(entry)
+            entry.active += 1
+        if entry.launching is not None:
+            try:
+                # Shielded so a cancelled caller does not abort the launch for callers sharing the browser
+                await asyncio.shield(entry.launching)
+            except BaseException:
+                await self._abandon(entry)
+                raise
+            entry.launching = None
+        return entry
+
+    async def _abandon(self, entry: _PooledBrowser):
+        """Gives back a checkout whose browser failed to launch, closing the browser once unused."""
+        entry.active -= 1
+        if entry.active:
+            return
+        self._in_use.remove(entry)
+        if entry.launching is not None and not entry.launching.done():
+            entry.launching.cancel()
+            await asyncio.gather(entry.launching, return_exceptions=True)
+        await self._close_browser(entry)
+
+    async def _checkin(self, entry: _PooledBrowser):
+        entry.uses += 1
+        entry.active -= 1
+        if entry.active:  # Still shared by other contexts
+            return
+        self._in_use.remove(entry)
+        if self._closed or entry.uses >= self.max_uses or not self._is_healthy(entry):
+            logger.info(f"Recycling pooled browser after {entry.uses} uses.")
+            await self._close_browser(entry)
+        else:
+            self._idle.put_nowait(entry)
+
+    def _isolated_context_config(self, context_config: Optional[BrowserContextConfig]):
+        """Gives contexts sharing a browser their own downloads directory."""
+        if self.contexts_per_browser == 1 or context_config is None or not context_config.save_downloads_path:
+            return context_config
+        return context_config.model_copy(update={
+            "save_downloads_path": os.path.join(context_config.save_downloads_path,
+                                                f"context_{next(self._context_ids)}")
+        })
+
+    @asynccontextmanager
+    async def acquire(
+            self, context_config: Optional[BrowserContextConfig] = None
+    ) -> AsyncIterator[Tuple[CustomBrowser, CustomBrowserContext]]:
+        """Checks out a browser and a fresh context, returning both to the pool on exit."""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed.")
+        async with self._slots:
+            entry = await self._checkout()
+            browser_context = None
+            try:
+                browser_context = await entry.browser.new_context(
+                    config=self._isolated_context_config(context_config or self.context_config)
+                )
+                yield entry.browser, browser_context
+            finally:
+                if browser_context:
+                    try:
+                        await browser_context.close()
+                    except Exception as e:
+                        logger.error(f"Error closing pooled browser context: {e}")
+                await self._checkin(entry)
+
+    def kill(self):
+        """Kills all browsers of the pool, idle and checked out, without waiting for them to close."""
+        self._closed = True
+        entries = list(self._in_use)
+        while not self._idle.empty():
+            entries.append(self._idle.get_nowait())
+        for entry in entries:
+            try:
+                entry.browser.kill()
+            except Exception as e:
+                logger.error(f"Error killing pooled browser: {e}")
+        logger.info("Browser pool killed.")
+
+    async def close(self):
+        """Closes all idle browsers. Browsers still checked out are closed on return."""
+        self._closed = True
+        while not self._idle.empty():
+            await self._close_browser(self._idle.get_nowait())
+        logger.info("Browser pool closed.")
@@ -107,3 +107,27 @@ class CustomBrowser(Browser):
             handle_sigint=False,
         )
         return browser
+
+    def kill(self):
+        """
+        Kills the browser processes without a graceful close, for browsers that do not close in time.
+        Browsers launched by Playwright exit together with its driver process.
+        """
+        chrome_proc = getattr(self, '_chrome_subprocess', None)
+        if chrome_proc:
+            try:
+                for proc in chrome_proc.children(recursive=True):
+                    proc.kill()
+                chrome_proc.kill()
+            except Exception as e:
+                logger.debug(f'Failed to kill chrome subprocess: {e}')
+        connection = getattr(getattr(self.playwright, '_impl_obj', None), '_connection', None)
+        driver_proc = getattr(getattr(connection, '_transport', None), '_proc', None)
+        if driver_proc is not None and driver_proc.returncode is None:
+            try:
+                driver_proc.kill()
+            except ProcessLookupError:
+                pass
+        self.playwright_browser = None
+        self.playwright = None
+        self._chrome_subprocess = None
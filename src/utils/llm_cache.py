@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumps, loads
+
+from src.utils.embeddings import HashingEmbeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_CACHE_PATH = "./tmp/llm_cache/llm_cache.sqlite"
+
+
+def _prompt_text(prompt: str) -> str:
+    """Message contents of a serialized chat prompt, the text the semantic mode compares."""
+    try:
+        messages = json.loads(prompt)
+        return "\n".join(str(message["kwargs"].get("content", "")) for message in messages)
+    except Exception:
+        return prompt
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Disk-backed LangChain cache of LLM responses, keyed by prompt and model settings (`llm_string`).
+
+    Exact mode only returns responses to the identical prompt. With a `semantic_threshold`, a miss
+    falls back to the response of the most similar cached prompt of the same model whose cosine
+    similarity reaches the threshold. Entries expire after `ttl_seconds` and the least recently
+    used entries are evicted once more than `max_entries` are stored. Hit and miss counters cover
+    this process.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_LLM_CACHE_PATH, ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 max_entries: int = 10000, semantic_threshold: Optional[float] = None,
+                 embeddings: Optional[Embeddings] = None):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " prompt TEXT NOT NULL,"
+                " llm_string TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " embedding TEXT,"
+                " created_at REAL NOT NULL,"
+                " last_accessed REAL NOT NULL,"
+                " PRIMARY KEY (prompt, llm_string))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)")
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(_prompt_text(prompt)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _semantic_match(self, prompt: str, llm_string: str, oldest: float):
+        """Returns (prompt, response) of the most similar cached prompt above the threshold, or None."""
+        vector = self._embed(prompt)
+        rows = self._conn.execute(
+            "SELECT prompt, response, embedding FROM llm_cache"
+            " WHERE llm_string = ? AND embedding IS NOT NULL AND created_at >= ?", (llm_string, oldest)
+        ).fetchall()
+        best, best_similarity = None, self.semantic_threshold
+        for row_prompt, response, embedding in rows:
+            cached_vector = np.asarray(json.loads(embedding), dtype=np.float32)
+            if cached_vector.shape != vector.shape:  # Stored with different embeddings
+                continue
+            similarity = float(cached_vector @ vector)
+            if similarity >= best_similarity:
+                best, best_similarity = (row_prompt, response), similarity
+        return best
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Returns the cached generations for the prompt, or None on a miss."""
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds is not None else 0
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE prompt = ? AND llm_string = ?", (prompt, llm_string)
+            ).fetchone()
+            if row is not None and row[1] < oldest:
+                self._conn.execute("DELETE FROM llm_cache WHERE prompt = ? AND llm_string = ?", (prompt, llm_string))
+                self.stats["expired"] += 1
+                row = None
+            matched_prompt = prompt
+            if row is None and self.semantic_threshold is not None:
+                match = self._semantic_match(prompt, llm_string, oldest)
+                if match is not None:
+                    matched_prompt, response = match
+                    row = (response, None)
+                    self.stats["semantic_hits"] += 1
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE prompt = ? AND llm_string = ?",
+                               (now, matched_prompt, llm_string))
+        self.stats["hits"] += 1
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", LangChainBetaWarning)
+                return loads(row[0])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        """Stores the generations and evicts the least recently used entries beyond `max_entries`."""
+        embedding = json.dumps(self._embed(prompt).tolist()) if self.semantic_threshold is not None else None
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (prompt, llm_string, response, embedding, created_at, last_accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (prompt, llm_string, dumps(list(return_val)), embedding, now, now),
+            )
+            self.stats["writes"] += 1
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE rowid IN"
+                    " (SELECT rowid FROM llm_cache ORDER BY last_accessed ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.stats["evictions"] += excess
+
+    def clear(self, **kwargs: Any):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "", "none", "None") else None
+
+
+class LLMCacheSettings:
+    """
+    Which providers get the response cache, read from the environment:
+
+        LLM_CACHE_PROVIDERS            comma separated providers, or "*" for all (default: none)
+        LLM_CACHE_PATH                 SQLite file (default ./tmp/llm_cache/llm_cache.sqlite)
+        LLM_CACHE_TTL_SECONDS          entry lifetime, "none" never expires (default one week)
+        LLM_CACHE_MAX_ENTRIES          entries kept before LRU eviction (default 10000)
+        LLM_CACHE_SEMANTIC_THRESHOLD   enables the semantic mode at this cosine similarity
+    """
+
+    def __init__(self, providers: Sequence[str] = (), db_path: str = DEFAULT_LLM_CACHE_PATH,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600, max_entries: int = 10000,
+                 semantic_threshold: Optional[float] = None):
+        self.providers = {provider.strip() for provider in providers if provider.strip()}
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+
+    @classmethod
+    def from_env(cls) -> "LLMCacheSettings":
+        return cls(
+            providers=os.getenv("LLM_CACHE_PROVIDERS", "").split(","),
+            db_path=os.getenv("LLM_CACHE_PATH", DEFAULT_LLM_CACHE_PATH),
+            ttl_seconds=_optional_float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            semantic_threshold=_optional_float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD")),
+        )
+
+    def enabled_for(self, provider: str) -> bool:
+        return "*" in self.providers or provider in self.providers
+
+    def key(self) -> tuple:
+        return self.db_path, self.ttl_seconds, self.max_entries, self.semantic_threshold
+
+
+_caches: Dict[tuple, SQLiteLLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_response_cache(provider: str, settings: Optional[LLMCacheSettings] = None) -> Optional[SQLiteLLMCache]:
+    """Returns the shared response cache for the provider, or None if caching is off for it."""
+    settings = settings or LLMCacheSettings.from_env()
+    if not settings.enabled_for(provider):
+        return None
+    with _caches_lock:
+        cache = _caches.get(settings.key())
+        if cache is None:
+            cache = _caches[settings.key()] = SQLiteLLMCache(
+                settings.db_path, ttl_seconds=settings.ttl_seconds, max_entries=settings.max_entries,
+                semantic_threshold=settings.semantic_threshold,
+            )
+        return cache
@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatResult
+
+logger = logging.getLogger(__name__)
+
+# How often a queued request re-checks for a free in-flight slot
+IN_FLIGHT_POLL_SECONDS = 0.05
+
+
+def _limit_from_env(name: str) -> Optional[float]:
+    value = os.getenv(name, "")
+    return float(value) if value else None
+
+
+class ProviderGovernor:
+    """
+    Shared request and token budget of one provider key.
+
+    Requests and tokens per minute are token buckets holding up to one minute of budget, so
+    bursts up to the per-minute limit pass at once and the rest is spread out. `max_in_flight`
+    caps concurrent requests. Callers that are over budget wait in `acquire` instead of
+    failing. Token use is estimated from the prompt up front and corrected with the usage the
+    provider reports.
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_in_flight: Optional[int] = None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = max_in_flight
+        self._request_budget = requests_per_minute or 0.0
+        self._token_budget = tokens_per_minute or 0.0
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.stats = {"requests": 0, "queued_requests": 0, "total_wait_s": 0.0, "max_wait_s": 0.0,
+                      "max_queue_depth": 0, "tokens": 0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.requests_per_minute:
+            self._request_budget = min(self.requests_per_minute,
+                                       self._request_budget + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._token_budget = min(self.tokens_per_minute,
+                                     self._token_budget + elapsed * self.tokens_per_minute / 60)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Takes a slot and returns 0, or returns how long to wait before trying again."""
+        with self._lock:
+            self._refill(time.monotonic())
+            waits = []
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                waits.append(IN_FLIGHT_POLL_SECONDS)
+            if self.requests_per_minute and self._request_budget < 1:
+                waits.append((1 - self._request_budget) * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                tokens = min(tokens, self.tokens_per_minute)  # A prompt above the limit still goes through
+                if self._token_budget < tokens:
+                    waits.append((tokens - self._token_budget) * 60 / self.tokens_per_minute)
+            if waits:
+                return max(waits)
+            self._request_budget -= 1
+            self._token_budget -= tokens
+            self.in_flight += 1
+            return 0.0
+
+    def _enqueue(self):
+        with self._lock:
+            self.queue_depth += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+
+    def _dequeue(self, waited_s: float):
+        with self._lock:
+            self.queue_depth -= 1
+            self.stats["total_wait_s"] += waited_s
+            self.stats["max_wait_s"] = max(self.stats["max_wait_s"], waited_s)
+
+    def _admitted(self, waited_s: float):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["queued_requests"] += waited_s > 0
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Waits until the request fits the budget and takes its slot. Returns the seconds waited."""
+        wait = self._try_acquire(tokens)
+        if not wait:
+            self._admitted(0.0)
+            return 0.0
+        started = time.monotonic()
+        self._enqueue()
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._try_acquire(tokens)
+        finally:
+            self._dequeue(time.monotonic() - started)
+        waited_s = time.monotonic() - started
+        logger.debug(f"LLM request to {self.name} waited {waited_s:.2f}s for budget")
+        self._admitted(waited_s)
+        return waited_s
+
+    def acquire_blocking(self, tokens: int = 0) -> float:
+        """`acquire` for sync callers, sleeping the thread while waiting."""
+        wait = self._try_acquire(tokens)
+        if not wait:
+            self._admitted(0.0)
+            return 0.0
+        started = time.monotonic()
+        self._enqueue()
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self._try_acquire(tokens)
+        finally:
+            self._dequeue(time.monotonic() - started)
+        waited_s = time.monotonic() - started
+        self._admitted(waited_s)
+        return waited_s
+
+    def release(self, estimated_tokens: int = 0, used_tokens: Optional[int] = None):
+        """Frees the in-flight slot and charges the tokens the provider reported beyond the estimate."""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            used = estimated_tokens if used_tokens is None else used_tokens
+            self.stats["tokens"] += used
+            if self.tokens_per_minute:
+                self._token_budget -= used - estimated_tokens
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = self.stats["queued_requests"]
+            return {
+                **self.stats,
+                "total_wait_s": round(self.stats["total_wait_s"], 4),
+                "max_wait_s": round(self.stats["max_wait_s"], 4),
+                "avg_wait_s": round(self.stats["total_wait_s"] / queued, 4) if queued else 0.0,
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+            }
+
+
+def _usage_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("input_tokens", 0) + usage.get("output_tokens", 0) if usage else None
+
+
+def _result_tokens(result: ChatResult) -> Optional[int]:
+    used = None
+    for generation in result.generations:
+        tokens = _usage_tokens(getattr(generation, "message", None))
+        if tokens is not None:
+            used = (used or 0) + tokens
+    return used
+
+
+# Set while a governed call runs, so provider calls nested in it (e.g. `_agenerate` streaming
+# through `_astream`, or the default `_agenerate` running `_generate` in a thread) take no second slot
+_in_governed_call: ContextVar[bool] = ContextVar("in_governed_call", default=False)
+
+
+def _reset_governed_call(token):
+    try:
+        _in_governed_call.reset(token)
+    except ValueError:
+        pass  # A stream closed from another context
+
+
+def govern_llm(llm: BaseChatModel, governor: Optional[ProviderGovernor]):
+    """
+    Puts the provider calls of a model through a governor, or takes it out again with None.
+
+    The model's `_generate`/`_agenerate`/`_stream`/`_astream` are wrapped on the instance: a
+    call waits until it fits the budget and frees its slot in a `finally`, so failed and
+    cancelled calls release it too. Calls answered from the model's response cache never
+    reach these methods and use no budget.
+    """
+    object.__setattr__(llm, "_llm_governor", governor)
+    if "_agenerate" in llm.__dict__:
+        return  # Already wrapped, the wrappers read the current governor
+    agenerate, generate, astream, stream = llm._agenerate, llm._generate, llm._astream, llm._stream
+
+    def current_governor() -> Optional[ProviderGovernor]:
+        return None if _in_governed_call.get() else llm.__dict__.get("_llm_governor")
+
+    async def governed_agenerate(messages, *args, **kwargs):
+        governor = current_governor()
+        if governor is None:
+            return await agenerate(messages, *args, **kwargs)
+        tokens = count_tokens_approximately(messages)
+        await governor.acquire(tokens)
+        token, used = _in_governed_call.set(True), None
+        try:
+            result = await agenerate(messages, *args, **kwargs)
+            used = _result_tokens(result)
+            return result
+        finally:
+            _reset_governed_call(token)
+            governor.release(tokens, used)
+
+    def governed_generate(messages, *args, **kwargs):
+        governor = current_governor()
+        if governor is None:
+            return generate(messages, *args, **kwargs)
+        tokens = count_tokens_approximately(messages)
+        governor.acquire_blocking(tokens)
+        token, used = _in_governed_call.set(True), None
+        try:
+            result = generate(messages, *args, **kwargs)
+            used = _result_tokens(result)
+            return result
+        finally:
+            _reset_governed_call(token)
+            governor.release(tokens, used)
+
+    async def governed_astream(messages, *args, **kwargs):
+        governor = current_governor()
+        if governor is None:
+            async for chunk in astream(messages, *args, **kwargs):
+                yield chunk
+            return
+        tokens = count_tokens_approximately(messages)
+        await governor.acquire(tokens)
+        token, used = _in_governed_call.set(True), None
+        try:
+            async for chunk in astream(messages, *args, **kwargs):
+                chunk_tokens = _usage_tokens(chunk.message)
+                if chunk_tokens is not None:
+                    used = (used or 0) + chunk_tokens
+                yield chunk
+        finally:
+            _reset_governed_call(token)
+            governor.release(tokens, used)
+
+    def governed_stream(messages, *args, **kwargs):
+        governor = current_governor()
+        if governor is None:
+            yield from stream(messages, *args, **kwargs)
+            return
+        tokens = count_tokens_approximately(messages)
+        governor.acquire_blocking(tokens)
+        token, used = _in_governed_call.set(True), None
+        try:
+            for chunk in stream(messages, *args, **kwargs):
+                chunk_tokens = _usage_tokens(chunk.message)
+                if chunk_tokens is not None:
+                    used = (used or 0) + chunk_tokens
+                yield chunk
+        finally:
+            _reset_governed_call(token)
+            governor.release(tokens, used)
+
+    for name, method in (("_agenerate", governed_agenerate), ("_generate", governed_generate),
+                         ("_astream", governed_astream), ("_stream", governed_stream)):
+        object.__setattr__(llm, name, method)
+
+
+# Semaphores held by the current call, so `_agenerate` streaming through `_astream` takes no second slot
+_held_semaphores: ContextVar[frozenset] = ContextVar("held_llm_semaphores", default=frozenset())
+
+
+def limit_llm_concurrency(llm: Any, semaphore: Optional[asyncio.Semaphore]) -> Any:
+    """
+    Returns a copy of the model whose async provider calls each hold a slot of `semaphore`, e.g.
+    the LLM call quota of a research job, for callers that make their own LLM calls such as
+    browser agents. The model itself is left as is. Objects that are not chat models are returned
+    unchanged.
+    """
+    if semaphore is None or not isinstance(llm, BaseChatModel):
+        return llm
+    limited = llm.model_copy()
+    agenerate, astream = limited._agenerate, limited._astream
+
+    async def limited_agenerate(messages, *args, **kwargs):
+        held = _held_semaphores.get()
+        if semaphore in held:
+            return await agenerate(messages, *args, **kwargs)
+        async with semaphore:
+            token = _held_semaphores.set(held | {semaphore})
+            try:
+                return await agenerate(messages, *args, **kwargs)
+            finally:
+                _held_semaphores.reset(token)
+
+    async def limited_astream(messages, *args, **kwargs):
+        held = _held_semaphores.get()
+        if semaphore in held:
+            async for chunk in astream(messages, *args, **kwargs):
+                yield chunk
+            return
+        async with semaphore:
+            token = _held_semaphores.set(held | {semaphore})
+            try:
+                async for chunk in astream(messages, *args, **kwargs):
+                    yield chunk
+            finally:
+                try:
+                    _held_semaphores.reset(token)
+                except ValueError:
+                    pass  # A stream closed from another context
+
+    object.__setattr__(limited, "_agenerate", limited_agenerate)
+    object.__setattr__(limited, "_astream", limited_astream)
+    return limited
+
+
+_governors: Dict[Tuple[str, str], ProviderGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_llm_governor(provider: str, api_key: Optional[str] = None) -> Optional[ProviderGovernor]:
+    """
+    Returns the shared governor of the provider key, or None if the provider has no limits.
+    Limits are read from {PROVIDER}_REQUESTS_PER_MINUTE, {PROVIDER}_TOKENS_PER_MINUTE and
+    {PROVIDER}_MAX_IN_FLIGHT. Keys of one provider are governed separately.
+    """
+    prefix = provider.upper()
+    max_in_flight = _limit_from_env(f"{prefix}_MAX_IN_FLIGHT")
+    limits = (
+        _limit_from_env(f"{prefix}_REQUESTS_PER_MINUTE"),
+        _limit_from_env(f"{prefix}_TOKENS_PER_MINUTE"),
+        int(max_in_flight) if max_in_flight else None,
+    )
+    if not any(limits):
+        return None
+    key = (provider, hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:16])
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None or (governor.requests_per_minute, governor.tokens_per_minute,
+                                governor.max_in_flight) != limits:
+            # Changed limits start a new budget, calls still running release into the old one
+            governor = _governors[key] = ProviderGovernor(f"{provider}:{key[1][:8]}", *limits)
+        return governor
+
+
+def llm_governor_metrics() -> List[Dict[str, Any]]:
+    """Queue depth, in-flight requests and wait times of every provider key governed so far."""
+    with _governors_lock:
+        governors = list(_governors.values())
+    return [{"governor": governor.name, **governor.metrics()} for governor in governors]
@@ -1,5 +1,7 @@
-from openai import OpenAI
+import hashlib
 import pdb
+import threading
+from collections import OrderedDict
 from langchain_openai import ChatOpenAI
 from langchain_core.globals import get_llm_cache
 from langchain_core.language_models.base import (
@@ -11,6 +13,7 @@ import os
 from langchain_core.load import dumpd, dumps
 from langchain_core.messages import (
     AIMessage,
+    AIMessageChunk,
     SystemMessage,
     AnyMessage,
     BaseMessage,
@@ -55,68 +58,99 @@ from langchain_aws import ChatBedrock
 from pydantic import SecretStr
 
 from src.utils import config
+from src.utils.llm_cache import get_llm_response_cache
+from src.utils.llm_governor import get_llm_governor, govern_llm
 
 
 class DeepSeekR1ChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI for DeepSeek reasoner models, which answer with a `reasoning_content` next to the
+    `content`. Requests go through the pooled clients ChatOpenAI keeps per instance, the async
+    client for `ainvoke`/`astream`, so a long reasoning call never blocks the event loop.
+    Streamed chunks carry the reasoning in `additional_kwargs["reasoning_content"]`.
+    """
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
-        self.client = OpenAI(
-            base_url=kwargs.get("base_url"),
-            api_key=kwargs.get("api_key")
-        )
-
-    async def ainvoke(
-            self,
-            input: LanguageModelInput,
-            config: Optional[RunnableConfig] = None,
-            *,
-            stop: Optional[list[str]] = None,
-            **kwargs: Any,
-    ) -> AIMessage:
+    @staticmethod
+    def _message_history(messages: List[BaseMessage]) -> List[dict]:
         message_history = []
-        for input_ in input:
-            if isinstance(input_, SystemMessage):
-                message_history.append({"role": "system", "content": input_.content})
-            elif isinstance(input_, AIMessage):
-                message_history.append({"role": "assistant", "content": input_.content})
+        for message in messages:
+            if isinstance(message, SystemMessage):
+                message_history.append({"role": "system", "content": message.content})
+            elif isinstance(message, AIMessage):
+                message_history.append({"role": "assistant", "content": message.content})
             else:
-                message_history.append({"role": "user", "content": input_.content})
+                message_history.append({"role": "user", "content": message.content})
+        return message_history
 
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=message_history
+    def _request_params(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> dict:
+        params = {"model": self.model_name, "messages": self._message_history(messages), **kwargs}
+        if stop:
+            params["stop"] = stop
+        return params
+
+    @staticmethod
+    def _usage_metadata(usage) -> Optional[dict]:
+        if not usage:
+            return None
+        return {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens}
+
+    def _to_result(self, response) -> ChatResult:
+        message = response.choices[0].message
+        reasoning_content = getattr(message, "reasoning_content", None)
+        ai_message = AIMessage(
+            content=message.content or "",
+            reasoning_content=reasoning_content,
+            # Also kept in additional_kwargs, which survives serialization (e.g. by the response cache)
+            additional_kwargs={"reasoning_content": reasoning_content} if reasoning_content else {},
+            usage_metadata=self._usage_metadata(response.usage),
         )
+        return ChatResult(generations=[ChatGeneration(message=ai_message)],
+                          llm_output={"model_name": response.model})
 
-        reasoning_content = response.choices[0].message.reasoning_content
-        content = response.choices[0].message.content
-        return AIMessage(content=content, reasoning_content=reasoning_content)
+    def _to_chunk(self, chunk) -> Optional[ChatGenerationChunk]:
+        usage_metadata = self._usage_metadata(getattr(chunk, "usage", None))
+        if not chunk.choices:
+            if usage_metadata is None:
+                return None
+            return ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage_metadata))
+        delta = chunk.choices[0].delta
+        reasoning_content = getattr(delta, "reasoning_content", None)
+        return ChatGenerationChunk(message=AIMessageChunk(
+            content=delta.content or "",
+            additional_kwargs={"reasoning_content": reasoning_content} if reasoning_content else {},
+            usage_metadata=usage_metadata,
+        ))
 
-    def invoke(
-            self,
-            input: LanguageModelInput,
-            config: Optional[RunnableConfig] = None,
-            *,
-            stop: Optional[list[str]] = None,
-            **kwargs: Any,
-    ) -> AIMessage:
-        message_history = []
-        for input_ in input:
-            if isinstance(input_, SystemMessage):
-                message_history.append({"role": "system", "content": input_.content})
-            elif isinstance(input_, AIMessage):
-                message_history.append({"role": "assistant", "content": input_.content})
-            else:
-                message_history.append({"role": "user", "content": input_.content})
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        response = self.root_client.chat.completions.create(**self._request_params(messages, stop, **kwargs))
+        return self._to_result(response)
 
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=message_history
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        response = await self.root_async_client.chat.completions.create(
+            **self._request_params(messages, stop, **kwargs)
         )
+        return self._to_result(response)
 
-        reasoning_content = response.choices[0].message.reasoning_content
-        content = response.choices[0].message.content
-        return AIMessage(content=content, reasoning_content=reasoning_content)
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        params = self._request_params(messages, stop, stream=True, stream_options={"include_usage": True}, **kwargs)
+        for chunk in self.root_client.chat.completions.create(**params):
+            generation_chunk = self._to_chunk(chunk)
+            if generation_chunk is None:
+                continue
+            if run_manager:
+                run_manager.on_llm_new_token(generation_chunk.text, chunk=generation_chunk)
+            yield generation_chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        params = self._request_params(messages, stop, stream=True, stream_options={"include_usage": True}, **kwargs)
+        async for chunk in await self.root_async_client.chat.completions.create(**params):
+            generation_chunk = self._to_chunk(chunk)
+            if generation_chunk is None:
+                continue
+            if run_manager:
+                await run_manager.on_llm_new_token(generation_chunk.text, chunk=generation_chunk)
+            yield generation_chunk
 
 
 class DeepSeekR1ChatOllama(ChatOllama):
@@ -154,10 +188,84 @@ class DeepSeekR1ChatOllama(ChatOllama):
         return AIMessage(content=content, reasoning_content=reasoning_content)
 
 
-def get_llm_model(provider: str, **kwargs):
+def _fingerprint(*values: Any) -> str:
+    """Short digest of secrets, so registry keys never hold credentials."""
+    return hashlib.sha256(repr(values).encode("utf-8")).hexdigest()[:16]
+
+
+class LLMClientRegistry:
+    """
+    Process-wide LRU registry of chat model clients.
+
+    Clients are keyed by provider, model, endpoint, a fingerprint of the credentials and the
+    sampling parameters, so repeated runs with the same settings reuse one client together with
+    its warm HTTP connection pool. Settings the provider reads from the environment (variables
+    starting with the provider name, e.g. OPENAI_ENDPOINT) are part of the key as well.
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max(1, max_size)
+        self._clients: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(provider: str, kwargs: dict) -> tuple:
+        settings = []
+        for name, value in sorted(kwargs.items()):
+            if name == "api_key":
+                value = _fingerprint(value)
+            settings.append((name, repr(value)))
+        prefix = f"{provider.upper()}_"
+        provider_env = sorted((k, v) for k, v in os.environ.items() if k.upper().startswith(prefix))
+        return provider, tuple(settings), _fingerprint(provider_env)
+
+    def get_or_create(self, key: tuple, factory: Callable[[], BaseLanguageModel]) -> BaseLanguageModel:
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return client
+            self.misses += 1
+        client = factory()  # Created outside the lock, a concurrent miss for the same key keeps the first
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate(self, provider: Optional[str] = None, model_name: Optional[str] = None) -> int:
+        """Drops the clients of a provider (and model), or all clients. Returns how many were dropped."""
+        with self._lock:
+            keys = [
+                key for key in self._clients
+                if (provider is None or key[0] == provider)
+                   and (model_name is None or ("model_name", repr(model_name)) in key[1])
+            ]
+            for key in keys:
+                del self._clients[key]
+        return len(keys)
+
+    def __len__(self):
+        return len(self._clients)
+
+
+llm_client_registry = LLMClientRegistry(max_size=int(os.getenv("LLM_CLIENT_REGISTRY_SIZE", "16")))
+
+
+def invalidate_llm_clients(provider: Optional[str] = None, model_name: Optional[str] = None) -> int:
+    """Drops cached clients, e.g. after rotating an API key or changing provider settings."""
+    return llm_client_registry.invalidate(provider, model_name)
+
+
+def get_llm_model(provider: str, reuse_client: bool = True, **kwargs):
     """
     Get LLM model
     :param provider: LLM provider
+    :param reuse_client: Return the client from the process-wide registry created for the same settings
     :param kwargs:
     :return:
     """
@@ -170,6 +278,20 @@ def get_llm_model(provider: str, **kwargs):
             raise ValueError(error_msg)
         kwargs["api_key"] = api_key
 
+    if not reuse_client:
+        llm = _create_llm_model(provider, **kwargs)
+    else:
+        llm = llm_client_registry.get_or_create(
+            LLMClientRegistry.key(provider, kwargs), lambda: _create_llm_model(provider, **kwargs)
+        )
+    # Opt-in response cache, configured through the LLM_CACHE_* environment variables
+    llm.cache = get_llm_response_cache(provider)
+    govern_llm(llm, get_llm_governor(provider, kwargs.get("api_key")))
+    return llm
+
+
+def _create_llm_model(provider: str, **kwargs):
+    api_key = kwargs.get("api_key")
     if provider == "anthropic":
         if not kwargs.get("base_url", ""):
             base_url = "https://api.anthropic.com"
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from pydantic import PrivateAttr, field_validator
+
+from src.utils.llm_provider import get_llm_model
+
+logger = logging.getLogger(__name__)
+
+
+def _route_name(model: Runnable) -> str:
+    bound = getattr(model, "bound", model)  # Models with bound tools
+    name = getattr(bound, "model_name", None) or getattr(bound, "model", None)
+    return f"{type(bound).__name__}:{name}" if name else type(bound).__name__
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    Chat model that routes every request to the healthiest of several models and fails over.
+
+    Each model keeps a rolling window of its last `window` calls. Models are ranked by median
+    latency plus `error_penalty_s` times their error rate; models without calls yet rank first,
+    so every route gets probed. A failed call is retried on the next model in the ranking.
+
+    Async calls are hedged: when the model answering takes longer than its `hedge_percentile`
+    latency (once it has `hedge_min_samples` calls), the request is also sent to the next model
+    and the first answer wins, the other call is cancelled. The time the losing call had taken is
+    recorded as a lower bound of its latency, so a route that turned slow drops in the ranking.
+    Sync calls only fail over.
+    """
+
+    models: List[Runnable]
+    window: int = 50
+    error_penalty_s: float = 30.0
+    hedge: bool = True
+    hedge_percentile: float = 90.0
+    hedge_min_samples: int = 5
+
+    _stats: List[deque] = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @field_validator("models")
+    @classmethod
+    def _require_models(cls, models: List[Runnable]) -> List[Runnable]:
+        if not models:
+            raise ValueError("RouterChatModel needs at least one model to route to.")
+        return models
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._stats = [deque(maxlen=self.window) for _ in self.models]
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"routes": [_route_name(model) for model in self.models]}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "RouterChatModel":
+        router = self.model_copy(update={"models": [model.bind_tools(tools, **kwargs) for model in self.models]})
+        router._stats = self._stats  # Bound copies share the health of the routes
+        router._lock = self._lock
+        return router
+
+    def _record(self, index: int, latency_s: float, ok: bool):
+        with self._lock:
+            self._stats[index].append((latency_s, ok))
+
+    def _score(self, index: int) -> float:
+        with self._lock:
+            calls = list(self._stats[index])
+        if not calls:
+            return 0.0
+        error_rate = sum(1 for _, ok in calls if not ok) / len(calls)
+        latencies = [latency for latency, ok in calls if ok]
+        median = float(np.median(latencies)) if latencies else 0.0
+        return median + self.error_penalty_s * error_rate
+
+    def _ranked(self) -> List[int]:
+        return sorted(range(len(self.models)), key=self._score)
+
+    def _hedge_delay(self, index: int) -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self._lock:
+            latencies = [latency for latency, ok in self._stats[index] if ok]
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return float(np.percentile(latencies, self.hedge_percentile))
+
+    def health(self) -> List[Dict[str, Any]]:
+        """Rolling call count, error rate and latency percentiles of every route, in routing order."""
+        health = []
+        for index in self._ranked():
+            with self._lock:
+                calls = list(self._stats[index])
+            latencies = [latency for latency, ok in calls if ok]
+            health.append({
+                "route": _route_name(self.models[index]),
+                "calls": len(calls),
+                "error_rate": round(sum(1 for _, ok in calls if not ok) / len(calls), 3) if calls else 0.0,
+                "p50_s": round(float(np.percentile(latencies, 50)), 4) if latencies else None,
+                "p90_s": round(float(np.percentile(latencies, 90)), 4) if latencies else None,
+            })
+        return health
+
+    @staticmethod
+    def _to_result(message: BaseMessage) -> ChatResult:
+        if not isinstance(message, BaseMessage):
+            message = AIMessage(content=str(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        last_error = None
+        for index in self._ranked():
+            started = time.perf_counter()
+            try:
+                message = self.models[index].invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self._record(index, time.perf_counter() - started, False)
+                logger.warning(f"LLM route {_route_name(self.models[index])} failed, failing over: {e}")
+                last_error = e
+                continue
+            self._record(index, time.perf_counter() - started, True)
+            return self._to_result(message)
+        raise last_error
+
+    async def _acall(self, index: int, messages: List[BaseMessage], stop, **kwargs: Any) -> BaseMessage:
+        started = time.perf_counter()
+        try:
+            message = await self.models[index].ainvoke(messages, stop=stop, **kwargs)
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race, recorded by _agenerate, or cancelled by the caller
+        except Exception:
+            self._record(index, time.perf_counter() - started, False)
+            raise
+        self._record(index, time.perf_counter() - started, True)
+        return message
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        candidates = self._ranked()
+        pending: Dict[asyncio.Task, int] = {}
+        started: Dict[asyncio.Task, float] = {}
+        last_error = None
+        hedged = False
+        answered = False
+
+        def launch():
+            index = candidates.pop(0)
+            task = asyncio.create_task(self._acall(index, messages, stop, **kwargs))
+            pending[task] = index
+            started[task] = time.perf_counter()
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if not hedged and candidates and len(pending) == 1:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"LLM route {_route_name(self.models[next(iter(pending.values()))])} is slow, "
+                                f"hedging with {_route_name(self.models[candidates[0]])}")
+                    hedged = True
+                    launch()
+                    continue
+                for task in done:
+                    index = pending.pop(task)
+                    if task.exception() is None:
+                        answered = True
+                        return self._to_result(task.result())
+                    last_error = task.exception()
+                    logger.warning(f"LLM route {_route_name(self.models[index])} failed, failing over: {last_error}")
+                if not pending and candidates:
+                    launch()
+            raise last_error
+        finally:
+            for task, index in pending.items():
+                if answered and not task.done():
+                    # Lost the hedge race: slower than the winner, at least this slow
+                    self._record(index, time.perf_counter() - started[task], True)
+                task.cancel()
+
+
+def create_llm_router(routes: Sequence[Dict[str, Any]], **router_kwargs: Any) -> RouterChatModel:
+    """
+    Creates a router over models from `get_llm_model`. Every route is a dict with the `provider`
+    and the keyword arguments of `get_llm_model`, e.g. {"provider": "openai", "model_name": "gpt-4o"}.
+    """
+    models = [get_llm_model(**dict(route)) for route in routes]
+    return RouterChatModel(models=models, **router_kwargs)
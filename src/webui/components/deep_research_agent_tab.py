@@ -9,11 +9,14 @@ import os
 from typing import Any, Dict, AsyncGenerator, Optional, Tuple, Union
 import asyncio
 import json
-from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+from src.agent.deep_research.deep_research_agent import DeepResearchAgent, format_plan_markdown
 from src.utils import llm_provider
 
 logger = logging.getLogger(__name__)
 
+# Minimum time between two updates of the streamed report, each of which resends the whole report
+REPORT_UPDATE_INTERVAL = 0.25
+
 
 async def _initialize_llm(provider: Optional[str], model_name: Optional[str], temperature: float,
                           base_url: Optional[str], api_key: Optional[str], num_ctx: Optional[int] = None):
@@ -107,10 +110,9 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
 
     agent_task = None
     running_task_id = None
-    plan_file_path = None
     report_file_path = None
-    last_plan_content = None
-    last_plan_mtime = 0
+    events = None
+    next_event = None
 
     try:
         # --- 3. Get LLM and Browser Config from other tabs ---
@@ -156,6 +158,8 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             logger.info("DeepResearchAgent initialized.")
 
         # --- 5. Start Agent Run ---
+        # Subscribe before starting, so no progress event of the run is missed
+        events = webui_manager.dr_agent.events()
         agent_run_coro = webui_manager.dr_agent.run(
             topic=task_topic,
             task_id=task_id_to_resume,
@@ -165,68 +169,60 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
         agent_task = asyncio.create_task(agent_run_coro)
         webui_manager.dr_current_task = agent_task
 
-        # Wait briefly for the agent to start and potentially create the task ID/folder
-        await asyncio.sleep(1.0)
-
-        # Determine the actual task ID being used (agent sets this)
-        running_task_id = webui_manager.dr_agent.current_task_id
-        if not running_task_id:
-            # Agent might not have set it yet, try to get from result later? Risky.
-            # Or derive from resume_task_id if provided?
-            running_task_id = task_id_to_resume
-            if not running_task_id:
-                logger.warning("Could not determine running task ID immediately.")
-                # We can still monitor, but might miss initial plan if ID needed for path
+        # --- 6. Show Progress from the Agent's Event Stream ---
+        plan = None
+        streamed_report = ""
+        report_pending = False  # Report text received since the report was last shown
+        report_shown_at = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(anext(events))
+            flush_in = max(0.0, report_shown_at + REPORT_UPDATE_INTERVAL - loop.time()) if report_pending else None
+            if agent_task.done():
+                # The run already published its events, unless it failed before starting the graph
+                await asyncio.wait({next_event}, timeout=1.0 if flush_in is None else min(1.0, flush_in))
             else:
-                logger.info(f"Assuming task ID based on resume ID: {running_task_id}")
-        else:
-            logger.info(f"Agent started with Task ID: {running_task_id}")
+                await asyncio.wait({next_event, agent_task}, timeout=flush_in, return_when=asyncio.FIRST_COMPLETED)
+            if not next_event.done():
+                if report_pending:
+                    report_pending, report_shown_at = False, loop.time()
+                    yield {markdown_display_comp: gr.update(value=streamed_report)}
+                    continue
+                if agent_task.done():
+                    break
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                break
+            next_event = None
 
-        webui_manager.dr_task_id = running_task_id  # Store for stop handler
-
-        # --- 6. Monitor Progress via research_plan.md ---
-        if running_task_id:
-            task_specific_dir = os.path.join(base_save_dir, str(running_task_id))
-            plan_file_path = os.path.join(task_specific_dir, "research_plan.md")
-            report_file_path = os.path.join(task_specific_dir, "report.md")
-            logger.info(f"Monitoring plan file: {plan_file_path}")
-        else:
-            logger.warning("Cannot monitor plan file: Task ID unknown.")
-            plan_file_path = None
-        last_plan_content = None
-        while not agent_task.done():
             update_dict = {}
-            update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
-            agent_stopped = getattr(webui_manager.dr_agent, 'stopped', False)
-            if agent_stopped:
-                logger.info("Stop signal detected from agent state.")
-                break  # Exit monitoring loop
-
-            # Check and update research plan display
-            if plan_file_path:
-                try:
-                    current_mtime = os.path.getmtime(plan_file_path) if os.path.exists(plan_file_path) else 0
-                    if current_mtime > last_plan_mtime:
-                        logger.info(f"Detected change in {plan_file_path}")
-                        plan_content = _read_file_safe(plan_file_path)
-                        if last_plan_content is None or (
-                                plan_content is not None and plan_content != last_plan_content):
-                            update_dict[markdown_display_comp] = gr.update(value=plan_content)
-                            last_plan_content = plan_content
-                            last_plan_mtime = current_mtime
-                        elif plan_content is None:
-                            # File might have been deleted or became unreadable
-                            last_plan_mtime = 0  # Reset to force re-read attempt later
-                except Exception as e:
-                    logger.warning(f"Error checking/reading plan file {plan_file_path}: {e}")
-                    # Avoid continuous logging for the same error
-                    await asyncio.sleep(2.0)
-
-            # Yield updates if any
+            if event["type"] == "run_started":
+                running_task_id = event["task_id"]
+                webui_manager.dr_task_id = running_task_id  # Store for stop handler
+                report_file_path = os.path.join(base_save_dir, str(running_task_id), "report.md")
+                logger.info(f"Agent started with Task ID: {running_task_id}")
+                update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
+            elif event["type"] == "plan_created":
+                plan = event["plan"]
+                update_dict[markdown_display_comp] = gr.update(value=format_plan_markdown(plan))
+            elif event["type"] == "task_finished" and plan:
+                plan[event["category_index"]]["tasks"][event["task_index"]]["status"] = event["status"]
+                update_dict[markdown_display_comp] = gr.update(value=format_plan_markdown(plan))
+            elif event["type"] == "report_chunk":
+                # The report replaces the plan once synthesis starts, shown at most every REPORT_UPDATE_INTERVAL
+                streamed_report += event["text"]
+                report_pending = True
+                if loop.time() - report_shown_at >= REPORT_UPDATE_INTERVAL:
+                    report_pending, report_shown_at = False, loop.time()
+                    update_dict[markdown_display_comp] = gr.update(value=streamed_report)
+
             if update_dict:
                 yield update_dict
-
-            await asyncio.sleep(1.0)  # Check file changes every second
+        if report_pending:
+            yield {markdown_display_comp: gr.update(value=streamed_report)}
 
         # --- 7. Task Finalization ---
         logger.info("Agent task processing finished. Awaiting final result...")
@@ -274,6 +270,10 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
 
     finally:
         # --- 8. Final UI Reset ---
+        if next_event and not next_event.done():
+            next_event.cancel()
+        elif events is not None:
+            await events.aclose()
         webui_manager.dr_current_task = None  # Clear task reference
         webui_manager.dr_task_id = None  # Clear running task ID
 
@@ -0,0 +1,277 @@
+"""
+Offline benchmark of the deep-research graph.
+
+Runs DeepResearchAgent end to end against a deterministic fake chat model and a fake
+`parallel_browser_search` backend with configurable latency, so no LLM, browser or network
+is needed. For each plan size it reports wall time, the part of it that is graph and
+persistence overhead, time spent writing the plan and research log, message history growth,
+peak Python memory and the size of the task directory's research log and checkpoint file.
+
+    python tests/benchmark_deep_research.py --plan-sizes 4 16 64 --browser-latency 0.05 --concurrency 1 4
+    python tests/benchmark_deep_research.py --plan-sizes 16 32 64 --checkpointing  # Adds checkpoint_mb
+    python tests/benchmark_deep_research.py --json bench.json
+    python tests/benchmark_deep_research.py --baseline bench.json  # Prints changes against an earlier run
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+sys.path.append(".")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.agent.deep_research import deep_research_agent
+from src.agent.deep_research.deep_research_agent import CHECKPOINT_FILENAME, DeepResearchAgent
+from src.agent.deep_research.research_log import RESEARCH_LOG_FILENAME
+
+# Module functions that write the task directory, timed separately as persistence cost
+PERSISTENCE_FUNCTIONS = ("_save_plan_to_md", "_save_report_to_md", "append_research_events",
+                         "compact_research_log")
+
+
+class BenchmarkChatModel(BaseChatModel):
+    """
+    Deterministic chat model for the research graph. Plans `categories` x `tasks_per_category`
+    tasks, answers every research task with one `parallel_browser_search` call and writes a
+    fixed report. Records the size of every prompt it receives.
+    """
+
+    categories: int = 4
+    tasks_per_category: int = 4
+    queries_per_task: int = 2
+    latency: float = 0.0
+    prompt_sizes: List[Dict[str, int]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "deep-research-benchmark"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        system = str(messages[0].content)
+        if "planning assistant" in system:
+            content = json.dumps([
+                {"category_name": f"Category {c}",
+                 "tasks": [f"Research aspect {t} of category {c}" for t in range(self.tasks_per_category)]}
+                for c in range(self.categories)
+            ])
+            return AIMessage(content=content)
+        if "professional researcher" in system:
+            return AIMessage(content="# Benchmark Report\n\nAll tasks were researched.")
+        if "condensing raw findings" in system:
+            return AIMessage(content="Condensed notes.")
+        self.prompt_sizes.append({
+            "messages": len(messages),
+            "tokens": count_tokens_approximately(messages),
+        })
+        task = str(messages[-1].content).split("Specific Task: ")[1].split("\n")[0]
+        queries = [f"{task} query {q}" for q in range(self.queries_per_task)]
+        return AIMessage(content="", tool_calls=[
+            {"name": "parallel_browser_search", "args": {"queries": queries},
+             "id": f"call_{len(self.prompt_sizes)}"}
+        ])
+
+    def _with_usage(self, messages: List[BaseMessage], response: AIMessage) -> ChatResult:
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([response])
+        response.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                   "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._with_usage(messages, self._respond(messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._with_usage(messages, self._respond(messages))
+
+
+def fake_browser_search(latency: float, result_chars: int = 800):
+    """Replacement for `run_single_browser_task` that sleeps `latency` seconds per query."""
+
+    async def run_single_browser_task(query, task_id, llm, browser_config, stop_event, use_vision=False,
+                                      browser_pool=None):
+        await asyncio.sleep(latency)
+        result = (f"Findings for {query}. " * (result_chars // (len(query) + 15) + 1))[:result_chars]
+        return {"query": query, "result": result, "status": "completed"}
+
+    return run_single_browser_task
+
+
+@contextmanager
+def patched_module(browser_latency: float, timings: Dict[str, Dict[str, float]]):
+    """Swaps in the fake browser search and times the persistence functions of the agent module."""
+    originals = {"run_single_browser_task": deep_research_agent.run_single_browser_task}
+    deep_research_agent.run_single_browser_task = fake_browser_search(browser_latency)
+
+    def timed(name, func):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry = timings.setdefault(name, {"calls": 0, "total_s": 0.0})
+                entry["calls"] += 1
+                entry["total_s"] += time.perf_counter() - started
+
+        return wrapper
+
+    for name in PERSISTENCE_FUNCTIONS:
+        originals[name] = getattr(deep_research_agent, name)
+        setattr(deep_research_agent, name, timed(name, originals[name]))
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(deep_research_agent, name, func)
+
+
+def _file_size(task_dir: str, filename: str) -> int:
+    """Bytes of a file in the task directory, including its SQLite journal files."""
+    return sum(os.path.getsize(os.path.join(task_dir, name)) for name in os.listdir(task_dir)
+               if name.startswith(filename))
+
+
+def run_scenario(plan_size: int, concurrency: int, browser_latency: float, llm_latency: float,
+                 queries_per_task: int, checkpointing: bool) -> Dict[str, Any]:
+    """Runs one research task with a plan of about `plan_size` tasks and returns its measurements."""
+    categories = max(1, round(math.sqrt(plan_size)))
+    tasks_per_category = max(1, math.ceil(plan_size / categories))
+    llm = BenchmarkChatModel(categories=categories, tasks_per_category=tasks_per_category,
+                             queries_per_task=queries_per_task, latency=llm_latency, prompt_sizes=[])
+    tasks = categories * tasks_per_category
+    persistence: Dict[str, Dict[str, float]] = {}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, patched_module(browser_latency, persistence):
+        os.chdir(work_dir)
+        try:
+            agent = DeepResearchAgent(
+                llm=llm, browser_config={}, use_browser_pool=False, use_static_fetch=False,
+                enable_checkpointing=checkpointing, plan_cache_threshold=None, search_cache_ttl_seconds=0,
+            )
+            tracemalloc.start()
+            started = time.perf_counter()
+            result = asyncio.run(agent.run(
+                "benchmark topic", save_dir=os.path.abspath("./tmp/deep_research"),
+                max_concurrent_tasks=concurrency, max_parallel_browsers=concurrency * queries_per_task,
+            ))
+            wall_s = time.perf_counter() - started
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            task_dir = os.path.join("./tmp/deep_research", result["task_id"])
+            log_bytes = _file_size(task_dir, RESEARCH_LOG_FILENAME)
+            checkpoint_bytes = _file_size(task_dir, CHECKPOINT_FILENAME)
+        finally:
+            os.chdir(cwd)
+
+    if result["status"] != "completed":
+        raise RuntimeError(f"Benchmark run ended with status {result['status']}: {result['message']}")
+
+    # Lower bound of the run with infinitely fast graph code: the plan call, then one LLM
+    # round plus one browser round per batch of concurrent tasks, then the report.
+    ideal_s = llm_latency * 2 + math.ceil(tasks / concurrency) * (llm_latency + browser_latency)
+    persistence_s = sum(entry["total_s"] for entry in persistence.values())
+    return {
+        "plan_size": tasks,
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 4),
+        "ideal_s": round(ideal_s, 4),
+        "overhead_s": round(wall_s - ideal_s, 4),
+        "overhead_per_task_ms": round((wall_s - ideal_s) / tasks * 1000, 3),
+        "persistence_s": round(persistence_s, 4),
+        "persistence": {name: {"calls": entry["calls"], "total_s": round(entry["total_s"], 4)}
+                        for name, entry in persistence.items()},
+        "max_prompt_messages": max(size["messages"] for size in llm.prompt_sizes),
+        "max_prompt_tokens": max(size["tokens"] for size in llm.prompt_sizes),
+        "peak_memory_mb": round(peak_bytes / 2 ** 20, 2),
+        "log_mb": round(log_bytes / 2 ** 20, 3),
+        "checkpoint_mb": round(checkpoint_bytes / 2 ** 20, 3),
+        "nodes": {name: node["total_s"] for name, node in result["metrics"]["nodes"].items()},
+    }
+
+
+def run_benchmark(plan_sizes: List[int], concurrency: List[int], browser_latency: float = 0.0,
+                  llm_latency: float = 0.0, queries_per_task: int = 2, repeat: int = 1,
+                  checkpointing: bool = False) -> List[Dict[str, Any]]:
+    """Runs every plan size and concurrency combination, keeping the fastest of `repeat` runs."""
+    results = []
+    for plan_size in plan_sizes:
+        for tasks_at_once in concurrency:
+            runs = [
+                run_scenario(plan_size, tasks_at_once, browser_latency, llm_latency, queries_per_task, checkpointing)
+                for _ in range(max(1, repeat))
+            ]
+            results.append(min(runs, key=lambda run: run["wall_s"]))
+    return results
+
+
+COLUMNS = ("plan_size", "concurrency", "wall_s", "overhead_s", "overhead_per_task_ms", "persistence_s",
+           "max_prompt_messages", "max_prompt_tokens", "peak_memory_mb", "log_mb", "checkpoint_mb")
+
+
+def format_table(results: List[Dict[str, Any]], baseline: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Formats the results as a table, with the relative change to a matching baseline row in parentheses."""
+    previous = {(row["plan_size"], row["concurrency"]): row for row in baseline or []}
+    rows = [list(COLUMNS)]
+    for result in results:
+        before = previous.get((result["plan_size"], result["concurrency"]))
+        row = []
+        for column in COLUMNS:
+            cell = str(result[column])
+            if before and column not in ("plan_size", "concurrency") and before.get(column):
+                cell += f" ({(result[column] - before[column]) / before[column]:+.0%})"
+            row.append(cell)
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the deep-research graph.")
+    parser.add_argument("--plan-sizes", type=int, nargs="+", default=[4, 16, 64],
+                        help="Approximate number of plan tasks per run.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4],
+                        help="max_concurrent_tasks values to run each plan size with.")
+    parser.add_argument("--browser-latency", type=float, default=0.0, help="Seconds per fake browser search.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake LLM call.")
+    parser.add_argument("--queries-per-task", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario, the fastest one is reported.")
+    parser.add_argument("--checkpointing", action="store_true", help="Run with the SQLite checkpointer.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against.")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = run_benchmark(
+        args.plan_sizes, args.concurrency, browser_latency=args.browser_latency, llm_latency=args.llm_latency,
+        queries_per_task=args.queries_per_task, repeat=args.repeat, checkpointing=args.checkpointing,
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print(format_table(results, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1167 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Any
+
+import pytest
+
+sys.path.append(".")
+
+from browser_use.browser.context import BrowserContextConfig
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+from src.agent.deep_research import deep_research_agent
+from src.agent.deep_research.deep_research_agent import DeepResearchAgent, create_browser_search_tool
+from src.agent.deep_research import finding_dedup
+from src.agent.deep_research.finding_dedup import dedup_findings
+from src.agent.deep_research.job_manager import ResearchJobManager
+from src.agent.deep_research.message_compaction import compact_messages
+from src.agent.deep_research.plan_cache import PlanCache
+from src.agent.deep_research.research_log import (
+    RESEARCH_LOG_FILENAME,
+    compact_research_log,
+    replay_research_log,
+)
+from src.agent.deep_research.run_metrics import METRICS_FILENAME, RunMetrics
+from src.agent.deep_research.search_cache import SearchResultCache, normalize_query
+from src.agent.deep_research.static_fetch import StaticFetcher
+from src.agent.deep_research.synthesis import MAP_CACHE_FILENAME, map_category_summaries
+from src.browser.browser_pool import BrowserPool
+
+
+class FakePlaywrightBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+
+class FakeContext:
+    def __init__(self, config=None):
+        self.config = config
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    launched = 0
+
+    def __init__(self):
+        self.playwright_browser = None
+        self.closed = False
+
+    async def get_playwright_browser(self):
+        FakeBrowser.launched += 1
+        self.playwright_browser = FakePlaywrightBrowser()
+        return self.playwright_browser
+
+    async def new_context(self, config=None):
+        return FakeContext(config)
+
+    async def close(self):
+        self.closed = True
+        self.playwright_browser = None
+
+
+def test_browser_pool_reuses_and_recycles():
+    async def scenario():
+        FakeBrowser.launched = 0
+        pool = BrowserPool(browser_factory=FakeBrowser, max_size=1, max_uses=2)
+        await pool.start()
+        assert FakeBrowser.launched == 1
+
+        async with pool.acquire() as (browser_1, context_1):
+            pass
+        async with pool.acquire() as (browser_2, context_2):
+            pass
+        assert browser_1 is browser_2
+        assert context_1 is not context_2 and context_1.closed and context_2.closed
+        # Second checkout reached max_uses, so the browser is recycled
+        assert browser_1.closed
+
+        async with pool.acquire() as (browser_3, _):
+            browser_3.playwright_browser.connected = False
+        async with pool.acquire() as (browser_4, _):
+            pass
+        assert browser_3 is not browser_1 and browser_4 is not browser_3
+        assert FakeBrowser.launched == 3
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_browser_pool_bounds_concurrency():
+    async def scenario():
+        pool = BrowserPool(browser_factory=FakeBrowser, max_size=2)
+        active = 0
+        peak = 0
+
+        async def worker():
+            nonlocal active, peak
+            async with pool.acquire():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*[worker() for _ in range(6)])
+        await pool.close()
+        return peak
+
+    assert asyncio.run(scenario()) == 2
+
+
+class SlowBrowser(FakeBrowser):
+    launch_delay = 0.3
+    fail = False
+
+    async def get_playwright_browser(self):
+        await asyncio.sleep(self.launch_delay)
+        if self.fail:
+            raise RuntimeError("launch failed")
+        return await super().get_playwright_browser()
+
+
+def test_browser_pool_launches_outside_the_checkout_lock():
+    async def scenario():
+        pool = BrowserPool(browser_factory=SlowBrowser, max_size=2)
+        SlowBrowser.launch_delay = 0
+        async with pool.acquire() as (first, _):
+            SlowBrowser.launch_delay = 0.3
+            held = pool.acquire()
+            launching = asyncio.create_task(held.__aenter__())
+            await asyncio.sleep(0.05)
+        # The idle browser is checked out while the second one is still launching
+        started = asyncio.get_running_loop().time()
+        async with pool.acquire() as (reused, _):
+            waited = asyncio.get_running_loop().time() - started
+        second, _ = await launching
+        await held.__aexit__(None, None, None)
+
+        SlowBrowser.fail = True
+        pool = BrowserPool(browser_factory=SlowBrowser, max_size=1)
+        with pytest.raises(RuntimeError):
+            async with pool.acquire():
+                pass
+        SlowBrowser.fail = False
+        async with pool.acquire() as (recovered, _):
+            pass
+        return first, reused, second, waited, pool, recovered
+
+    first, reused, second, waited, pool, recovered = asyncio.run(scenario())
+
+    assert reused is first and second is not first and waited < 0.1
+    # The failed launch gave back its reservation
+    assert recovered.playwright_browser is not None and not pool._in_use
+
+
+def test_browser_pool_shares_browsers_between_isolated_contexts():
+    async def scenario():
+        FakeBrowser.launched = 0
+        pool = BrowserPool(browser_factory=FakeBrowser, max_size=2, contexts_per_browser=3,
+                           context_config=BrowserContextConfig(save_downloads_path="./tmp/downloads"))
+        checkouts = []
+        active = 0
+        peak = 0
+
+        async def worker():
+            nonlocal active, peak
+            async with pool.acquire() as (browser, context):
+                checkouts.append((browser, context))
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*[worker() for _ in range(12)])
+        await pool.close()
+        return checkouts, peak
+
+    checkouts, peak = asyncio.run(scenario())
+
+    assert peak == 6 and FakeBrowser.launched == 2
+    assert len({id(browser) for browser, _ in checkouts}) == 2
+    contexts = [context for _, context in checkouts]
+    assert all(context.closed for context in contexts)
+    assert len({context.config.save_downloads_path for context in contexts}) == 12
+
+
+def test_browser_search_runs_every_query_with_bounded_concurrency(monkeypatch):
+    delays = {"slow": 0.05, "medium": 0.02, "fast": 0.0, "extra": 0.01}
+    active = 0
+    peak = 0
+
+    async def fake_browser_task(query, task_id, llm, browser_config, stop_event, use_vision=False,
+                                browser_pool=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(delays[query])
+        active -= 1
+        return {"query": query, "result": f"found {query}", "status": "completed"}
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", fake_browser_task)
+    finished = []
+    results = asyncio.run(deep_research_agent._run_browser_search_tool(
+        ["slow", "medium", "fast", "extra", "fast"],
+        task_id="t1",
+        llm=None,
+        browser_config={},
+        stop_event=threading.Event(),
+        max_parallel_browsers=2,
+        on_result=lambda res: finished.append(res["query"]),
+    ))
+
+    assert [r["query"] for r in results] == ["slow", "medium", "fast", "extra"]
+    assert finished[0] != "slow" and sorted(finished) == sorted(delays)
+    assert peak == 2
+
+
+class FakeResearchLLM:
+    """Plans two categories and answers every task with one browser search for the task text."""
+
+    def __init__(self, plan=None, delay=0.0):
+        self.plan = plan or [
+            {"category_name": "Basics", "tasks": ["task a", "task b"]},
+            {"category_name": "Details", "tasks": ["task c"]},
+        ]
+        self.delay = delay
+        self.prompts = []
+        self.map_calls = 0
+        self.reduce_inputs = []
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        system = messages[0].content
+        if "planning assistant" in system:
+            return AIMessage(content=json.dumps(self.plan))
+        if "professional researcher" in system:
+            self.reduce_inputs.append(messages[-1].content)
+            return AIMessage(content="# Report\n\nStreamed in chunks.")
+        if "condensing raw findings" in system:
+            self.map_calls += 1
+            category = messages[-1].content.split("Research Category: ")[1].split("\n")[0]
+            return AIMessage(content=f"notes on {category} {{with braces}}")
+        self.prompts.append(len(messages))
+        task = messages[-1].content.split("Specific Task: ")[1].split("\n")[0]
+        return AIMessage(content="", tool_calls=[
+            {"name": "parallel_browser_search", "args": {"queries": [task]}, "id": f"call_{task}"}
+        ])
+
+    async def astream(self, messages, *args, **kwargs):
+        response = await self.ainvoke(messages, *args, **kwargs)
+        for word in response.content.split(" "):
+            await asyncio.sleep(self.delay)
+            yield AIMessageChunk(content=word + " ")
+
+
+def _fake_browser_task(delays=None):
+    async def fake_browser_task(query, task_id, llm, browser_config, stop_event, use_vision=False,
+                                browser_pool=None):
+        await asyncio.sleep((delays or {}).get(query, 0))
+        return {"query": query, "result": f"found {query}", "status": "completed"}
+
+    return fake_browser_task
+
+
+def _offline_agent(llm, **kwargs):
+    return DeepResearchAgent(llm=llm, browser_config={}, use_browser_pool=False, use_static_fetch=False, **kwargs)
+
+
+def _run_agent(tmp_path, monkeypatch, llm, agent_kwargs=None, **run_kwargs):
+    monkeypatch.chdir(tmp_path)
+    agent = _offline_agent(llm, **(agent_kwargs or {}))
+    return asyncio.run(agent.run("topic", **run_kwargs))
+
+
+@pytest.mark.parametrize("max_concurrent_tasks", [1, 3])
+def test_concurrent_tasks_merge_in_plan_order(tmp_path, monkeypatch, max_concurrent_tasks):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task",
+                        _fake_browser_task({"task a": 0.05, "task b": 0.0, "task c": 0.02}))
+    result = _run_agent(tmp_path, monkeypatch, FakeResearchLLM(), max_parallel_browsers=3,
+                        max_concurrent_tasks=max_concurrent_tasks)
+
+    assert result["status"] == "completed"
+    state = result["final_state"]
+    assert [r["query"] for r in state["search_results"]] == ["task a", "task b", "task c"]
+    assert all(t["status"] == "completed" for c in state["research_plan"] for t in c["tasks"])
+    humans = [m.content for m in state["messages"] if isinstance(m, HumanMessage)]
+    assert ["task a" in humans[0], "task b" in humans[1], "task c" in humans[2]] == [True, True, True]
+
+
+def _research_round(i):
+    return [
+        HumanMessage(content=f"Current Research Category: C\nSpecific Task: task {i}\n\nPlease search."),
+        AIMessage(content="", tool_calls=[
+            {"name": "parallel_browser_search", "args": {"queries": [f"query {i}"]}, "id": f"call_{i}"}
+        ]),
+        ToolMessage(content=json.dumps([{"query": f"query {i}", "result": "x" * 2000, "status": "completed"}]),
+                    tool_call_id=f"call_{i}"),
+    ]
+
+
+def test_compact_messages_stubs_payloads_and_summarizes_old_rounds():
+    history = [SystemMessage(content="system")] + [m for i in range(10) for m in _research_round(i)]
+
+    stubbed = compact_messages(history, max_tokens=None)
+    assert len(stubbed) == len(history)
+    assert "x" * 100 not in stubbed[3].content and "'query 0': completed" in stubbed[3].content
+
+    compacted = compact_messages(history, max_tokens=300)
+    assert count_tokens_approximately(compacted) <= 300
+    assert compacted[0].content == "system"
+    assert "Specific Task: task 9" in compacted[-3].content  # Latest round is kept verbatim
+    assert "- Task: task 0 | Actions: parallel_browser_search(query 0)" in compacted[1].content
+
+    # Compacting again keeps the existing summary instead of nesting it
+    again = compact_messages(compacted + _research_round(10), max_tokens=300)
+    assert sum(1 for m in again if "Summary of earlier research rounds" in str(m.content)) == 1
+
+
+def test_map_reduce_synthesis_summarizes_per_category(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    llm = FakeResearchLLM()
+    monkeypatch.chdir(tmp_path)
+    agent = _offline_agent(llm, synthesis_mode="map_reduce")
+    result = asyncio.run(agent.run("topic"))
+
+    assert result["status"] == "completed"
+    assert llm.map_calls == 2
+    assert "## Category Summary: Basics\nnotes on Basics {with braces}" in llm.reduce_inputs[0]
+    assert "found task a" not in llm.reduce_inputs[0]
+
+
+def test_map_step_reuses_cached_summaries(tmp_path):
+    llm = FakeResearchLLM()
+    plan = [{"category_name": "Basics", "tasks": []}]
+    results = [{"query": f"q{i}", "result": "r" * 400, "status": "completed", "category": "Basics"}
+               for i in range(4)]
+
+    first = asyncio.run(map_category_summaries(llm, "topic", results, plan, str(tmp_path), chunk_tokens=150))
+    assert llm.map_calls == 4 and (tmp_path / MAP_CACHE_FILENAME).exists()
+    second = asyncio.run(map_category_summaries(llm, "topic", results, plan, str(tmp_path), chunk_tokens=150))
+    assert llm.map_calls == 4 and first == second
+
+
+def test_research_log_replays_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    result = _run_agent(tmp_path, monkeypatch, FakeResearchLLM(), task_id="job")
+    output_dir = tmp_path / "tmp" / "deep_research" / "job"
+
+    replayed = replay_research_log(str(output_dir))
+    assert replayed["research_plan"] == result["final_state"]["research_plan"]
+    assert [r["query"] for r in replayed["search_results"]] == ["task a", "task b", "task c"]
+    assert len((output_dir / RESEARCH_LOG_FILENAME).read_text().splitlines()) == 4  # Compacted at the end
+
+    # Pretend the run crashed after the first task, with a half written last line
+    plan = replayed["research_plan"]
+    for category in plan:
+        for task in category["tasks"]:
+            task["status"] = "pending"
+    lines = [json.dumps({"type": "plan", "plan": plan}),
+             json.dumps({"type": "task_status", "category_index": 0, "task_index": 0, "status": "completed"}),
+             json.dumps({"type": "result", "result": replayed["search_results"][0]}),
+             '{"type": "task_sta']
+    (output_dir / RESEARCH_LOG_FILENAME).write_text("\n".join(lines))
+
+    llm = FakeResearchLLM()
+    resumed = _run_agent(tmp_path, monkeypatch, llm, task_id="job")
+    assert resumed["status"] == "completed"
+    assert len(llm.prompts) == 2  # Only task b and task c ran again
+    assert [r["query"] for r in resumed["final_state"]["search_results"]] == ["task a", "task b", "task c"]
+    compact_research_log(str(output_dir))
+    assert replay_research_log(str(output_dir))["search_results"] == resumed["final_state"]["search_results"]
+
+
+class CrashingResearchLLM(FakeResearchLLM):
+    """Aborts the run, like a killed process, when it reaches the given task."""
+
+    def __init__(self, crash_on):
+        super().__init__()
+        self.crash_on = crash_on
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        if f"Specific Task: {self.crash_on}" in str(messages[-1].content):
+            raise asyncio.CancelledError()
+        return await super().ainvoke(messages, *args, **kwargs)
+
+
+def test_checkpoint_resumes_interrupted_run_with_messages(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    checkpointing = {"enable_checkpointing": True}
+    crashed = _run_agent(tmp_path, monkeypatch, CrashingResearchLLM("task b"), checkpointing, task_id="job")
+    assert crashed["status"] == "cancelled"
+
+    llm = FakeResearchLLM()
+    resumed = _run_agent(tmp_path, monkeypatch, llm, checkpointing, task_id="job")
+    assert resumed["status"] == "completed"
+    # No replanning, task a is not repeated and its round is still in the history
+    assert len(llm.prompts) == 2 and llm.prompts[0] > 2
+    assert [r["query"] for r in resumed["final_state"]["search_results"]] == ["task a", "task b", "task c"]
+
+
+def test_run_closes_started_browsers_when_setup_fails(tmp_path, monkeypatch):
+    pools = []
+
+    def fake_pool(browser_config, **kwargs):
+        pools.append(BrowserPool(browser_factory=FakeBrowser, max_size=2))
+        return pools[-1]
+
+    async def failing_setup(*args, **kwargs):
+        raise RuntimeError("MCP server did not start")
+
+    monkeypatch.setattr(deep_research_agent, "create_browser_pool", fake_pool)
+    monkeypatch.chdir(tmp_path)
+    agent = DeepResearchAgent(llm=FakeResearchLLM(), browser_config={}, use_static_fetch=False)
+    monkeypatch.setattr(agent, "_setup_tools", failing_setup)
+    result = asyncio.run(agent.run("topic", task_id="job", max_parallel_browsers=2))
+
+    assert result["status"] == "error" and "MCP server did not start" in result["message"]
+    assert pools[0]._closed and pools[0]._idle.empty()
+    assert agent.browser_pool is None and agent.search_cache is None
+    assert not deep_research_agent._AGENT_STOP_FLAGS
+
+
+def test_checkpoint_resume_applies_settings_of_the_new_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    crashed = _run_agent(tmp_path, monkeypatch, CrashingResearchLLM("task b"), {"enable_checkpointing": True},
+                         task_id="job")
+    assert crashed["status"] == "cancelled"
+
+    agent = _offline_agent(FakeResearchLLM(), dedup_threshold=None, enable_checkpointing=True)
+    resumed = asyncio.run(agent.run("new topic", task_id="job", max_concurrent_tasks=2))
+
+    final_state = resumed["final_state"]
+    assert resumed["status"] == "completed"
+    assert (final_state["topic"], final_state["max_concurrent_tasks"]) == ("new topic", 2)
+    assert final_state["dedup_threshold"] is None
+    # Tasks b and c run together in one step
+    assert resumed["metrics"]["nodes"]["execute_research"]["count"] == 1
+
+
+def test_search_cache_normalizes_expires_and_evicts(tmp_path, monkeypatch):
+    assert normalize_query("  What is  C++?! ") == normalize_query("what is c++") == "what is c++"
+    cache = SearchResultCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60, max_entries=2)
+    clock = [1000.0]
+    monkeypatch.setattr("src.agent.deep_research.search_cache.time.time", lambda: clock[0])
+
+    cache.put("Query One", {"result": "one"})
+    clock[0] += 1
+    cache.put("query two", {"result": "two"})
+    clock[0] += 1
+    assert cache.get("query one?")["result"] == "one"  # Refreshes query one
+    clock[0] += 1
+    cache.put("query three", {"result": "three"})  # Evicts query two, the least recently used
+    assert cache.get("query two") is None
+    clock[0] += 120
+    assert cache.get("query three") is None  # Expired
+
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["expired"], metrics["evictions"]) == (1, 2, 1, 1)
+    assert metrics["hit_rate"] == pytest.approx(1 / 3)
+    cache.close()
+
+
+def test_search_cache_skips_browser_for_repeated_queries(tmp_path, monkeypatch):
+    browser_queries = []
+    fake_browser_task = _fake_browser_task()
+
+    async def counting_browser_task(query, *args, **kwargs):
+        browser_queries.append(query)
+        return await fake_browser_task(query, *args, **kwargs)
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", counting_browser_task)
+    first = _run_agent(tmp_path, monkeypatch, FakeResearchLLM(), task_id="first")
+    second = _run_agent(tmp_path, monkeypatch, FakeResearchLLM(), task_id="second")
+
+    assert browser_queries == ["task a", "task b", "task c"]
+    assert first["search_cache"]["writes"] == 3
+    assert second["search_cache"]["hits"] == 3
+    results = second["final_state"]["search_results"]
+    assert [r["result"] for r in results] == ["found task a", "found task b", "found task c"]
+    assert all(r["cached"] for r in results)
+
+
+class MultiToolLLM:
+    def __init__(self, tool_calls):
+        self.tool_calls = tool_calls
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return AIMessage(content="", tool_calls=self.tool_calls)
+
+
+def _sleeping_tool(name, delay, active):
+    async def run(value: str) -> str:
+        active[name] = active.get(name, 0) + 1
+        active[f"{name}_peak"] = max(active.get(f"{name}_peak", 0), active[name])
+        await asyncio.sleep(delay)
+        active[name] -= 1
+        return f"{name}:{value}"
+
+    return StructuredTool.from_function(coroutine=run, name=name, description=name)
+
+
+def _research_state():
+    return {
+        "task_id": "tools",
+        "messages": [],
+        "research_plan": [{"category_name": "Basics", "tasks": [
+            {"task_description": "task a", "status": "pending", "queries": None, "result_summary": None}]}],
+    }
+
+
+def test_tool_calls_of_one_turn_run_concurrently_in_stable_order():
+    active = {}
+    tools = [_sleeping_tool("slow", 0.2, active), _sleeping_tool("fast", 0.05, active)]
+    tool_calls = [{"name": name, "args": {"value": str(i)}, "id": f"call_{i}"}
+                  for i, name in enumerate(["slow", "fast", "fast", "missing"])]
+    runtime = {
+        "llm": MultiToolLLM(tool_calls),
+        "tools": tools,
+        "tool_semaphores": {"slow": asyncio.Semaphore(2), "fast": asyncio.Semaphore(1)},
+    }
+    state = _research_state()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        outcome = await deep_research_agent._execute_research_task(state, runtime, 0, 0)
+        return outcome, loop.time() - started
+
+    outcome, elapsed = asyncio.run(scenario())
+
+    assert elapsed < 0.28  # Bounded by the slowest tool, not the 0.3s sum
+    assert active["fast_peak"] == 1
+    tool_messages = [m for m in outcome["messages"] if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == ["call_0", "call_1", "call_2", "call_3"]
+    assert [r["output"] for r in outcome["search_results"]] == ["slow:0", "fast:1", "fast:2"]
+    assert "not found" in tool_messages[-1].content
+    assert state["research_plan"][0]["tasks"][0]["status"] == "failed"
+
+
+def test_tool_calls_are_skipped_once_stop_is_requested():
+    active = {}
+    tool_calls = [{"name": "fast", "args": {"value": "x"}, "id": "call_0"}]
+    runtime = {"llm": MultiToolLLM(tool_calls), "tools": [_sleeping_tool("fast", 0, active)]}
+    state = _research_state()
+    deep_research_agent._AGENT_STOP_FLAGS["tools"] = threading.Event()
+    deep_research_agent._AGENT_STOP_FLAGS["tools"].set()
+    try:
+        outcome = asyncio.run(deep_research_agent._execute_research_task(state, runtime, 0, 0))
+    finally:
+        del deep_research_agent._AGENT_STOP_FLAGS["tools"]
+
+    assert outcome["stop_requested"] and "fast" not in active
+    assert state["research_plan"][0]["tasks"][0]["status"] == "pending"
+
+
+class StuckBrowser:
+    """A browser whose session ignores the stop signal and whose close hangs until it is killed."""
+
+    def __init__(self):
+        self.killed = asyncio.Event()
+
+    def kill(self):
+        self.killed.set()
+
+
+def test_stop_cancels_in_flight_work_and_kills_stuck_browsers(tmp_path, monkeypatch):
+    browser = StuckBrowser()
+    session_started = asyncio.Event()
+
+    async def stuck_browser_task(query, task_id, llm, browser_config, stop_event, use_vision=False,
+                                 browser_pool=None):
+        deep_research_agent._OPEN_BROWSERS.setdefault(task_id, set()).add(browser)
+        session_started.set()
+        try:
+            await asyncio.sleep(30)
+        finally:
+            await browser.killed.wait()
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", stuck_browser_task)
+    monkeypatch.chdir(tmp_path)
+    agent = _offline_agent(FakeResearchLLM(), stop_grace_seconds=0.05, shutdown_timeout=0.1)
+
+    async def scenario():
+        run = asyncio.create_task(agent.run("topic", task_id="job"))
+        await asyncio.wait_for(session_started.wait(), 5)
+        started = time.perf_counter()
+        await agent.stop()
+        stopped_after = time.perf_counter() - started
+        return await asyncio.wait_for(run, 5), stopped_after
+
+    result, stopped_after = asyncio.run(scenario())
+
+    assert stopped_after < 1.0 and browser.killed.is_set()
+    assert result["status"] == "stopped"
+    assert not deep_research_agent._BROWSER_SESSION_TASKS and not deep_research_agent._OPEN_BROWSERS
+
+class SleepingAgent:
+    """Stands in for DeepResearchAgent and records when jobs start."""
+
+    def __init__(self, started, running):
+        self.started = started
+        self.running = running
+        self.stop_event = asyncio.Event()
+
+    async def run(self, topic, task_id=None, **kwargs):
+        self.started.append(topic)
+        self.running.append(topic)
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), 0.05)
+            status = "stopped"
+        except asyncio.TimeoutError:
+            status = "completed"
+        self.running.remove(topic)
+        return {"status": status, "task_id": task_id, "browsers": kwargs["max_parallel_browsers"]}
+
+    async def stop(self):
+        self.stop_event.set()
+
+
+def test_job_manager_admits_round_robin_within_capacity():
+    started, running, peak = [], [], []
+
+    def factory():
+        peak.append(len(running) + 1)
+        return SleepingAgent(started, running)
+
+    async def scenario():
+        manager = ResearchJobManager(factory, max_concurrent_jobs=2, max_total_browsers=3)
+        jobs = [await manager.submit("a1", owner="alice", max_parallel_browsers=2),
+                await manager.submit("a2", owner="alice", max_parallel_browsers=2),
+                await manager.submit("a3", owner="alice"),
+                await manager.submit("b1", owner="bob")]
+        queued = await manager.submit("a4", owner="alice")
+        await manager.stop(queued.job_id)
+        with pytest.raises(ValueError):
+            await manager.submit("again", task_id=jobs[0].job_id)
+        results = [await manager.wait(job.job_id) for job in jobs]
+        return manager, jobs, queued, results
+
+    manager, jobs, queued, results = asyncio.run(scenario())
+
+    # a2 needs 2 browsers and waits for a1, bob's job is admitted before alice's third one
+    assert started == ["a1", "a2", "b1", "a3"]
+    assert max(peak) == 2
+    assert all(result["status"] == "completed" for result in results)
+    assert queued.status == "cancelled" and manager.get(queued.job_id).result is None
+    assert [r["task_id"] for r in results] == [job.job_id for job in jobs]
+
+
+def test_job_manager_runs_research_jobs_concurrently(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task({"task a": 0.05}))
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        manager = ResearchJobManager(
+            lambda: _offline_agent(FakeResearchLLM()),
+            max_concurrent_jobs=2,
+        )
+        jobs = [await manager.submit(topic) for topic in ("first topic", "second topic")]
+        assert all(job.status == "running" for job in jobs)
+        return [await manager.wait(job.job_id) for job in jobs]
+
+    results = asyncio.run(scenario())
+
+    assert [r["status"] for r in results] == ["completed", "completed"]
+    assert not deep_research_agent._AGENT_STOP_FLAGS
+    for result in results:
+        assert (tmp_path / "tmp" / "deep_research" / result["task_id"] / "report.md").exists()
+
+
+def test_job_manager_stops_jobs_before_they_start_and_admits_none_on_shutdown(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task({"task a": 0.2}))
+    monkeypatch.chdir(tmp_path)
+    llms = []
+
+    def factory():
+        llms.append(FakeResearchLLM())
+        return _offline_agent(llms[-1])
+
+    async def scenario():
+        manager = ResearchJobManager(factory, max_concurrent_jobs=1)
+        stopped = await manager.submit("stopped topic")
+        await manager.stop(stopped.job_id)  # Before the runner picked the agent up
+        stopped_result = await manager.wait(stopped.job_id)
+
+        running = await manager.submit("running topic")
+        queued = await manager.submit("queued topic")
+        await asyncio.sleep(0.1)
+        await manager.shutdown()
+        with pytest.raises(RuntimeError):
+            await manager.submit("late topic")
+        return stopped, stopped_result, running, queued
+
+    with caplog.at_level(logging.INFO):
+        stopped, stopped_result, running, queued = asyncio.run(scenario())
+
+    assert stopped.status == "stopped" and stopped_result["status"] == "stopped"
+    assert not (tmp_path / "tmp" / "deep_research" / stopped.job_id).exists()  # The agent never ran
+    assert running.status == "stopped"
+    assert queued.status == "cancelled" and queued.agent is None and len(llms) == 2
+    # New jobs start fresh instead of looking for state to resume
+    assert "resume" not in caplog.text.lower()
+
+
+@pytest.mark.parametrize("use_faiss", [True, False])
+def test_dedup_merges_near_duplicates_and_keeps_provenance(monkeypatch, use_faiss):
+    if not use_faiss:
+        monkeypatch.setattr(finding_dedup, "faiss", None)
+    overlap = ("The Eiffel Tower is 330 metres tall and was completed in 1889 for the World's Fair. "
+               "It was designed by the engineering company of Gustave Eiffel and is made of wrought iron.")
+    search_results = [
+        {"query": "eiffel tower height", "result": overlap, "status": "completed", "category": "Basics"},
+        {"query": "eiffel tower failed", "status": "failed", "error": "timeout"},
+        {"query": "when was the eiffel tower built", "status": "completed", "category": "Details",
+         "result": overlap + " About seven million people visit it every year."},
+        {"query": "python asyncio", "result": "asyncio is a library to write concurrent code.",
+         "status": "completed"},
+    ]
+
+    deduped = asyncio.run(dedup_findings(search_results, threshold=0.85))
+
+    assert [entry["query"] for entry in deduped] == ["eiffel tower height", "eiffel tower failed", "python asyncio"]
+    assert deduped[0]["result"].endswith("About seven million people visit it every year.")
+    assert deduped[0]["result"].count("330 metres") == 1
+    assert deduped[0]["merged_from"] == [{"query": "when was the eiffel tower built", "category": "Details"}]
+    assert "merged_from" not in search_results[0]
+
+
+def test_synthesis_prompt_lists_merged_findings(tmp_path, monkeypatch):
+    async def same_finding(query, *args, **kwargs):
+        return {"query": query, "result": "Shared finding about the topic, repeated by every search.",
+                "status": "completed"}
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", same_finding)
+    llm = FakeResearchLLM()
+    result = _run_agent(tmp_path, monkeypatch, llm)
+
+    assert result["status"] == "completed"
+    assert len(result["final_state"]["search_results"]) == 3
+    prompt = llm.reduce_inputs[0]
+    assert prompt.count("Shared finding") == 1
+    assert 'Also found by:** "task b"; "task c"' in prompt
+
+
+def test_report_is_streamed_to_disk_and_listeners(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    monkeypatch.chdir(tmp_path)
+    agent = _offline_agent(FakeResearchLLM(delay=0.01))
+    report_file = tmp_path / "tmp" / "deep_research" / "job" / "report.md"
+
+    async def scenario():
+        chunks, on_disk = [], []
+
+        async def consume():
+            async for chunk in agent.stream_report():
+                chunks.append(chunk)
+                on_disk.append(report_file.read_text(encoding="utf-8"))
+
+        consumer = asyncio.create_task(consume())
+        result = await agent.run("topic", task_id="job")
+        await asyncio.wait_for(consumer, 1)
+        return result, chunks, on_disk
+
+    result, chunks, on_disk = asyncio.run(scenario())
+
+    assert result["status"] == "completed"
+    assert len(chunks) == 4 and "".join(chunks) == result["final_state"]["final_report"]
+    # Every chunk is on disk by the time listeners receive it
+    assert on_disk[0] == chunks[0] and on_disk[-1] == "".join(chunks)
+    assert report_file.read_text(encoding="utf-8") == "".join(chunks)
+
+
+def test_events_report_progress_of_a_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    monkeypatch.chdir(tmp_path)
+    agent = _offline_agent(FakeResearchLLM())
+
+    async def scenario():
+        events = agent.events()
+        result = await agent.run("topic", task_id="job")
+        return result, [event async for event in events]
+
+    result, events = asyncio.run(scenario())
+    types = [event["type"] for event in events if event["type"] != "report_chunk"]
+
+    assert types == ["run_started", "plan_created"] + [
+        "task_started", "search_result", "task_finished", "results_appended"] * 3 + ["run_finished"]
+    assert events[0]["task_id"] == "job" and events[-1]["status"] == "completed"
+    assert [t["task_description"] for t in events[1]["plan"][0]["tasks"]] == ["task a", "task b"]
+    finished = [event for event in events if event["type"] == "task_finished"]
+    assert [(e["category_index"], e["task_index"], e["status"]) for e in finished] == [
+        (0, 0, "completed"), (0, 1, "completed"), (1, 0, "completed")]
+    assert [e["total"] for e in events if e["type"] == "results_appended"] == [1, 2, 3]
+    report = "".join(e["text"] for e in events if e["type"] == "report_chunk")
+    assert report == result["final_state"]["final_report"]
+
+def test_run_writes_metrics_json_and_returns_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task({"task a": 0.02}))
+    first = _run_agent(tmp_path, monkeypatch, FakeResearchLLM(), task_id="first")
+    second = _run_agent(tmp_path, monkeypatch, FakeResearchLLM(), task_id="second")
+
+    summary = first["metrics"]
+    assert summary["status"] == "completed" and summary["wall_time_s"] > 0
+    assert summary["nodes"]["plan_research"]["count"] == 1
+    assert summary["nodes"]["execute_research"]["count"] == 3
+    assert summary["nodes"]["synthesize_report"]["count"] == 1
+    assert summary["tools"]["parallel_browser_search"]["count"] == 3
+    assert summary["browser"]["sessions"] == 3 and summary["browser"]["total_s"] >= 0.02
+    assert second["metrics"]["browser"]["sessions"] == 0
+    assert second["metrics"]["counters"]["search_cache_hits"] == 3
+
+    saved = json.loads((tmp_path / "tmp" / "deep_research" / "first" / METRICS_FILENAME).read_text())
+    assert saved["summary"]["tools"] == summary["tools"]
+    assert len(saved["spans"]["browser_session"]) == 3
+
+
+def test_metrics_callback_records_token_usage_per_node():
+    metrics = RunMetrics("job")
+    llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content="plan", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}),
+        AIMessage(content="no usage"),
+    ]))
+
+    async def scenario():
+        config = {"callbacks": [metrics.callback_handler], "metadata": {"langgraph_node": "plan_research"}}
+        with metrics.span("node", "plan_research"):
+            await llm.ainvoke("topic", config=config)
+            await llm.ainvoke("topic", config=config)
+
+    asyncio.run(scenario())
+    summary = metrics.summary()
+
+    assert summary["llm"]["calls"] == 2 and summary["llm"]["calls_without_usage"] == 1
+    assert (summary["llm"]["input_tokens"], summary["llm"]["output_tokens"]) == (120, 30)
+    assert summary["nodes"]["plan_research"]["llm_calls"] == 2
+    assert summary["nodes"]["plan_research"]["input_tokens"] == 120
+
+
+def test_plan_cache_returns_closest_plan_above_threshold(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), threshold=0.8)
+    plan = [{"category_name": "Basics", "tasks": [
+        {"task_description": "task a", "status": "completed", "queries": None, "result_summary": "done"}]}]
+
+    async def scenario():
+        await cache.store("Impact of AI on healthcare", plan)
+        return (await cache.lookup("impact of AI on healthcare systems"),
+                await cache.lookup("IMPACT of AI on healthcare?"),
+                await cache.lookup("history of java"))
+
+    similar, same, unrelated = asyncio.run(scenario())
+    cache.close()
+
+    assert similar["topic"] == "Impact of AI on healthcare" and 0.8 <= similar["similarity"] < 1
+    assert similar["plan"][0]["tasks"][0] == {
+        "task_description": "task a", "status": "pending", "queries": None, "result_summary": None}
+    assert same["similarity"] == 1.0
+    assert unrelated is None
+
+
+class PlanCountingLLM(FakeResearchLLM):
+    def __init__(self, plan=None):
+        super().__init__(plan)
+        self.plan_calls = 0
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        if "planning assistant" in messages[0].content:
+            self.plan_calls += 1
+        return await super().ainvoke(messages, *args, **kwargs)
+
+
+def test_similar_topic_reuses_cached_plan_and_refreshes_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    monkeypatch.chdir(tmp_path)
+
+    def run(topic, llm, **kwargs):
+        agent = _offline_agent(llm, **kwargs)
+        return asyncio.run(agent.run(topic))
+
+    first_llm = PlanCountingLLM()
+    run("Impact of AI on healthcare", first_llm, plan_cache_threshold=0.8)
+    cached_llm = PlanCountingLLM(plan=[{"category_name": "New", "tasks": ["task n"]}])
+    second = run("impact of AI on healthcare systems", cached_llm, plan_cache_threshold=0.8,
+                 refresh_cached_plans=True)
+    refreshed_llm = PlanCountingLLM()
+    third = run("impact of AI on healthcare systems", refreshed_llm, plan_cache_threshold=0.8)
+
+    assert first_llm.plan_calls == 1
+    # The second run executes the cached plan, the LLM plan it asks for in the background is stored
+    assert cached_llm.plan_calls == 1
+    assert [c["category_name"] for c in second["final_state"]["research_plan"]] == ["Basics", "Details"]
+    assert refreshed_llm.plan_calls == 0
+    assert [c["category_name"] for c in third["final_state"]["research_plan"]] == ["New"]
+
+
+def test_plan_cache_is_off_by_default_so_near_miss_topics_get_their_own_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    monkeypatch.chdir(tmp_path)
+
+    asyncio.run(_offline_agent(PlanCountingLLM()).run("software testing"))
+    security_llm = PlanCountingLLM(plan=[{"category_name": "Threats", "tasks": ["task t"]}])
+    result = asyncio.run(_offline_agent(security_llm).run("software security"))
+
+    assert security_llm.plan_calls == 1
+    assert [c["category_name"] for c in result["final_state"]["research_plan"]] == ["Threats"]
+    assert not (tmp_path / "tmp" / "deep_research" / "plan_cache.sqlite").exists()
+
+    # A threshold close to 1 still reuses reworded topics but not near misses
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), threshold=0.95)
+    plan = [{"category_name": "Basics", "tasks": [
+        {"task_description": "task a", "status": "completed", "queries": None, "result_summary": "done"}]}]
+
+    async def scenario():
+        await cache.store("software testing", plan)
+        return await cache.lookup("software security"), await cache.lookup("Software Testing!")
+
+    near_miss, reworded = asyncio.run(scenario())
+    cache.close()
+    assert near_miss is None
+    assert reworded["topic"] == "software testing"
+
+
+def _statuses(result):
+    return [task["status"] for category in result["final_state"]["research_plan"] for task in category["tasks"]]
+
+
+def test_adaptive_depth_skips_rest_of_category_after_low_gain_task(tmp_path, monkeypatch):
+    findings = {
+        "task a": "Solar panels convert sunlight into electricity using photovoltaic cells.",
+        "task b": "Solar panels convert sunlight into electricity using photovoltaic cells!",
+        "task d": "Wind turbines generate power from moving air with large rotor blades.",
+    }
+    searched = []
+
+    async def browser_task(query, *args, **kwargs):
+        searched.append(query)
+        return {"query": query, "result": findings[query], "status": "completed"}
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", browser_task)
+    monkeypatch.chdir(tmp_path)
+    llm = FakeResearchLLM(plan=[
+        {"category_name": "Solar", "tasks": ["task a", "task b", "task c"]},
+        {"category_name": "Wind", "tasks": ["task d"]},
+    ])
+    agent = _offline_agent(llm, adaptive_depth=True)
+    result = asyncio.run(agent.run("energy", task_id="job"))
+
+    assert result["status"] == "completed"
+    assert searched == ["task a", "task b", "task d"]
+    assert _statuses(result) == ["completed", "completed", "skipped", "completed"]
+    assert "Information gain: 0.00" in result["final_state"]["research_plan"][0]["tasks"][1]["result_summary"]
+    assert result["metrics"]["counters"]["tasks_skipped"] == 1
+    plan_md = (tmp_path / "tmp" / "deep_research" / "job" / "research_plan.md").read_text(encoding="utf-8")
+    assert "- [~] task c" in plan_md
+    assert "[~] task c" in llm.reduce_inputs[0]
+    # Skipped tasks are not run again on resume
+    replayed = replay_research_log(str(tmp_path / "tmp" / "deep_research" / "job"))
+    assert replayed["research_plan"][0]["tasks"][2]["status"] == "skipped"
+
+
+def test_browser_budget_skips_remaining_tasks(tmp_path, monkeypatch):
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", _fake_browser_task())
+    monkeypatch.chdir(tmp_path)
+    agent = _offline_agent(FakeResearchLLM(), max_browser_sessions=2)
+    result = asyncio.run(agent.run("topic"))
+
+    assert result["status"] == "completed"
+    assert _statuses(result) == ["completed", "completed", "skipped"]
+    assert result["metrics"]["browser"]["sessions"] == 2
+    assert result["final_state"]["research_plan"][1]["tasks"][0]["result_summary"].startswith(
+        "Skipped: browser budget of 2 sessions used up")
+
+
+
+ARTICLE = "<html><head><title>Rust async</title></head><body><article><h1>Rust async</h1>" + "".join(
+    f"<p>Paragraph {i} explains how the Rust async runtime schedules futures on worker threads.</p>" for i in range(8)
+) + "</article></body></html>"
+JS_GATED = "<html><head><title>App</title></head><body><p>Please enable JavaScript to view this page.</p></body></html>"
+
+
+@pytest.fixture
+def static_site():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/search"):
+                body = ('<a class="result__a" href="/l/?uddg=http%3A%2F%2F127.0.0.1%3A{port}%2Farticle">A</a>'
+                        '<a class="result__a" href="/app">B</a>').format(port=self.server.server_port)
+            else:
+                body = ARTICLE if self.path == "/article" else JS_GATED
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/search?q={{query}}"
+    server.shutdown()
+
+
+def test_static_fetcher_follows_results_and_drops_js_gated_pages(static_site):
+    pages = asyncio.run(StaticFetcher(search_url=static_site).fetch("rust async"))
+
+    assert [page["url"] for page in pages] == [static_site.replace("search?q={query}", "article")]
+    assert pages[0]["title"] == "Rust async" and "worker threads" in pages[0]["text"]
+
+
+class StaticAnswerLLM:
+    def __init__(self, unanswered):
+        self.unanswered = unanswered
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        query = messages[-1].content.split("Search query: ")[1].split("\n")[0]
+        return AIMessage(content="INSUFFICIENT" if query in self.unanswered else f"static answer for {query}")
+
+
+def test_static_fetch_answers_queries_and_escalates_the_rest(static_site, monkeypatch):
+    browsed = []
+
+    async def fake_browser_task(query, task_id, llm, browser_config, stop_event, use_vision=False,
+                                browser_pool=None):
+        browsed.append(query)
+        return {"query": query, "result": f"found {query}", "status": "completed"}
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", fake_browser_task)
+    metrics = RunMetrics("t1")
+    results = asyncio.run(deep_research_agent._run_browser_search_tool(
+        ["rust async", "obscure"],
+        task_id="t1",
+        llm=StaticAnswerLLM(unanswered={"obscure"}),
+        browser_config={},
+        stop_event=threading.Event(),
+        metrics=metrics,
+        static_fetcher=StaticFetcher(search_url=static_site),
+    ))
+
+    assert browsed == ["obscure"]
+    assert results[0]["source"] == "static" and results[0]["result"] == "static answer for rust async"
+    assert results[1]["result"] == "found obscure" and "source" not in results[1]
+    assert metrics.counters["static_fetch_hits"] == 1
+    assert metrics.browser_sessions() == 1
+
+
+class ConcurrencyProbe:
+    """Counts how many awaits of `enter` run at once."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def enter(self, delay=0.01):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(delay)
+        self.active -= 1
+
+
+def test_static_fetches_and_their_llm_calls_are_bounded(monkeypatch):
+    fetches, llm_calls = ConcurrencyProbe(), ConcurrencyProbe()
+
+    class ProbedFetcher:
+        async def fetch(self, query):
+            await fetches.enter()
+            return [{"title": query, "url": f"http://example.com/{query}", "text": "page"}]
+
+    class ProbedLLM:
+        async def ainvoke(self, messages, *args, **kwargs):
+            await llm_calls.enter()
+            return AIMessage(content="static answer")
+
+    async def scenario():
+        tool = create_browser_search_tool(
+            ProbedLLM(), {}, "t1", threading.Event(), max_parallel_browsers=3,
+            static_fetcher=ProbedFetcher(), llm_semaphore=asyncio.Semaphore(2),
+        )
+        return await tool.ainvoke({"queries": [f"query {i}" for i in range(10)]})
+
+    results = asyncio.run(scenario())
+
+    assert [r["source"] for r in results] == ["static"] * 10
+    assert fetches.peak == 3 and llm_calls.peak == 2
+
+
+class ProbedChatModel(BaseChatModel):
+    probe: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "probed"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await self.probe.enter()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="step"))])
+
+
+def test_browser_agent_llm_calls_share_the_llm_quota(monkeypatch):
+    sessions, llm_calls = ConcurrencyProbe(), ConcurrencyProbe()
+
+    async def browser_agent_task(query, task_id, llm, *args, **kwargs):
+        await asyncio.gather(sessions.enter(), *[llm.ainvoke(f"{query} step {i}") for i in range(3)])
+        return {"query": query, "result": f"found {query}", "status": "completed"}
+
+    monkeypatch.setattr(deep_research_agent, "run_single_browser_task", browser_agent_task)
+    llm = ProbedChatModel(probe=llm_calls)
+
+    async def scenario():
+        tool = create_browser_search_tool(llm, {}, "t1", threading.Event(), max_parallel_browsers=4,
+                                          llm_semaphore=asyncio.Semaphore(1))
+        results = await tool.ainvoke({"queries": [f"query {i}" for i in range(4)]})
+        limited_peak = llm_calls.peak
+        llm_calls.peak = 0
+        await asyncio.gather(*[llm.ainvoke("unlimited") for _ in range(3)])
+        return results, limited_peak
+
+    results, limited_peak = asyncio.run(scenario())
+
+    assert all(r["status"] == "completed" for r in results)
+    assert sessions.peak == 4 and limited_peak == 1
+    # The research LLM itself is not limited
+    assert llm_calls.peak == 3
+
+
+def test_benchmark_harness_runs_offline():
+    from tests.benchmark_deep_research import format_table, run_benchmark
+
+    results = run_benchmark([4], [1, 2], browser_latency=0.01, checkpointing=False)
+
+    assert [(r["plan_size"], r["concurrency"]) for r in results] == [(4, 1), (4, 2)]
+    # research_plan.md is written once planned, then only when the log is compacted at the end
+    assert [r["persistence"]["_save_plan_to_md"]["calls"] for r in results] == [1, 1]
+    assert [r["persistence"]["compact_research_log"]["calls"] for r in results] == [1, 1]
+    # Sequential tasks see the history of every earlier task, concurrent batches see less of it
+    assert results[0]["max_prompt_messages"] > results[1]["max_prompt_messages"]
+    assert "(+0%)" in format_table(results, baseline=results)
+    # Checkpointing is opt-in, the research log is the only progress file by default
+    assert all(r["checkpoint_mb"] == 0 and r["log_mb"] > 0 for r in results)
+
+
+if __name__ == "__main__":
+    test_browser_pool_reuses_and_recycles()
+    test_browser_pool_bounds_concurrency()
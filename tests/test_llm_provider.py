@@ -0,0 +1,425 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+sys.path.append(".")
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.utils import llm_provider
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = llm_provider.LLMClientRegistry(max_size=2)
+    monkeypatch.setattr(llm_provider, "llm_client_registry", registry)
+    monkeypatch.delenv("OPENAI_ENDPOINT", raising=False)
+    return registry
+
+
+def _openai(**kwargs):
+    settings = {"model_name": "gpt-4o", "temperature": 0.0, "api_key": "sk-test-one"}
+    settings.update(kwargs)
+    return llm_provider.get_llm_model("openai", **settings)
+
+
+def test_llm_clients_are_reused_per_settings(registry, monkeypatch):
+    llm = _openai()
+    assert _openai() is llm
+    assert registry.hits == 1
+
+    # Sampling parameters, credentials and the endpoint are all part of the key
+    assert _openai(temperature=0.7) is not llm
+    assert _openai(api_key="sk-test-two") is not llm
+    monkeypatch.setenv("OPENAI_ENDPOINT", "http://127.0.0.1:9/v1")
+    assert _openai() is not llm
+    assert all("sk-test" not in repr(key) for key in registry._clients)
+
+    assert llm_provider.get_llm_model("openai", reuse_client=False, model_name="gpt-4o", temperature=0.0,
+                                      api_key="sk-test-one") is not _openai()
+
+
+def test_llm_client_registry_is_bounded_and_invalidated(registry):
+    first = _openai()
+    _openai(model_name="gpt-4o-mini")
+    _openai(model_name="o3-mini")
+    assert len(registry) == 2
+    assert _openai() is not first  # Least recently used client was evicted
+
+    assert llm_provider.invalidate_llm_clients("openai", model_name="o3-mini") == 1
+    assert llm_provider.invalidate_llm_clients("anthropic") == 0
+    assert llm_provider.invalidate_llm_clients() == 1
+    assert len(registry) == 0
+
+
+@pytest.fixture
+def openai_stub():
+    """
+    Starts OpenAI-compatible stubs of a reasoner model. Each one waits `delay` seconds, then
+    answers with `content` or, with an error `status`, fails. Returns the stub's mutable state.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    servers = []
+
+    def start(delay=0.0, content="Answer.", status=200):
+        state = {"delay": delay, "content": content, "status": status, "requests": []}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                state["requests"].append(request)
+                time.sleep(state["delay"])
+                if state["status"] != 200:
+                    error = {"error": {"message": "stub failure", "type": "rate_limit_exceeded"}}
+                    self._send(state["status"], "application/json", json.dumps(error).encode("utf-8"))
+                    return
+                base = {"id": "r1", "created": 0, "model": request["model"]}
+                usage = {"prompt_tokens": 12, "completion_tokens": 7, "total_tokens": 19}
+                if not request.get("stream"):
+                    body = json.dumps({**base, "object": "chat.completion", "usage": usage, "choices": [{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": state["content"],
+                                    "reasoning_content": "Thinking."},
+                    }]})
+                    self._send(200, "application/json", body.encode("utf-8"))
+                    return
+                deltas = [{"role": "assistant", "reasoning_content": "Think"}, {"reasoning_content": "ing."},
+                          {"content": "Ans"}, {"content": "wer."}]
+                events = [{**base, "object": "chat.completion.chunk",
+                           "choices": [{"index": 0, "delta": delta, "finish_reason": None}]} for delta in deltas]
+                events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+                body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                self._send(200, "text/event-stream", body.encode("utf-8"))
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up on the request, e.g. a cancelled hedge
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        state["base_url"] = f"http://127.0.0.1:{server.server_port}/v1"
+        return state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def reasoner_endpoint(openai_stub):
+    return openai_stub(delay=0.3)
+
+
+def test_deepseek_reasoner_does_not_block_the_event_loop(reasoner_endpoint):
+    llm = llm_provider.DeepSeekR1ChatOpenAI(model="deepseek-reasoner", base_url=reasoner_endpoint["base_url"],
+                                            api_key="sk-test")
+    messages = [SystemMessage(content="Be brief."), HumanMessage(content="Why?")]
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        try:
+            message = await llm.ainvoke(messages)
+        finally:
+            ticking.cancel()
+        return message, ticks
+
+    message, ticks = asyncio.run(main())
+
+    assert (message.content, message.reasoning_content) == ("Answer.", "Thinking.")
+    assert message.usage_metadata["total_tokens"] == 19
+    assert ticks >= 10  # The loop kept running while the reasoner was thinking
+    assert reasoner_endpoint["requests"][0]["messages"] == [
+        {"role": "system", "content": "Be brief."}, {"role": "user", "content": "Why?"}
+    ]
+
+
+def test_deepseek_reasoner_streams_reasoning_and_content(reasoner_endpoint):
+    reasoner_endpoint["delay"] = 0
+    llm = llm_provider.DeepSeekR1ChatOpenAI(model="deepseek-reasoner", base_url=reasoner_endpoint["base_url"],
+                                            api_key="sk-test")
+
+    async def main():
+        return [chunk async for chunk in llm.astream("Why?")]
+
+    chunks = asyncio.run(main())
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged += chunk
+
+    assert [chunk.additional_kwargs.get("reasoning_content") for chunk in chunks[:2]] == ["Think", "ing."]
+    assert merged.additional_kwargs["reasoning_content"] == "Thinking."
+    assert merged.content == "Answer."
+    assert merged.usage_metadata["output_tokens"] == 7
+    assert llm.invoke("Why?").reasoning_content == "Thinking."
+
+
+def test_llm_response_cache_serves_repeated_prompts(registry, reasoner_endpoint, monkeypatch, tmp_path):
+    reasoner_endpoint["delay"] = 0
+    monkeypatch.setenv("LLM_CACHE_PROVIDERS", "deepseek")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    llm = llm_provider.get_llm_model("deepseek", model_name="deepseek-reasoner",
+                                     base_url=reasoner_endpoint["base_url"], api_key="sk-test")
+
+    async def main():
+        return [await llm.ainvoke(prompt) for prompt in ("Why?", "Why?", "Why not?")]
+
+    first, second, _ = asyncio.run(main())
+
+    assert len(reasoner_endpoint["requests"]) == 2
+    assert second.content == first.content
+    assert second.additional_kwargs["reasoning_content"] == first.reasoning_content
+    assert llm.cache.metrics()["hits"] == 1 and llm.cache.metrics()["misses"] == 2
+    assert llm_provider.get_llm_model("openai", api_key="sk-test").cache is None
+
+
+def test_llm_response_cache_semantic_mode_ttl_and_eviction(tmp_path):
+    from langchain_core.load import dumps
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration
+
+    from src.utils.llm_cache import SQLiteLLMCache
+
+    def prompt(text):
+        return dumps([HumanMessage(content=text)])
+
+    answer = [ChatGeneration(message=AIMessage(content="Use explicit waits."))]
+    cache = SQLiteLLMCache(str(tmp_path / "llm_cache.sqlite"), max_entries=2, semantic_threshold=0.8)
+    cache.update(prompt("How do I fix flaky Selenium login tests in CI?"), "gpt-4o", answer)
+
+    hit = cache.lookup(prompt("How do I fix flaky Selenium login tests in the CI?"), "gpt-4o")
+    assert hit[0].message.content == "Use explicit waits."
+    assert cache.lookup(prompt("How do I fix flaky Selenium login tests in the CI?"), "o3-mini") is None
+    assert cache.lookup(prompt("Write a haiku about autumn leaves."), "gpt-4o") is None
+    assert cache.metrics()["semantic_hits"] == 1
+
+    cache.update(prompt("second"), "gpt-4o", answer)
+    cache.update(prompt("third"), "gpt-4o", answer)
+    assert cache.stats["evictions"] == 1
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.lookup(prompt("third"), "gpt-4o") is None
+    assert cache.stats["expired"] == 1
+    cache.close()
+
+
+def _stub_model(stub):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model="stub", base_url=stub["base_url"], api_key="sk-test", max_retries=0)
+
+
+def test_router_fails_over_and_prefers_healthy_routes(openai_stub):
+    from src.utils.llm_router import RouterChatModel
+
+    limited = openai_stub(content="From limited.", status=429)
+    healthy = openai_stub(content="From healthy.")
+    router = RouterChatModel(models=[_stub_model(limited), _stub_model(healthy)])
+
+    async def main():
+        return [await router.ainvoke("Why?") for _ in range(3)]
+
+    answers = asyncio.run(main())
+
+    assert [answer.content for answer in answers] == ["From healthy."] * 3
+    assert (len(limited["requests"]), len(healthy["requests"])) == (1, 3)
+    health = router.health()
+    assert [route["calls"] for route in health] == [3, 1]
+    assert health[1]["error_rate"] == 1.0
+    assert router.invoke("Why?").content == "From healthy."
+
+
+def test_router_hedges_requests_slower_than_the_usual_latency(openai_stub):
+    from src.utils.llm_router import RouterChatModel
+
+    primary = openai_stub(content="From primary.")
+    backup = openai_stub(content="From backup.")
+    router = RouterChatModel(models=[_stub_model(primary), _stub_model(backup)], hedge_min_samples=3)
+    for _ in range(3):
+        router._record(0, 0.02, True)
+        router._record(1, 0.05, True)
+    primary["delay"] = 2.0  # The primary stalls
+
+    async def main():
+        started = time.perf_counter()
+        answer = await router.ainvoke("Why?")
+        return answer, time.perf_counter() - started
+
+    answer, elapsed = asyncio.run(main())
+
+    assert answer.content == "From backup."
+    assert elapsed < 1.0
+    assert (len(primary["requests"]), len(backup["requests"])) == (1, 1)
+    # The cancelled primary call is a latency sample of at least the hedge delay, not an error
+    assert [(route["calls"], route["error_rate"]) for route in router.health()] == [(4, 0.0), (4, 0.0)]
+    assert 0.02 < router._stats[0][-1][0] < 1.0 and router._stats[0][-1][1]
+
+    with pytest.raises(ValueError, match="at least one model"):
+        RouterChatModel(models=[])
+
+
+class LatencyModel(BaseChatModel):
+    """Fake chat model answering with its label after `delay` seconds."""
+
+    label: str
+    delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.label))])
+
+
+def test_router_demotes_a_route_that_turned_slow():
+    from src.utils.llm_router import RouterChatModel
+
+    fast = LatencyModel(label="a", delay=0.05)
+    backup = LatencyModel(label="b", delay=0.3)
+    router = RouterChatModel(models=[fast, backup])
+
+    async def main():
+        for _ in range(6):
+            await router.ainvoke("Why?")
+        warm_ranking, warm_calls = router._ranked(), fast.calls
+        fast.delay = 2.0  # Route a degrades
+        degraded = [(await router.ainvoke("Why?")).content for _ in range(10)]
+        tried_slow_route = fast.calls - warm_calls
+        before = [len(stats) for stats in router._stats]
+        call = asyncio.create_task(router.ainvoke("Why?"))
+        await asyncio.sleep(0.02)
+        call.cancel()  # Cancelled by the caller, not a hedge race
+        await asyncio.gather(call, return_exceptions=True)
+        return warm_ranking, degraded, tried_slow_route, before
+
+    warm_ranking, degraded, tried_slow_route, before = asyncio.run(main())
+
+    assert warm_ranking == [0, 1]
+    assert degraded == ["b"] * 10
+    # The lost hedges pushed a's median above b's, so b is now tried first
+    assert tried_slow_route < 10
+    assert router._ranked() == [1, 0]
+    assert [len(stats) for stats in router._stats] == before
+
+
+def test_governor_queues_requests_beyond_the_in_flight_limit(registry, openai_stub, monkeypatch):
+    from src.utils.llm_governor import get_llm_governor, llm_governor_metrics
+
+    stub = openai_stub(delay=0.2)
+    monkeypatch.setenv("OPENAI_MAX_IN_FLIGHT", "1")
+    monkeypatch.setenv("OPENAI_REQUESTS_PER_MINUTE", "600")
+    llm = llm_provider.get_llm_model("openai", model_name="stub", base_url=stub["base_url"], api_key="sk-governed")
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*[llm.ainvoke(f"Question {i}") for i in range(3)])
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(main())
+
+    assert elapsed >= 0.6  # One request at a time
+    metrics = get_llm_governor("openai", "sk-governed").metrics()
+    assert metrics["requests"] == 3 and metrics["queued_requests"] == 2
+    assert metrics["max_queue_depth"] == 2 and metrics["queue_depth"] == 0 and metrics["in_flight"] == 0
+    assert metrics["max_wait_s"] >= 0.3
+    assert metrics["tokens"] == 3 * 19  # Usage reported by the provider
+    governor_name = get_llm_governor("openai", "sk-governed").name
+    assert [entry["requests"] for entry in llm_governor_metrics() if entry["governor"] == governor_name] == [3]
+
+    monkeypatch.delenv("OPENAI_MAX_IN_FLIGHT")
+    monkeypatch.delenv("OPENAI_REQUESTS_PER_MINUTE")
+    ungoverned = llm_provider.get_llm_model("openai", model_name="stub", base_url=stub["base_url"],
+                                            api_key="sk-governed")
+    asyncio.run(ungoverned.ainvoke("Question 3"))
+    assert [entry["requests"] for entry in llm_governor_metrics() if entry["governor"] == governor_name] == [3]
+
+
+def test_governor_frees_the_slot_of_cancelled_calls_and_skips_cache_hits(registry, openai_stub, monkeypatch,
+                                                                         tmp_path):
+    from src.utils.llm_governor import get_llm_governor
+
+    stub = openai_stub(delay=0.3)
+    monkeypatch.setenv("OPENAI_MAX_IN_FLIGHT", "1")
+    monkeypatch.setenv("LLM_CACHE_PROVIDERS", "openai")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    llm = llm_provider.get_llm_model("openai", model_name="stub", base_url=stub["base_url"], api_key="sk-cancelled")
+    governor = get_llm_governor("openai", "sk-cancelled")
+
+    async def main():
+        call = asyncio.create_task(llm.ainvoke("Cancelled question"))
+        await asyncio.sleep(0.1)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert governor.in_flight == 0
+        # The next call gets the slot instead of waiting forever
+        first = await asyncio.wait_for(llm.ainvoke("Question"), timeout=2)
+        second = await asyncio.wait_for(llm.ainvoke("Question"), timeout=2)
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first.content == second.content == "Answer."
+    assert len(stub["requests"]) == 2  # The repeated question came from the cache
+    metrics = governor.metrics()
+    assert metrics["requests"] == 2 and metrics["in_flight"] == 0
+
+
+def test_governor_spreads_requests_and_tokens_over_the_minute():
+    from src.utils.llm_governor import ProviderGovernor
+
+    async def main():
+        requests = ProviderGovernor("requests", requests_per_minute=600)  # 10 per second after a burst of 600
+        requests._request_budget = 1
+        assert await requests.acquire() == 0
+        requests.release()
+        request_wait = await requests.acquire()
+
+        tokens = ProviderGovernor("tokens", tokens_per_minute=6000)  # 100 per second
+        assert await tokens.acquire(5000) == 0
+        tokens.release(5000, used_tokens=6000)  # The provider reported more than estimated
+        token_wait = await tokens.acquire(50)
+        return request_wait, token_wait
+
+    request_wait, token_wait = asyncio.run(main())
+
+    assert 0.05 <= request_wait < 0.5
+    assert 0.4 <= token_wait < 1.5